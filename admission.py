@@ -0,0 +1,255 @@
+"""
+Admission control in front of Mistral: bounded concurrency, a bounded FIFO wait queue and per-client rate limits
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from chunking import LLM_PARALLELISM
+from metrics import REGISTRY
+
+# Configure admission settings
+# Documents generating at once; each may run LLM_PARALLELISM chunk calls, so Ollama sees up to max_active times that
+ADMISSION_MAX_ACTIVE = int(os.environ.get('ADMISSION_MAX_ACTIVE', 2))
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 16))  # requests waiting for a slot
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 20))  # seconds before a waiter gives up
+RATE_LIMIT_PER_MINUTE = float(os.environ.get('RATE_LIMIT_PER_MINUTE', 0))  # per client; 0 disables
+RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 10))
+RATE_LIMIT_MAX_CLIENTS = 10000  # idle buckets are pruned beyond this
+TRUST_PROXY_HEADERS = os.environ.get('TRUST_PROXY_HEADERS', '0') == '1'  # key clients by X-Forwarded-For
+
+DEFAULT_RETRY_AFTER = 5  # seconds, until a generation time has been measured
+
+ADMISSION_WAIT = REGISTRY.histogram('agentscript_admission_wait_seconds', 'Time spent queued for a generation slot')
+ADMISSION_REJECTIONS = REGISTRY.counter('agentscript_admission_rejections_total', 'Requests turned away by reason',
+                                        ['reason'])
+
+
+class AdmissionError(Exception):
+    """Raised when a request is turned away; carries the HTTP status and a Retry-After hint in seconds"""
+
+    def __init__(self, message, status_code, retry_after, reason):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class BaseAdmission:
+    """Slot accounting, statistics and Retry-After estimates shared by the thread and asyncio controllers"""
+
+    def __init__(self, max_active=ADMISSION_MAX_ACTIVE, max_queue=ADMISSION_MAX_QUEUE,
+                 queue_timeout=ADMISSION_QUEUE_TIMEOUT):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        self._service_seconds = None  # moving average of how long a slot is held
+        self.admitted = 0
+        self.rejected = 0
+
+    def _try_acquire(self):
+        if self.active < self.max_active and not self._waiters:
+            self.active += 1
+            return True
+        return False
+
+    def _release(self):
+        # The slot passes straight to the oldest waiter, so arrivals cannot jump the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if self._hand_off(waiter):
+                return
+        self.active -= 1
+
+    def _record_service(self, seconds):
+        if self._service_seconds is None:
+            self._service_seconds = seconds
+        else:
+            self._service_seconds += 0.2 * (seconds - self._service_seconds)
+
+    def expected_wait(self):
+        """Seconds a request arriving now is likely to wait for a slot"""
+        if self.active < self.max_active and not self._waiters:
+            return 0.0
+        if self._service_seconds is None:
+            return float(DEFAULT_RETRY_AFTER)
+        return self._service_seconds * (len(self._waiters) + 1) / self.max_active
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up, as a Retry-After value"""
+        return max(1, math.ceil(self.expected_wait()))
+
+    def _reject(self, reason):
+        self.rejected += 1
+        ADMISSION_REJECTIONS.inc(reason=reason)
+        if reason == 'queue_full':
+            message = f"Server is busy ({len(self._waiters)} requests already waiting), retry later"
+        else:
+            message = f"Timed out after {self.queue_timeout:g}s waiting for a generation slot, retry later"
+        return AdmissionError(message, 503, self.retry_after(), reason)
+
+    def _admitted(self, waited, timer):
+        self.admitted += 1
+        ADMISSION_WAIT.observe(waited)
+        if timer is not None:
+            timer.record('queue', waited)
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'waiting': len(self._waiters),
+            'max_active': self.max_active,
+            'max_queue': self.max_queue,
+            'max_llm_calls': self.max_active * LLM_PARALLELISM,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'avg_service_seconds': round(self._service_seconds, 3) if self._service_seconds is not None else None
+        }
+
+
+class Admission(BaseAdmission):
+    """Admission controller for threaded servers"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+
+    def _hand_off(self, waiter):
+        waiter.set()
+        return True
+
+    @contextmanager
+    def slot(self, bounded=True, timer=None):
+        """Hold a generation slot; bounded=False waits without queue or time limits (jobs and batches)"""
+        started = time.monotonic()
+        with self._lock:
+            waiter = None
+            if not self._try_acquire():
+                if bounded and len(self._waiters) >= self.max_queue:
+                    raise self._reject('queue_full')
+                waiter = threading.Event()
+                self._waiters.append(waiter)
+
+        if waiter is not None and not waiter.wait(self.queue_timeout if bounded else None):
+            with self._lock:
+                # The slot may have been handed over between the timeout and taking the lock
+                if not waiter.is_set():
+                    self._waiters.remove(waiter)
+                    raise self._reject('timeout')
+
+        acquired = time.monotonic()
+        with self._lock:
+            self._admitted(acquired - started, timer)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._record_service(time.monotonic() - acquired)
+                self._release()
+
+
+class AsyncAdmission(BaseAdmission):
+    """Admission controller for the asyncio server; all calls happen on the event loop"""
+
+    def _hand_off(self, waiter):
+        if waiter.done():
+            return False  # cancelled while queued
+        waiter.set_result(None)
+        return True
+
+    @asynccontextmanager
+    async def slot(self, bounded=True, timer=None):
+        """Hold a generation slot; bounded=False waits without queue or time limits"""
+        import asyncio
+
+        started = time.monotonic()
+        if not self._try_acquire():
+            if bounded and len(self._waiters) >= self.max_queue:
+                raise self._reject('queue_full')
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout if bounded else None)
+            except asyncio.TimeoutError:
+                if not waiter.done():
+                    waiter.cancel()
+                    self._waiters.remove(waiter)
+                    raise self._reject('timeout')
+            except asyncio.CancelledError:
+                # Client went away while queued; pass on a slot that was already handed over
+                if waiter.done() and not waiter.cancelled():
+                    self._release()
+                else:
+                    waiter.cancel()
+                    self._waiters.remove(waiter)
+                raise
+
+        acquired = time.monotonic()
+        self._admitted(acquired - started, timer)
+        try:
+            yield
+        finally:
+            self._record_service(time.monotonic() - acquired)
+            self._release()
+
+
+class RateLimiter:
+    """Per-client token buckets: `per_minute` sustained requests with bursts of up to `burst`"""
+
+    def __init__(self, per_minute=RATE_LIMIT_PER_MINUTE, burst=RATE_LIMIT_BURST, max_clients=RATE_LIMIT_MAX_CLIENTS):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = {}  # client -> (tokens, last refill time)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def check(self, client, cost=1):
+        """Take cost tokens for client; returns 0 when allowed, otherwise seconds until it would be"""
+        if not self.enabled:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= cost:
+                self._buckets[client] = (tokens - cost, now)
+                if len(self._buckets) > self.max_clients:
+                    self._prune(now)
+                return 0
+            self._buckets[client] = (tokens, now)
+        ADMISSION_REJECTIONS.inc(reason='rate_limited')
+        return (cost - tokens) / self.rate
+
+    def _prune(self, now):
+        """Forget clients whose buckets have refilled completely"""
+        for client, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * self.rate >= self.burst:
+                del self._buckets[client]
+
+
+def client_key(remote_addr, forwarded_for=None):
+    """Identify a client for rate limiting, trusting X-Forwarded-For only when configured"""
+    if TRUST_PROXY_HEADERS and forwarded_for:
+        return forwarded_for.split(',')[0].strip()
+    return remote_addr or 'unknown'
+
+
+def rate_limit_error(retry_after):
+    return AdmissionError('Rate limit exceeded, retry later', 429, max(1, math.ceil(retry_after)), 'rate_limited')
+
+
+def register_admission_metrics(admission, registry=REGISTRY):
+    """Expose the slot and queue occupancy of the controller a server uses"""
+    registry.callback('agentscript_admission_active', 'Requests holding a generation slot', lambda: admission.active)
+    registry.callback('agentscript_admission_waiting', 'Requests queued for a generation slot',
+                      lambda: admission.stats()['waiting'])
@@ -1,437 +1,166 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, Request, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-import fitz  # PyMuPDF
-import requests
-import json
+import functools
 import os
+import io
 import re
-import tempfile
-from werkzeug.utils import secure_filename
+import threading
+import time
+from contextlib import contextmanager
+
+from admission import Admission, AdmissionError, RateLimiter, client_key, rate_limit_error, register_admission_metrics
+from batch import BATCH_LLM_CONCURRENCY, BATCH_MAX_FILES, BatchError, read_zip_pdfs, run_batch
+from jobs import JobQueue, QueueFullError
+from metrics import REGISTRY, Registry, RequestTimer, new_request_id
+from pipeline import (
+    REQUEST_SECONDS, REQUESTS, ProcessingError, allowed_file, llm_client, output_writer, process_pdf,
+    register_llm_metrics, result_cache, result_index, router, section_cache, stream_process_pdf
+)
+from result_index import QueryError, read_page_args
+
+class InMemoryUploadRequest(Request):
+    """Request that keeps uploads in memory instead of Werkzeug's temp files for those over 500KB"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # The pipeline works on the upload's bytes, so spilling to disk would only add a write and a read;
+        # MAX_CONTENT_LENGTH bounds the buffer
+        return io.BytesIO()
 
 app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
 CORS(app)
 
 # Configure upload settings
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-ALLOWED_EXTENSIONS = {'pdf'}
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def extract_text_from_pdf(pdf_path):
-    """Extract text from PDF using PyMuPDF"""
-    doc = fitz.open(pdf_path)
-    lines = []
-    for page in doc:
-        blocks = page.get_text("blocks")
-        sorted_blocks = sorted(blocks, key=lambda b: (b[1], b[0]))  # sort top-to-bottom
-        for block in sorted_blocks:
-            text = block[4].strip()
-            if text:
-                # Split block text into individual lines
-                block_lines = text.split('\n')
-                for line in block_lines:
-                    line = line.strip()
-                    if line:
-                        lines.append(line)
-    
-    # Format text with bullet points if not already present
-    formatted_lines = []
-    for line in lines:
-        if not line.startswith('- '):
-            formatted_lines.append(f"- {line}")
-        else:
-            formatted_lines.append(line)
-    
-    formatted_text = "\n".join(formatted_lines)
-    doc.close()
-    return formatted_text.strip()
-
-def ask_mistral_agent(mindmap_text):
-    """Send request to Mistral API"""
-    prompt = f"""
-You are a JSON-generating assistant that creates structured agent hierarchies with detailed descriptions.
-
-Convert the following structured outline into a hierarchical JSON format with agents, subagents, descriptions, and actions.
-
-Input format (text extracted from a PDF mindmap):
-- 1. Load and Inspect Raw Data
-- 1.1 Extract Data From Database
-- 1.2 Import CSV Files
-- 2. Clean Data
-- 2.1 Remove Duplicates
-- 2.2 Handle Missing Values
-
-Expected JSON output format:
-{{
-  "agents": [
-    {{
-      "name": "Raw Data Handler Agent",
-      "description": "Manages the initial acquisition and inspection of raw data from various sources.",
-      "subagents": [
-        {{
-          "name": "Data Loader",
-          "description": "Handles the extraction and import of data from databases and files.",
-          "actions": [
-            "Extract Data From Database",
-            "Import CSV Files",
-            "Validate data source connections"
-          ]
-        }}
-      ]
-    }},
-    {{
-      "name": "Data Cleaner Agent",
-      "description": "Performs comprehensive data cleaning and quality assurance operations.",
-      "subagents": [
-        {{
-          "name": "Data Processor",
-          "description": "Removes inconsistencies and handles data quality issues.",
-          "actions": [
-            "Remove Duplicates",
-            "Handle Missing Values",
-            "Standardize data formats"
-          ]
-        }}
-      ]
-    }}
-  ]
-}}
-
-Rules:
-- Group related actions under meaningful agent names
-- Create subagents that represent specialized roles
-- Use descriptive agent names ending with "Agent"
-- Use descriptive subagent names for specialized roles
-- Include meaningful descriptions for both agents and subagents (1-2 sentences each)
-- Group actions logically under appropriate subagents
-- Return only raw JSON, no markdown or commentary
-
-Now convert the following mindmap text into structured JSON:
-
-{mindmap_text}
-""".strip()
+batch_generation_slots = threading.BoundedSemaphore(BATCH_LLM_CONCURRENCY)
 
-    try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "mistral",
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            return response.json()['response']
-        else:
-            raise Exception(f"Mistral API error: {response.status_code}")
-            
-    except requests.exceptions.ConnectionError:
-        # Fallback: Generate a structured hierarchy based on the input
-        return generate_structured_json(mindmap_text)
-    except Exception as e:
-        print(f"Error calling Mistral API: {e}")
-        return generate_structured_json(mindmap_text)
+# Every generation, whatever endpoint it came from, takes a slot from the same controller
+admission = Admission()
+rate_limiter = RateLimiter()
 
-def generate_structured_json(mindmap_text):
-    """Generate a well-structured hierarchical JSON when Mistral is not available"""
-    lines = [line.strip() for line in mindmap_text.split('\n') if line.strip()]
-    
-    # Parse the text to identify main topics and subtopics
-    parsed_structure = []
-    current_main = None
-    
-    for line in lines:
-        if line.startswith('- '):
-            line = line[2:]  # Remove '- ' prefix
-        
-        # Check if it's a main topic (numbered or major heading)
-        if re.match(r'^\d+\.\s+', line) or is_main_topic(line):
-            if current_main:
-                parsed_structure.append(current_main)
-            current_main = {
-                'topic': line,
-                'subtopics': []
-            }
-        else:
-            # This is a subtopic/action
-            if current_main:
-                current_main['subtopics'].append(line)
-            else:
-                # Create a default main topic if none exists
-                current_main = {
-                    'topic': 'Base Processing Tasks',
-                    'subtopics': [line]
-                }
-    
-    # Don't forget the last main topic
-    if current_main:
-        parsed_structure.append(current_main)
-    
-    # Convert parsed structure to agent hierarchy
-    agents = []
-    
-    for item in parsed_structure:
-        topic = item['topic']
-        subtopics = item['subtopics']
-        
-        # Generate agent name and description based on topic
-        agent_name = generate_agent_name(topic)
-        agent_description = generate_agent_description(topic)
-        subagent_name = generate_subagent_name(topic)
-        subagent_description = generate_subagent_description(topic)
-        
-        # Group actions intelligently
-        agent = {
-            "name": agent_name,
-            "description": agent_description,
-            "subagents": [{
-                "name": subagent_name,
-                "description": subagent_description,
-                "actions": subtopics if subtopics else [topic]
-            }]
-        }
-        
-        agents.append(agent)
-    
-    # If no structure was found, create a comprehensive data processing structure
-    if not agents:
-        agents = create_default_structure(lines)
-    
-    result = {
-        "agents": agents
-    }
-    
-    return json.dumps(result, indent=2)
-
-def is_main_topic(line):
-    """Determine if a line represents a main topic"""
-    # Look for keywords that indicate main topics
-    main_topic_indicators = [
-        'load', 'inspect', 'clean', 'handle', 'process', 'analyze', 
-        'normalize', 'validate', 'convert', 'standardize', 'encode'
-    ]
-    
-    line_lower = line.lower()
-    
-    # Check if line contains main topic indicators and doesn't look like a sub-action
-    if any(indicator in line_lower for indicator in main_topic_indicators):
-        # Avoid treating detailed sub-actions as main topics
-        sub_action_indicators = [
-            'remove', 'strip', 'fix', 'map', 'merge', 'drop', 'find', 
-            'parse', 'convert data types', 'impute', 'encode categorical'
-        ]
-        if not any(sub_indicator in line_lower for sub_indicator in sub_action_indicators):
-            return True
-    
-    return False
+@contextmanager
+def job_generation_slot(started):
+    """Queue for a shared generation slot without limits, then start the job's timeout"""
+    with admission.slot(bounded=False):
+        started()
+        yield
 
-def generate_agent_name(topic):
-    """Generate descriptive agent name from topic"""
-    topic_lower = topic.lower()
-    
-    # Define agent name mappings
-    agent_mappings = {
-        'load': 'Raw Data Handler Agent',
-        'inspect': 'Data Inspector Agent', 
-        'clean': 'Data Cleaner Agent',
-        'column': 'Column Manager Agent',
-        'data type': 'Data Type Manager Agent',
-        'inconsistent': 'Inconsistency Resolver Agent',
-        'outlier': 'Outlier Handler Agent',
-        'missing': 'Missing Data Handler Agent',
-        'duplicate': 'Duplicate Data Handler Agent',
-        'standardize': 'Value Standardizer Agent',
-        'encode': 'Categorical Encoder Agent',
-        'validate': 'Data Validator Agent',
-        'normalize': 'Data Normalizer Agent'
-    }
-    
-    for keyword, agent_name in agent_mappings.items():
-        if keyword in topic_lower:
-            return agent_name
-    
-    # Default agent name
-    return f"{topic.split('.')[0].strip().title()} Handler Agent"
+def process_job(*args, started, **kwargs):
+    """Run a queued job; jobs wait for a generation slot without the request queue's limits"""
+    return process_pdf(*args, generation_slots=job_generation_slot(started), **kwargs)
 
-def generate_agent_description(topic):
-    """Generate descriptive agent description from topic"""
-    topic_lower = topic.lower()
-    
-    # Define agent description mappings
-    agent_descriptions = {
-        'load': 'Manages the initial acquisition and loading of raw data from various sources including databases, files, and APIs.',
-        'inspect': 'Performs comprehensive inspection and profiling of data to understand structure, quality, and characteristics.',
-        'clean': 'Handles data cleaning operations including removing inconsistencies, duplicates, and handling missing values.',
-        'column': 'Manages column-level operations including renaming, reordering, and metadata management.',
-        'data type': 'Handles data type conversions and ensures proper data type assignments across the dataset.',
-        'inconsistent': 'Identifies and resolves data inconsistencies, standardizes formats, and ensures data integrity.',
-        'outlier': 'Detects, analyzes, and handles outliers using statistical methods and domain knowledge.',
-        'missing': 'Implements strategies for handling missing data including imputation, removal, and flagging.',
-        'duplicate': 'Identifies and removes duplicate records while preserving data integrity and relationships.',
-        'standardize': 'Standardizes data values, formats, and structures to ensure consistency across the dataset.',
-        'encode': 'Handles categorical data encoding including one-hot encoding, label encoding, and feature engineering.',
-        'validate': 'Performs data validation checks to ensure data quality, completeness, and business rule compliance.',
-        'normalize': 'Applies normalization and scaling techniques to prepare data for analysis and modeling.'
-    }
-    
-    for keyword, description in agent_descriptions.items():
-        if keyword in topic_lower:
-            return description
-    
-    # Default description
-    return f"Handles {topic.lower()} operations and ensures proper processing of related tasks."
+job_queue = JobQueue(process_job)
+router.watch(admission)
 
-def generate_subagent_name(topic):
-    """Generate descriptive subagent name from topic"""
-    topic_lower = topic.lower()
-    
-    # Define subagent name mappings
-    subagent_mappings = {
-        'load': 'Data Loader',
-        'inspect': 'Data Inspector',
-        'clean': 'Data Cleaner',
-        'column': 'Column Processor',
-        'data type': 'Type Converter',
-        'inconsistent': 'Consistency Manager',
-        'outlier': 'Outlier Detector',
-        'missing': 'Missing Value Handler',
-        'duplicate': 'Duplicate Resolver',
-        'standardize': 'Value Standardizer',
-        'encode': 'Category Encoder',
-        'validate': 'Data Validator',
-        'normalize': 'Data Normalizer'
-    }
-    
-    for keyword, subagent_name in subagent_mappings.items():
-        if keyword in topic_lower:
-            return subagent_name
-    
-    # Default subagent name
-    return f"{topic.split('.')[0].strip().title()} Processor"
+# Component state is read at scrape time so the hot path pays nothing for it; this app's components get their
+# own registry so a process that also imports async_app does not render their names twice
+server_metrics = Registry(REGISTRY)
+server_metrics.callback('agentscript_jobs', 'Background jobs by status',
+                        lambda: {status: count for status, count in job_queue.stats().items()
+                                 if status != 'max_queue'},
+                        labelnames=['status'])
+register_llm_metrics(llm_client, server_metrics)
+register_admission_metrics(admission, server_metrics)
 
-def generate_subagent_description(topic):
-    """Generate descriptive subagent description from topic"""
-    topic_lower = topic.lower()
-    
-    # Define subagent description mappings
-    subagent_descriptions = {
-        'load': 'Executes data loading operations from various sources and handles connection management.',
-        'inspect': 'Performs detailed data inspection and generates comprehensive data quality reports.',
-        'clean': 'Implements specific data cleaning algorithms and quality improvement procedures.',
-        'column': 'Handles column-specific transformations and metadata operations.',
-        'data type': 'Executes data type conversions and validates type consistency.',
-        'inconsistent': 'Identifies inconsistencies and applies standardization rules.',
-        'outlier': 'Detects anomalies and applies appropriate outlier treatment strategies.',
-        'missing': 'Implements missing data strategies including imputation and removal techniques.',
-        'duplicate': 'Identifies duplicate records and applies deduplication algorithms.',
-        'standardize': 'Applies standardization rules and format conversions.',
-        'encode': 'Performs categorical encoding and feature transformation operations.',
-        'validate': 'Executes validation rules and ensures data quality standards.',
-        'normalize': 'Applies normalization algorithms and scaling transformations.'
-    }
+def read_upload():
+    """Validate the uploaded PDF and return (file, pdf_bytes, cache_mode)"""
+    # Check if file is present
+    if 'file' not in request.files:
+        raise ProcessingError('No file uploaded', 400)
     
-    for keyword, description in subagent_descriptions.items():
-        if keyword in topic_lower:
-            return description
+    file = request.files['file']
     
-    # Default description
-    return f"Processes {topic.lower()} related tasks and maintains data quality standards."
-
-def create_default_structure(lines):
-    """Create a comprehensive default structure for data processing"""
+    if file.filename == '':
+        raise ProcessingError('No file selected', 400)
     
-    # Group actions by categories with descriptions
-    categories = {
-        'Raw Data Handler Agent': {
-            'description': 'Manages the initial acquisition and loading of raw data from various sources including databases, files, and APIs.',
-            'subagents': {
-                'Data Loader': {
-                    'description': 'Executes data loading operations from various sources and handles connection management.',
-                    'actions': []
-                }
-            }
-        },
-        'Column Manager Agent': {
-            'description': 'Manages column-level operations including renaming, reordering, and metadata management.',
-            'subagents': {
-                'Column Processor': {
-                    'description': 'Handles column-specific transformations and metadata operations.',
-                    'actions': []
-                }
-            }
-        },
-        'Data Type Manager Agent': {
-            'description': 'Handles data type conversions and ensures proper data type assignments across the dataset.',
-            'subagents': {
-                'Type Converter': {
-                    'description': 'Executes data type conversions and validates type consistency.',
-                    'actions': []
-                }
-            }
-        },
-        'Data Cleaner Agent': {
-            'description': 'Handles data cleaning operations including removing inconsistencies, duplicates, and handling missing values.',
-            'subagents': {
-                'Data Processor': {
-                    'description': 'Implements specific data cleaning algorithms and quality improvement procedures.',
-                    'actions': []
-                }
-            }
-        }
-    }
+    if not allowed_file(file.filename):
+        raise ProcessingError('Invalid file type. Please upload a PDF file.', 400)
     
-    # Categorize actions based on keywords
-    for line in lines:
-        line_clean = line[2:] if line.startswith('- ') else line
-        line_lower = line_clean.lower()
-        
-        if any(keyword in line_lower for keyword in ['load', 'import', 'extract', 'file format', 'encoding']):
-            categories['Raw Data Handler Agent']['subagents']['Data Loader']['actions'].append(line_clean)
-        elif any(keyword in line_lower for keyword in ['column', 'header', 'metadata', 'whitespace']):
-            categories['Column Manager Agent']['subagents']['Column Processor']['actions'].append(line_clean)
-        elif any(keyword in line_lower for keyword in ['data type', 'convert', 'numeric', 'categorical', 'parse']):
-            categories['Data Type Manager Agent']['subagents']['Type Converter']['actions'].append(line_clean)
+    return file, file.read(), read_cache_mode()
+
+def read_cache_mode():
+    """Return the requested cache mode"""
+    # Cache mode: 'use' (default), 'refresh' (regenerate and overwrite) or 'bypass' (no read, no write)
+    cache_mode = request.values.get('cache', 'use')
+    if cache_mode not in ('use', 'refresh', 'bypass'):
+        raise ProcessingError("Invalid cache mode. Use 'use', 'refresh' or 'bypass'.", 400)
+    return cache_mode
+
+def read_route():
+    """Return the requested generation route"""
+    # Route: 'auto' (default, decided per document), 'llm' (always try Mistral first) or 'fallback' (rule-based only)
+    route = request.values.get('route', 'auto')
+    if route not in ('auto', 'llm', 'fallback'):
+        raise ProcessingError("Invalid route. Use 'auto', 'llm' or 'fallback'.", 400)
+    return route
+
+def schedule_refine(pdf_bytes, filename, cache_mode):
+    """Queue a Mistral regeneration of a document answered by the fallback; returns the job reference or None"""
+    try:
+        job = job_queue.submit(filename, pdf_bytes, filename, cache_mode, route='llm')
+    except QueueFullError:
+        return None
+    print(f"[INFO] Queued refinement job {job.id} for file: {filename}")
+    return {'job_id': job.id, 'status_url': f"/jobs/{job.id}"}
+
+def read_batch_uploads():
+    """Return (filename, bytes) pairs from multipart 'files' and/or zip 'archive' fields"""
+    uploads = []
+    for file in request.files.getlist('files') + request.files.getlist('archive'):
+        if file.filename == '':
+            continue
+        if file.filename.lower().endswith('.zip'):
+            uploads.extend(read_zip_pdfs(file.read(), max_files=BATCH_MAX_FILES,
+                                         max_file_bytes=app.config['MAX_CONTENT_LENGTH']))
+        elif allowed_file(file.filename):
+            uploads.append((file.filename, file.read()))
         else:
-            categories['Data Cleaner Agent']['subagents']['Data Processor']['actions'].append(line_clean)
+            raise ProcessingError(f'Invalid file type: {file.filename}. Please upload PDF or zip files.', 400)
     
-    # Build agents structure
-    agents = []
-    for agent_name, agent_data in categories.items():
-        subagents = []
-        for subagent_name, subagent_data in agent_data['subagents'].items():
-            if subagent_data['actions']:  # Only include subagents with actions
-                subagents.append({
-                    "name": subagent_name,
-                    "description": subagent_data['description'],
-                    "actions": subagent_data['actions']
-                })
-        
-        if subagents:  # Only include agents with subagents
-            agents.append({
-                "name": agent_name,
-                "description": agent_data['description'],
-                "subagents": subagents
-            })
-    
-    return agents
+    if not uploads:
+        raise ProcessingError('No PDF files uploaded', 400)
+    if len(uploads) > BATCH_MAX_FILES:
+        raise ProcessingError(f'Batch exceeds {BATCH_MAX_FILES} files', 400)
+    return uploads
 
-def parse_json_response(raw_response):
-    """Parse and clean JSON response"""
-    try:
-        # Clean up possible ```json wrappers
-        cleaned = re.sub(r"^```(?:json)?|```$", "", raw_response.strip(), flags=re.MULTILINE).strip()
-        
-        # Parse JSON
-        parsed = json.loads(cleaned)
-        return parsed, None
-        
-    except json.JSONDecodeError as e:
-        return None, f"JSON parsing error: {str(e)}"
-    except Exception as e:
-        return None, f"Unexpected error: {str(e)}"
+@app.before_request
+def start_request():
+    """Assign a request id and start the request clock"""
+    g.request_id = request.headers.get('X-Request-ID') or new_request_id()
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def finish_request(response):
+    """Record request metrics and echo the request id"""
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    REQUEST_SECONDS.observe(time.perf_counter() - g.request_started, endpoint=endpoint)
+    response.headers['X-Request-ID'] = g.request_id
+    return response
+
+def admission_error_response(e):
+    """JSON error for a request turned away by admission control"""
+    return jsonify({'error': str(e), 'retry_after': e.retry_after}), e.status_code, {'Retry-After': str(e.retry_after)}
+
+def rate_limited(view):
+    """Reject requests from clients that have used up their token bucket"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        retry_after = rate_limiter.check(client_key(request.remote_addr, request.headers.get('X-Forwarded-For')))
+        if retry_after:
+            return admission_error_response(rate_limit_error(retry_after))
+        return view(*args, **kwargs)
+    return wrapper
+
+@contextmanager
+def batch_generation_slot():
+    """Limit a batch's own concurrency, then queue for a shared generation slot without limits"""
+    with batch_generation_slots, admission.slot(bounded=False):
+        yield
+
+def wants_timings():
+    """Whether the client opted in to a per-request timing breakdown"""
+    return request.values.get('timings', '').lower() in ('1', 'true', 'yes')
 
 @app.route('/')
 def index():
@@ -440,98 +169,169 @@ def index():
         return f.read()
 
 @app.route('/process', methods=['POST'])
+@rate_limited
 def process_document():
     """Process uploaded PDF document"""
+    timer = RequestTimer(g.request_id)
     try:
-        # Check if file is present
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file uploaded'}), 400
-        
-        file = request.files['file']
-        
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'Invalid file type. Please upload a PDF file.'}), 400
-        
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            file.save(temp_file.name)
-            temp_path = temp_file.name
-        
-        try:
-            # Extract text from PDF
-            print(f"[INFO] Processing file: {file.filename}")
-            mindmap_text = extract_text_from_pdf(temp_path)
-            
-            if not mindmap_text:
-                return jsonify({'error': 'No text could be extracted from the PDF'}), 400
-            
-            print(f"[DEBUG] Extracted text:\n{mindmap_text}")
-            
-            # Send to Mistral agent
-            print("[INFO] Sending to Mistral agent...")
-            raw_output = ask_mistral_agent(mindmap_text)
-            
-            # Parse JSON response
-            parsed_json, parse_error = parse_json_response(raw_output)
-            
-            if parse_error:
-                return jsonify({'error': parse_error}), 500
-            
-            # Save output files
-            os.makedirs('outputs', exist_ok=True)
-            base_filename = secure_filename(os.path.splitext(file.filename)[0])
-            
-            # Save raw response
-            raw_path = f"outputs/{base_filename}_raw_response.txt"
-            with open(raw_path, "w", encoding="utf-8") as raw_file:
-                raw_file.write(raw_output)
-            
-            # Save parsed JSON
-            json_path = f"outputs/{base_filename}_output.json"
-            with open(json_path, "w", encoding="utf-8") as json_file:
-                json.dump(parsed_json, json_file, indent=2)
-            
-            # Save extracted text for debugging
-            debug_path = f"outputs/{base_filename}_extracted_text.txt"
-            with open(debug_path, "w", encoding="utf-8") as debug_file:
-                debug_file.write(mindmap_text)
-            
-            print(f"[SUCCESS] Files saved: {json_path}, {raw_path}, {debug_path}")
-            
-            return jsonify({
-                'success': True,
-                'json_data': parsed_json,
-                'raw_response': raw_output,
-                'extracted_text': mindmap_text,
-                'files_saved': {
-                    'json': json_path,
-                    'raw': raw_path,
-                    'debug': debug_path
-                }
-            })
-            
-        finally:
-            # Clean up temporary file
-            os.unlink(temp_path)
-            
+        with timer.span('upload'):
+            file, pdf_bytes, cache_mode = read_upload()
+        result = process_pdf(pdf_bytes, file.filename, cache_mode, generation_slots=admission.slot(timer=timer),
+                             timer=timer, route=read_route(), interactive=True, refine=schedule_refine)
+        if wants_timings():
+            result['timings'] = {'request_id': timer.request_id, 'stages_ms': timer.breakdown()}
+        return jsonify(result)
+    
+    except ProcessingError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except AdmissionError as e:
+        return admission_error_response(e)
     except Exception as e:
         print(f"[ERROR] Processing failed: {str(e)}")
         return jsonify({'error': f'Processing failed: {str(e)}'}), 500
 
+@app.route('/process/stream', methods=['POST'])
+@rate_limited
+def process_document_stream():
+    """Process uploaded PDF document, streaming progress and agents as server-sent events"""
+    timer = RequestTimer(g.request_id)
+    try:
+        with timer.span('upload'):
+            file, pdf_bytes, cache_mode = read_upload()
+        route = read_route()
+    except ProcessingError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    
+    return Response(
+        stream_with_context(stream_process_pdf(pdf_bytes, file.filename, cache_mode, timer,
+                                               admission.slot(timer=timer), route, schedule_refine)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/process/batch', methods=['POST'])
+@rate_limited
+def process_batch():
+    """Process several PDF documents in one request"""
+    try:
+        cache_mode = read_cache_mode()
+        uploads = read_batch_uploads()
+    except ProcessingError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    print(f"[INFO] Processing batch of {len(uploads)} files")
+    
+    def handle(pdf_bytes, filename):
+        return process_pdf(pdf_bytes, filename, cache_mode, generation_slots=batch_generation_slot())
+    
+    return jsonify(dict(success=True, **run_batch(uploads, handle)))
+
+@app.route('/jobs', methods=['POST'])
+@rate_limited
+def submit_job():
+    """Queue an uploaded PDF for background processing"""
+    try:
+        file, pdf_bytes, cache_mode = read_upload()
+        job = job_queue.submit(file.filename, pdf_bytes, file.filename, cache_mode, route=read_route())
+    except ProcessingError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    
+    print(f"[INFO] Queued job {job.id} for file: {file.filename}")
+    return jsonify({'job_id': job.id, 'status': job.status, 'status_url': f"/jobs/{job.id}"}), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Return status, progress and (when finished) the result of a job"""
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+def results_page(query=None):
+    """Return a page of stored results, newest first, optionally matching a search query"""
+    if result_index is None:
+        return jsonify({'error': 'Result index is disabled'}), 404
+    try:
+        limit, cursor = read_page_args(request.args)
+        if query is None:
+            results, next_cursor = result_index.list(limit, cursor)
+        else:
+            results, next_cursor = result_index.search(query, request.args.get('field', 'all'), limit, cursor)
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'results': results, 'next_cursor': next_cursor})
+
+@app.route('/results', methods=['GET'])
+def list_results():
+    """List stored results; pass next_cursor back as cursor for the following page"""
+    return results_page()
+
+@app.route('/results/search', methods=['GET'])
+def search_results():
+    """Search stored results by agent, subagent and action names"""
+    return results_page(request.args.get('q', ''))
+
+@app.route('/results/<record>', methods=['GET'])
+def get_result(record):
+    """Return one stored result with its agents JSON"""
+    result = result_index.get(record) if result_index is not None else None
+    if result is None:
+        return jsonify({'error': 'Result not found'}), 404
+    return jsonify(result)
+
+@app.route('/cache', methods=['GET'])
+def cache_stats():
+    """Report result cache statistics"""
+    stats = result_cache.stats()
+    if section_cache is not None:
+        stats['sections'] = section_cache.stats()
+    return jsonify(stats)
+
+@app.route('/cache', methods=['DELETE'])
+def clear_cache():
+    """Invalidate every cached result"""
+    result_cache.clear()
+    if section_cache is not None:
+        section_cache.clear()
+    return jsonify({'success': True})
+
+@app.route('/cache/<cache_key>', methods=['DELETE'])
+def invalidate_cache_entry(cache_key):
+    """Invalidate a single cached result"""
+    if not re.fullmatch(r'[0-9a-f]{64}', cache_key):
+        return jsonify({'error': 'Invalid cache key'}), 400
+    if not result_cache.invalidate(cache_key):
+        return jsonify({'error': 'Cache entry not found'}), 404
+    return jsonify({'success': True})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    return Response(server_metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/health')
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'service': 'Agent Script Interface'})
+    return jsonify({
+        'status': 'healthy',
+        'service': 'Agent Script Interface',
+        'jobs': job_queue.stats(),
+        'llm': llm_client.stats(),
+        'admission': admission.stats(),
+        'routing': router.stats(),
+        'outputs': output_writer.stats()
+    })
 
 if __name__ == '__main__':
     # Create outputs directory if it doesn't exist
     os.makedirs('outputs', exist_ok=True)
     
     print("Starting Agent Script Interface Module...")
-    print("Make sure Mistral is running on localhost:11434")
+    print(f"Make sure Mistral is running on {llm_client.base_url}")
     print("Access the interface at: http://localhost:5000")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,434 @@
+"""
+Asyncio server mode: the /, /process, /process/stream and /health API served by aiohttp
+
+Mistral calls use a non-blocking client and extraction, parsing and file output run in a thread
+pool, so a waiting request holds no thread and one worker process can keep hundreds in flight.
+
+Run with: gunicorn async_app:app --worker-class aiohttp.GunicornWebWorker --workers 2
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from admission import AdmissionError, AsyncAdmission, RateLimiter, client_key, rate_limit_error, register_admission_metrics
+from chunking import LLM_CHUNK_MAX_CHARS, LLM_PARALLELISM
+from fallback import generate_structured_json
+from llm_client import LLMUnavailableError, make_llm_client
+from metrics import REGISTRY, Registry, RequestTimer, new_request_id
+from jobs import JOB_MAX_QUEUE, JOB_RESULT_TTL, Job
+from pipeline import (
+    REQUEST_SECONDS, REQUESTS, PipelineRun, ProcessingError, allowed_file, merge_chunk_results, output_writer,
+    plan_generation, prompt_builder, register_llm_metrics, remember_sections, result_index, router
+)
+from result_index import QueryError, read_page_args
+from streaming import format_sse
+
+# Configure async server settings
+ASYNC_EXECUTOR_WORKERS = int(os.environ.get('ASYNC_EXECUTOR_WORKERS', min(32, (os.cpu_count() or 1) + 4)))
+MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size, as in the Flask app
+CORS_METHODS = 'DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT'  # what flask_cors allows by default
+
+server_metrics = Registry(REGISTRY)  # this server's components, rendered after the shared pipeline metrics
+async_llm_client = make_llm_client(asynchronous=True)
+register_llm_metrics(async_llm_client, server_metrics)
+
+async_admission = AsyncAdmission()
+register_admission_metrics(async_admission, server_metrics)
+rate_limiter = RateLimiter()
+router.watch(async_admission)
+refine_tasks = set()  # background Mistral regenerations of fallback answers
+refine_jobs = {}  # their status by job id, polled at /jobs/<id>
+
+async def run_blocking(func, *args):
+    """Run a blocking or CPU-bound call in the worker's thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+async def generate_chunk_json(outline):
+    """Generate agent JSON for a single prompt-sized Outline"""
+    prompt = prompt_builder.build(outline).text
+
+    try:
+        started = time.monotonic()
+        raw_output = await async_llm_client.generate(prompt)
+        router.observe(len(outline.text), time.monotonic() - started)
+        return raw_output, 'mistral'
+    except LLMUnavailableError as e:
+        print(f"[WARN] {e}, using fallback")
+    except Exception as e:
+        print(f"Error calling Mistral API: {e}")
+
+    async_llm_client.record_fallback()
+    return await run_blocking(generate_structured_json, outline), 'fallback'
+
+async def generate_agent_json(outline, cache_mode='use', plan=None):
+    """Generate agent JSON for an Outline, returning the raw output and whether it came from 'mistral' or 'fallback'"""
+    plan = plan or await run_blocking(plan_generation, outline, cache_mode)
+    chunks = plan.pending_chunks(LLM_CHUNK_MAX_CHARS)
+    if len(chunks) == 1 and not plan.reused:
+        raw_output, source = await generate_chunk_json(outline)
+        await run_blocking(remember_sections, plan, range(len(plan.sections)), raw_output, source)
+        return raw_output, source
+
+    if chunks:
+        print(f"[INFO] Generating {len(chunks)} outline chunks with parallelism {LLM_PARALLELISM}")
+    slots = asyncio.Semaphore(LLM_PARALLELISM)
+
+    async def generate(chunk):
+        async with slots:
+            return await generate_chunk_json(chunk.outline)
+
+    results = await asyncio.gather(*(generate(chunk) for chunk in chunks))
+    return await run_blocking(merge_chunk_results, plan, chunks, results)
+
+async def process_pdf(pdf_bytes, filename, cache_mode, timer, route='auto', interactive=True, started=None):
+    """Run extraction, generation and parsing for one PDF and return the response payload
+
+    started is called once the document holds a generation slot.
+    """
+    run = PipelineRun(pdf_bytes, filename, cache_mode, timer, route, interactive, interactive)
+    if not await run_blocking(run.lookup):
+        await run_blocking(run.extract)
+        run.decide()
+        if run.decision.uses_llm:
+            print("[INFO] Sending to Mistral agent...")
+            async with async_admission.slot(bounded=interactive, timer=timer):
+                if started:
+                    started()
+                with timer.span('generate'):
+                    run.generated(*await generate_agent_json(run.outline, cache_mode))
+        else:
+            await run_blocking(run.generate_fallback)
+        await run_blocking(run.parse)
+
+    await run_blocking(run.save)
+    return run.result(schedule_refine)
+
+def schedule_refine(pdf_bytes, filename, cache_mode):
+    """Regenerate a fallback answer with Mistral in the background; returns the job reference or None"""
+    cutoff = time.time() - JOB_RESULT_TTL
+    for job in [job for job in refine_jobs.values() if job.finished and job.finished_at < cutoff]:
+        del refine_jobs[job.id]
+    if sum(1 for job in refine_jobs.values() if not job.finished) >= JOB_MAX_QUEUE:
+        return None
+
+    job = Job(filename)
+    refine_jobs[job.id] = job
+    task = asyncio.get_running_loop().create_task(refine_document(job, pdf_bytes, filename, cache_mode))
+    refine_tasks.add(task)
+    task.add_done_callback(refine_tasks.discard)
+    print(f"[INFO] Scheduled refinement job {job.id} for file: {filename}")
+    return {'job_id': job.id, 'status_url': f"/jobs/{job.id}"}
+
+async def refine_document(job, pdf_bytes, filename, cache_mode):
+    """Run a refinement job, recording its outcome where GET /jobs/<id> finds it"""
+    def started():
+        # Like JobQueue jobs, a refinement is queued until it holds a generation slot
+        job.status = job.stage = 'running'
+        job.started_at = time.time()
+
+    try:
+        job.result = await process_pdf(pdf_bytes, filename, cache_mode, RequestTimer(), route='llm',
+                                       interactive=False, started=started)
+        job.status = 'succeeded'
+        job.progress = 1.0
+        print(f"[INFO] Refined result ready for file: {filename}")
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        job.status_code = getattr(e, 'status_code', 500)
+        print(f"[ERROR] Refinement failed for {filename}: {str(e)}")
+    job.stage = 'done'
+    job.finished_at = time.time()
+
+async def stream_process_pdf(pdf_bytes, filename, cache_mode, timer, route='auto'):
+    """Process one PDF, yielding server-sent events as agents are generated"""
+    run = PipelineRun(pdf_bytes, filename, cache_mode, timer, route, True, True)
+
+    try:
+        if await run_blocking(run.lookup):
+            yield run.extracted_event()
+            for event in run.agent_events():
+                yield event
+        else:
+            yield format_sse('status', {'stage': 'extracting'})
+            await run_blocking(run.extract)
+            yield run.extracted_event()
+
+            run.decide()
+            yield format_sse('status', {'stage': 'generating', 'route': run.decision.route})
+            if run.decision.uses_llm:
+                print("[INFO] Streaming from Mistral agent...")
+                async with async_admission.slot(timer=timer):
+                    generate_started = time.perf_counter()
+                    if not await run_blocking(run.plan_stream):
+                        # Chunks (or only the changed sections) are generated; all agents are sent once spliced
+                        run.generated(*await generate_agent_json(run.outline, cache_mode, run.plan))
+                    else:
+                        try:
+                            prompt = prompt_builder.build(run.outline).text
+                            async for token in async_llm_client.stream(prompt):
+                                for event in run.token_events(token):
+                                    yield event
+                            run.streamed(time.perf_counter() - generate_started)
+                        except Exception as e:
+                            print(f"Error streaming from Mistral API: {e}")
+                            async_llm_client.record_fallback()
+                            run.generated(await run_blocking(generate_structured_json, run.outline), 'fallback')
+                    timer.record('generate', time.perf_counter() - generate_started)
+            else:
+                await run_blocking(run.generate_fallback)
+
+            yield format_sse('status', {'stage': 'parsing'})
+            await run_blocking(run.parse)
+            for event in run.agent_events():
+                yield event
+
+        await run_blocking(run.save)
+        yield format_sse('result', dict(run.result(schedule_refine), timing=run.timing()))
+
+    except ProcessingError as e:
+        yield format_sse('error', {'error': str(e), 'status': e.status_code})
+    except AdmissionError as e:
+        yield format_sse('error', {'error': str(e), 'status': e.status_code, 'retry_after': e.retry_after})
+    except Exception as e:
+        print(f"[ERROR] Processing failed: {str(e)}")
+        yield format_sse('error', {'error': f'Processing failed: {str(e)}', 'status': 500})
+
+def json_error(message, status_code):
+    return web.json_response({'error': message}, status=status_code)
+
+def admission_error_response(e):
+    """JSON error for a request turned away by admission control, with a Retry-After header"""
+    return web.json_response({'error': str(e), 'retry_after': e.retry_after}, status=e.status_code,
+                             headers={'Retry-After': str(e.retry_after)})
+
+def check_rate_limit(request):
+    """Raise AdmissionError when the client has used up its request allowance"""
+    wait = rate_limiter.check(client_key(request.remote, request.headers.get('X-Forwarded-For')))
+    if wait:
+        raise rate_limit_error(wait)
+
+async def read_upload(request):
+    """Validate the uploaded PDF and return (filename, pdf_bytes, cache_mode)"""
+    try:
+        form = await request.post()
+    except web.HTTPRequestEntityTooLarge:
+        raise ProcessingError('File too large', 413)
+    request['form'] = form
+
+    file = form.get('file')
+    if not isinstance(file, web.FileField):
+        raise ProcessingError('No file uploaded', 400)
+
+    if file.filename == '':
+        raise ProcessingError('No file selected', 400)
+
+    if not allowed_file(file.filename):
+        raise ProcessingError('Invalid file type. Please upload a PDF file.', 400)
+
+    # Cache mode: 'use' (default), 'refresh' (regenerate and overwrite) or 'bypass' (no read, no write)
+    cache_mode = request.query.get('cache', form.get('cache', 'use'))
+    if cache_mode not in ('use', 'refresh', 'bypass'):
+        raise ProcessingError("Invalid cache mode. Use 'use', 'refresh' or 'bypass'.", 400)
+
+    return file.filename, await run_blocking(file.file.read), cache_mode
+
+def read_route(request):
+    """Return the requested generation route: 'auto' (default), 'llm' or 'fallback'"""
+    route = request.query.get('route', request.get('form', {}).get('route', 'auto'))
+    if route not in ('auto', 'llm', 'fallback'):
+        raise ProcessingError("Invalid route. Use 'auto', 'llm' or 'fallback'.", 400)
+    return route
+
+def wants_timings(request):
+    """Whether the client opted in to a per-request timing breakdown"""
+    value = request.query.get('timings', request.get('form', {}).get('timings', ''))
+    return value.lower() in ('1', 'true', 'yes')
+
+@web.middleware
+async def track_request(request, handler):
+    """Assign a request id and record request metrics"""
+    request['request_id'] = request.headers.get('X-Request-ID') or new_request_id()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        resource = request.match_info.route.resource
+        endpoint = resource.canonical if resource else 'unmatched'
+        REQUESTS.inc(endpoint=endpoint, status=status)
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+
+@web.middleware
+async def cors_preflight(request, handler):
+    """Answer CORS preflight requests for known endpoints, as flask_cors does for the Flask app"""
+    if request.method != 'OPTIONS' or 'Access-Control-Request-Method' not in request.headers:
+        return await handler(request)
+    error = getattr(request.match_info, 'http_exception', None)
+    if error is not None and error.status != 405:
+        return await handler(request)
+    headers = {'Access-Control-Allow-Methods': CORS_METHODS}
+    if 'Access-Control-Request-Headers' in request.headers:
+        headers['Access-Control-Allow-Headers'] = request.headers['Access-Control-Request-Headers']
+    return web.Response(headers=headers)
+
+async def add_response_headers(request, response):
+    """Echo the request id and allow cross-origin use, before headers are sent (streams included)"""
+    response.headers['X-Request-ID'] = request.get('request_id') or new_request_id()
+    response.headers['Access-Control-Allow-Origin'] = '*'
+
+async def index(request):
+    """Serve the main interface"""
+    return web.FileResponse('index.html')
+
+async def process_document(request):
+    """Process uploaded PDF document"""
+    timer = RequestTimer(request['request_id'])
+    try:
+        check_rate_limit(request)
+        with timer.span('upload'):
+            filename, pdf_bytes, cache_mode = await read_upload(request)
+        result = await process_pdf(pdf_bytes, filename, cache_mode, timer, read_route(request))
+        if wants_timings(request):
+            result['timings'] = {'request_id': timer.request_id, 'stages_ms': timer.breakdown()}
+        return web.json_response(result)
+
+    except ProcessingError as e:
+        return json_error(str(e), e.status_code)
+    except AdmissionError as e:
+        return admission_error_response(e)
+    except Exception as e:
+        print(f"[ERROR] Processing failed: {str(e)}")
+        return json_error(f'Processing failed: {str(e)}', 500)
+
+async def process_document_stream(request):
+    """Process uploaded PDF document, streaming progress and agents as server-sent events"""
+    timer = RequestTimer(request['request_id'])
+    try:
+        check_rate_limit(request)
+        with timer.span('upload'):
+            filename, pdf_bytes, cache_mode = await read_upload(request)
+        route = read_route(request)
+    except ProcessingError as e:
+        return json_error(str(e), e.status_code)
+    except AdmissionError as e:
+        return admission_error_response(e)
+
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    await response.prepare(request)
+    async for event in stream_process_pdf(pdf_bytes, filename, cache_mode, timer, route):
+        await response.write(event.encode('utf-8'))
+    await response.write_eof()
+    return response
+
+async def job_status(request):
+    """Return status and (when finished) the result of a refinement job"""
+    job = refine_jobs.get(request.match_info['job_id'])
+    if job is None:
+        return json_error('Job not found', 404)
+    return web.json_response(job.to_dict())
+
+async def results_page(request, query=None):
+    """Return a page of stored results, newest first, optionally matching a search query"""
+    if result_index is None:
+        return json_error('Result index is disabled', 404)
+    try:
+        limit, cursor = read_page_args(request.query)
+        if query is None:
+            results, next_cursor = await run_blocking(result_index.list, limit, cursor)
+        else:
+            results, next_cursor = await run_blocking(result_index.search, query, request.query.get('field', 'all'),
+                                                      limit, cursor)
+    except QueryError as e:
+        return json_error(str(e), 400)
+    return web.json_response({'results': results, 'next_cursor': next_cursor})
+
+async def list_results(request):
+    """List stored results; pass next_cursor back as cursor for the following page"""
+    return await results_page(request)
+
+async def search_results(request):
+    """Search stored results by agent, subagent and action names"""
+    return await results_page(request, request.query.get('q', ''))
+
+async def get_result(request):
+    """Return one stored result with its agents JSON"""
+    record = request.match_info['record']
+    result = await run_blocking(result_index.get, record) if result_index is not None else None
+    if result is None:
+        return json_error('Result not found', 404)
+    return web.json_response(result)
+
+async def metrics_endpoint(request):
+    """Prometheus metrics endpoint"""
+    return web.Response(text=server_metrics.render(), content_type='text/plain')
+
+async def health_check(request):
+    """Health check endpoint"""
+    return web.json_response({
+        'status': 'healthy',
+        'service': 'Agent Script Interface',
+        'server': 'async',
+        'llm': async_llm_client.stats(),
+        'admission': async_admission.stats(),
+        'routing': router.stats(),
+        'outputs': output_writer.stats()
+    })
+
+async def start_executor(app):
+    """Size the thread pool used for extraction, parsing and file output"""
+    executor = ThreadPoolExecutor(max_workers=ASYNC_EXECUTOR_WORKERS, thread_name_prefix='blocking')
+    asyncio.get_running_loop().set_default_executor(executor)
+
+async def cancel_refinements(app):
+    for task in list(refine_tasks):
+        task.cancel()
+    await asyncio.gather(*refine_tasks, return_exceptions=True)
+
+async def close_llm_client(app):
+    await async_llm_client.close()
+
+def create_app():
+    """Build the aiohttp application"""
+    app = web.Application(client_max_size=MAX_CONTENT_LENGTH, middlewares=[track_request, cors_preflight])
+    app.router.add_get('/', index)
+    app.router.add_post('/process', process_document)
+    app.router.add_post('/process/stream', process_document_stream)
+    app.router.add_get('/jobs/{job_id}', job_status)
+    app.router.add_get('/results', list_results)
+    app.router.add_get('/results/search', search_results)
+    app.router.add_get('/results/{record}', get_result)
+    app.router.add_get('/metrics', metrics_endpoint)
+    app.router.add_get('/health', health_check)
+    if os.path.isdir('static'):
+        app.router.add_static('/static', 'static')
+
+    app.on_startup.append(start_executor)
+    app.on_response_prepare.append(add_response_headers)
+    app.on_cleanup.append(cancel_refinements)
+    app.on_cleanup.append(close_llm_client)
+    return app
+
+app = create_app()
+
+if __name__ == '__main__':
+    os.makedirs('outputs', exist_ok=True)
+
+    print("Starting Agent Script Interface Module (async)...")
+    print(f"Make sure Mistral is running on {async_llm_client.base_url}")
+    print("Access the interface at: http://localhost:5000")
+
+    web.run_app(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
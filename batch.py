@@ -0,0 +1,110 @@
+"""
+Batch processing of many PDFs in one request
+"""
+
+import hashlib
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure batch settings
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', 50))
+BATCH_MAX_ZIP_BYTES = int(os.environ.get('BATCH_MAX_ZIP_BYTES', 64 * 1024 * 1024))  # uncompressed PDFs per archive
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))  # files extracted concurrently
+BATCH_LLM_CONCURRENCY = int(os.environ.get('BATCH_LLM_CONCURRENCY', 2))  # files generating concurrently
+
+
+class BatchError(ValueError):
+    """Raised when a batch upload is malformed or too large"""
+
+
+def read_zip_pdfs(zip_bytes, max_files=BATCH_MAX_FILES, max_file_bytes=16 * 1024 * 1024,
+                  max_total_bytes=BATCH_MAX_ZIP_BYTES):
+    """Return (filename, bytes) pairs for the PDFs inside a zip archive"""
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(zip_bytes))
+    except zipfile.BadZipFile:
+        raise BatchError('Invalid zip archive')
+
+    uploads = []
+    total_bytes = 0
+    with archive:
+        for info in archive.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name.lower().endswith('.pdf') or name.startswith('.'):
+                continue
+            if len(uploads) >= max_files:
+                raise BatchError(f"Batch exceeds {max_files} files")
+            # Check the declared size before decompressing to avoid zip bombs
+            if info.file_size > max_file_bytes:
+                raise BatchError(f"{name} exceeds {max_file_bytes} bytes")
+            total_bytes += info.file_size
+            if total_bytes > max_total_bytes:
+                raise BatchError(f"Zip archive PDFs exceed {max_total_bytes} bytes uncompressed")
+            try:
+                # zipfile stops at the declared size and fails the CRC check of a member that lies about it
+                uploads.append((name, archive.read(info)))
+            except (zipfile.BadZipFile, NotImplementedError, RuntimeError) as e:
+                raise BatchError(f"Cannot read {name} from zip archive: {e}")
+    return uploads
+
+
+def unique_names(filenames):
+    """Disambiguate repeated filenames so each gets its own result entry"""
+    used = set()
+    counts = {}
+    names = []
+    for filename in filenames:
+        name = filename
+        # A suffixed name may itself have been uploaded ('a.pdf (2)'), so keep counting until one is free
+        while name in used:
+            counts[filename] = counts.get(filename, 1) + 1
+            name = f"{filename} ({counts[filename]})"
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def run_batch(uploads, handler, max_workers=BATCH_WORKERS):
+    """Process (filename, bytes) pairs once per distinct content and return a per-file result map"""
+    names = unique_names([filename for filename, _ in uploads])
+
+    # Identical files are processed once and share the result
+    first_by_digest = {}
+    digests = []
+    for name, (_, pdf_bytes) in zip(names, uploads):
+        digest = hashlib.sha256(pdf_bytes).hexdigest()
+        digests.append(digest)
+        first_by_digest.setdefault(digest, (name, pdf_bytes))
+
+    def work(item):
+        name, pdf_bytes = item
+        try:
+            return handler(pdf_bytes, name)
+        except Exception as e:
+            print(f"[ERROR] Batch file {name} failed: {e}")
+            return {'success': False, 'error': str(e), 'status': getattr(e, 'status_code', 500)}
+
+    unique = list(first_by_digest.items())
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique))), thread_name_prefix='batch') as executor:
+        outcomes = dict(zip((digest for digest, _ in unique), executor.map(work, (item for _, item in unique))))
+
+    results = {}
+    for name, digest in zip(names, digests):
+        first_name = first_by_digest[digest][0]
+        result = outcomes[digest]
+        if name != first_name:
+            result = dict(result, duplicate_of=first_name)
+        results[name] = result
+
+    succeeded = sum(1 for result in results.values() if result.get('success'))
+    return {
+        'results': results,
+        'summary': {
+            'files': len(results),
+            'unique': len(unique),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded
+        }
+    }
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark the rule-based fallback generator on large synthetic outlines
+
+Usage: python benchmarks/bench_fallback.py [--topics 10 100 1000] [--subtopics 5] [--repeat 5]
+"""
+
+import argparse
+import time
+
+import common
+from fallback import create_default_structure, generate_structured_json
+
+
+def synthetic_outline(topics, subtopics, numbered=True, seed=0):
+    """Build extracted-text style outline lines ('- 1. ...', '- 1.1 ...')"""
+    items = common.synthetic_outline(topics, subtopics, depth=2, seed=seed)
+    if numbered:
+        return [f"- {numbering} {text}" for numbering, text in items]
+    return [f"- {text}" for _, text in items]
+
+
+def best_of(repeat, func, *args):
+    """Return the fastest of several runs in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--topics', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    parser.add_argument('--subtopics', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'topics':>8} {'lines':>8} {'numbered ms':>12} {'unnumbered ms':>14} {'default ms':>11} {'lines/s':>10}")
+    for topics in args.topics:
+        numbered = synthetic_outline(topics, args.subtopics)
+        unnumbered = synthetic_outline(topics, args.subtopics, numbered=False)
+        numbered_ms = best_of(args.repeat, generate_structured_json, '\n'.join(numbered))
+        unnumbered_ms = best_of(args.repeat, generate_structured_json, '\n'.join(unnumbered))
+        default_ms = best_of(args.repeat, create_default_structure, numbered)
+        rate = len(numbered) / (numbered_ms / 1000) if numbered_ms else float('inf')
+        print(f"{topics:>8} {len(numbered):>8} {numbered_ms:>12.2f} {unnumbered_ms:>14.2f} {default_ms:>11.2f} {rate:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
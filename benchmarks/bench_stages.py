@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark each processing stage on synthetic mindmaps of growing size
+
+Usage: python benchmarks/bench_stages.py [--pages 1 10 50 200] [--depth 2] [--mindmaps 6 10] [--repeat 5] [--json results.json]
+"""
+
+import argparse
+import os
+import tempfile
+from io import BytesIO
+
+from common import make_mindmap_pdf, make_radial_mindmap_pdf, synthetic_outline, time_call, write_results
+from stub_ollama import start_stub_server
+
+
+def outline_text(topics, subtopics, depth):
+    return '\n'.join(f"- {numbering} {text}" for numbering, text in synthetic_outline(topics, subtopics, depth))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 10, 50, 200])
+    parser.add_argument('--topics', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--mindmaps', type=int, nargs='+', default=[6, 10],
+                        help='branch counts of radial mindmaps (4 children per topic, 3 levels deep)')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.0, help='stub Ollama latency for the /process stage')
+    parser.add_argument('--json', help='write machine-readable results to this file')
+    args = parser.parse_args()
+
+    # Point the app at a stub backend and a scratch working directory before importing it
+    _, base_url = start_stub_server(latency=args.latency, tokens_per_second=1e6)
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    os.environ['OLLAMA_BASE_URL'] = base_url
+    os.environ['RESULT_CACHE_DIR'] = os.path.join(workdir, 'cache')
+    os.chdir(workdir)
+
+    from extraction import extract_outline_from_pdf, extract_text_from_pdf
+    from fallback import generate_structured_json
+    from pipeline import parse_json_response
+    import app as app_module
+
+    results = {'extraction': [], 'layout': [], 'fallback': [], 'parse': [], 'process': []}
+
+    for pages in args.pages:
+        pdf_bytes = make_mindmap_pdf(pages, depth=args.depth)
+        row = {'pages': pages, 'bytes': len(pdf_bytes)}
+        row['serial'] = time_call(lambda: extract_text_from_pdf(pdf_bytes, parallel=False), repeat=args.repeat)
+        row['parallel'] = time_call(lambda: extract_text_from_pdf(pdf_bytes, parallel=True), repeat=args.repeat)
+        results['extraction'].append(row)
+
+        client = app_module.app.test_client()
+
+        def process():
+            # route=llm times the Mistral path even when adaptive routing would pick the fallback
+            response = client.post('/process', data={'file': (BytesIO(pdf_bytes), 'bench.pdf'), 'cache': 'bypass',
+                                                     'route': 'llm'}, content_type='multipart/form-data')
+            assert response.status_code == 200, response.get_json()
+
+        results['process'].append({'pages': pages, 'timing': time_call(process, repeat=args.repeat)})
+
+    for branches in args.mindmaps:
+        pdf_bytes, nodes = make_radial_mindmap_pdf(branches, children=4, depth=3)
+        row = {'nodes': len(nodes)}
+        for layout in ('text', 'auto'):
+            outline = extract_outline_from_pdf(pdf_bytes, parallel=False, layout=layout)
+            row[layout] = time_call(lambda: extract_text_from_pdf(pdf_bytes, parallel=False, layout=layout),
+                                    repeat=args.repeat)
+            row[layout]['max_depth'] = max(node.depth for node in outline.nodes)
+        results['layout'].append(row)
+
+    for topics in args.topics:
+        text = outline_text(topics, 5, args.depth)
+        results['fallback'].append({
+            'topics': topics,
+            'lines': text.count('\n') + 1,
+            'timing': time_call(generate_structured_json, text, repeat=args.repeat)
+        })
+        raw = generate_structured_json(text)
+        fenced = f"```json\n{raw}\n```"
+        results['parse'].append({
+            'topics': topics,
+            'bytes': len(raw),
+            'plain': time_call(parse_json_response, raw, repeat=args.repeat),
+            'fenced': time_call(parse_json_response, fenced, repeat=args.repeat)
+        })
+
+    write_results('stages', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Measure cold-start cost: module import times and the first document in a fresh interpreter, with and without warm-up
+
+Usage: python benchmarks/bench_startup.py [--repeat 5] [--modules app async_app pipeline] [--json results.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import REPO_ROOT, make_mindmap_pdf, summarize, write_results
+
+IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import {module}
+print((time.perf_counter() - started) * 1000)
+"""
+
+# Time the first document a worker handles: imports, extraction and fallback generation
+FIRST_DOCUMENT_SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+warm_up_ms = None
+if {warm}:
+    from warmup import warm_up
+    warm_up()
+    warm_up_ms = (time.perf_counter() - started) * 1000
+document_started = time.perf_counter()
+from extraction import extract_outline_from_pdf
+from fallback import generate_structured_json
+with open(sys.argv[1], 'rb') as f:
+    generate_structured_json(extract_outline_from_pdf(f.read()))
+print(json.dumps({{'warm_up_ms': warm_up_ms, 'first_document_ms': (time.perf_counter() - document_started) * 1000}}))
+"""
+
+
+def run_child(code, *args):
+    """Run code in a fresh interpreter from the repository root and return its last output line"""
+    env = dict(os.environ, WARMUP_LLM='0')  # no Ollama needed; connection set-up is not measured
+    result = subprocess.run([sys.executable, '-c', code, *args], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modules', nargs='+', default=['app', 'async_app', 'pipeline', 'extraction', 'llm_client'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--pages', type=int, default=2, help='pages of the first document')
+    parser.add_argument('--json', help='write machine-readable results to this file')
+    args = parser.parse_args()
+
+    results = {'imports': {}, 'first_document': {}}
+    for module in args.modules:
+        timings = [float(run_child(IMPORT_SNIPPET.format(module=module))) for _ in range(args.repeat)]
+        results['imports'][module] = summarize(timings)
+        print(f"import {module:<12} p50 {results['imports'][module]['p50_ms']:8.1f} ms")
+
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
+        f.write(make_mindmap_pdf(args.pages))
+    try:
+        for label, warm in (('cold', False), ('warmed', True)):
+            runs = [json.loads(run_child(FIRST_DOCUMENT_SNIPPET.format(warm=warm), f.name)) for _ in range(args.repeat)]
+            results['first_document'][label] = summarize([run['first_document_ms'] for run in runs])
+            if warm:
+                results['first_document']['warm_up'] = summarize([run['warm_up_ms'] for run in runs])
+            print(f"first document ({label:<6}) p50 {results['first_document'][label]['p50_ms']:8.1f} ms")
+    finally:
+        os.unlink(f.name)
+
+    write_results('startup', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
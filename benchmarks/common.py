@@ -0,0 +1,175 @@
+"""
+Shared helpers for benchmarks: synthetic mindmaps, timing statistics and result output
+"""
+
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+VERBS = ['Load', 'Inspect', 'Clean', 'Handle', 'Validate', 'Normalize', 'Encode', 'Standardize',
+         'Remove', 'Fix', 'Merge', 'Parse', 'Impute', 'Drop', 'Review', 'Summarize']
+OBJECTS = ['customer records', 'missing values', 'duplicate rows', 'column headers', 'data types',
+           'outliers in revenue', 'inconsistent dates', 'categorical fields', 'CSV files', 'report metadata']
+
+
+def synthetic_outline(topics, subtopics, depth=2, seed=0):
+    """Return numbered outline items as (numbering, text) pairs, `depth` levels deep"""
+    rng = random.Random(seed)
+    items = []
+
+    def add(prefix, level):
+        count = topics if level == 1 else subtopics
+        for i in range(1, count + 1):
+            numbering = f"{prefix}{i}." if level == 1 else f"{prefix}{i}"
+            items.append((numbering, f"{rng.choice(VERBS)} {rng.choice(OBJECTS)}"))
+            if level < depth:
+                add(f"{numbering}" if level == 1 else f"{numbering}.", level + 1)
+
+    add('', 1)
+    return items
+
+
+def make_mindmap_pdf(pages, topics_per_page=4, subtopics=4, depth=2, seed=0):
+    """Build an exported-mindmap style PDF with the given number of pages and return its bytes"""
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    items = synthetic_outline(pages * topics_per_page, subtopics, depth, seed)
+    per_page = max(1, -(-len(items) // pages))
+    for start in range(0, pages * per_page, per_page):
+        page = doc.new_page()
+        y = 40
+        for numbering, text in items[start:start + per_page]:
+            level = numbering.rstrip('.').count('.')
+            page.insert_text((40 + 24 * level, y), f"{numbering} {text}", fontsize=9)
+            y += 12
+            if y > page.rect.height - 40:
+                break
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def make_radial_mindmap_pdf(branches, children=3, depth=3, seed=0):
+    """Build a one-page radial mindmap (boxed topics joined by connectors); returns (bytes, [(parent, level, text)])"""
+    import math
+    import fitz  # PyMuPDF
+
+    rng = random.Random(seed)
+    # Lay the tree out with every leaf getting an equal slice of the circle
+    nodes = [(None, 0, 'Central Topic')]
+    kids = {0: []}
+    frontier = [0]
+    for level in range(1, depth + 1):
+        next_frontier = []
+        for parent in frontier:
+            for _ in range(branches if level == 1 else children):
+                kids[parent].append(len(nodes))
+                kids[len(nodes)] = []
+                next_frontier.append(len(nodes))
+                nodes.append((parent, level, f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} {len(nodes)}"))
+        frontier = next_frontier
+
+    leaves = len(frontier)
+    ring = max(140.0, leaves * 100 / (2 * math.pi * depth))  # keeps outer boxes from overlapping
+    size = 2 * ring * (depth + 1) + 200
+    first_leaf = len(nodes) - leaves
+    angles = [0.0] * len(nodes)
+    for index in range(len(nodes) - 1, 0, -1):
+        if index >= first_leaf:
+            angles[index] = 2 * math.pi * (index - first_leaf) / leaves
+        else:
+            angles[index] = sum(angles[i] for i in kids[index]) / len(kids[index])
+
+    doc = fitz.open()
+    page = doc.new_page(width=size, height=size)
+    boxes = []
+    order = list(range(len(nodes)))
+    rng.shuffle(order)  # content-stream order carries no hint of the hierarchy
+    positions = {}
+    for index in range(len(nodes)):
+        _, level, _ = nodes[index]
+        positions[index] = (size / 2 + ring * level * math.sin(angles[index]),
+                            size / 2 - ring * level * math.cos(angles[index]))
+    for index in order:
+        parent, level, text = nodes[index]
+        x, y = positions[index]
+        fontsize = 14 if level == 0 else 6
+        width = fitz.get_text_length(text, fontsize=fontsize)
+        rect = fitz.Rect(x - width / 2 - 3, y - fontsize, x + width / 2 + 3, y + 4)
+        page.draw_rect(rect, color=(0.2, 0.2, 0.6), radius=0.3)
+        page.insert_text((x - width / 2, y), text, fontsize=fontsize)
+        boxes.append((index, rect))
+    rects = dict(boxes)
+    for index in order[::-1]:
+        parent = nodes[index][0]
+        if parent is not None:
+            a, b = rects[parent], rects[index]
+            start = (min(max((b.x0 + b.x1) / 2, a.x0), a.x1), min(max((b.y0 + b.y1) / 2, a.y0), a.y1))
+            end = (min(max((a.x0 + a.x1) / 2, b.x0), b.x1), min(max((a.y0 + a.y1) / 2, b.y0), b.y1))
+            page.draw_line(start, end, color=(0.5, 0.5, 0.5))
+    data = doc.tobytes()
+    doc.close()
+    return data, nodes
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(timings_ms):
+    """Return count, mean and p50/p95/p99 of timings in milliseconds"""
+    return {
+        'count': len(timings_ms),
+        'mean_ms': round(sum(timings_ms) / len(timings_ms), 3) if timings_ms else None,
+        'p50_ms': percentile(timings_ms, 50),
+        'p95_ms': percentile(timings_ms, 95),
+        'p99_ms': percentile(timings_ms, 99)
+    }
+
+
+def time_call(func, *args, repeat=5):
+    """Run func several times and return its timing summary"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return summarize(timings)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and its children in MB"""
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024  # ru_maxrss is bytes on macOS, KB elsewhere
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / scale, 1)
+
+
+def write_results(name, results, json_path=None):
+    """Print results and optionally save them as JSON for regression comparison"""
+    payload = {
+        'benchmark': name,
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+    print(json.dumps(payload, indent=2))
+    if json_path:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2)
+        print(f"[INFO] Results written to {json_path}")
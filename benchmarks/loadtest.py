@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Drive /process concurrently against a stub Ollama backend and report throughput and latency
+
+Usage: python benchmarks/loadtest.py [--clients 8] [--requests 64] [--latency 2.0] [--pages 5] [--json results.json]
+       python benchmarks/loadtest.py --route auto  (let adaptive routing pick Mistral, the fallback or refine)
+       python benchmarks/loadtest.py --server async  (serve the aiohttp app instead of the Flask app)
+       python benchmarks/loadtest.py --url http://localhost:5000  (target an already running server)
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from common import make_mindmap_pdf, peak_rss_mb, summarize, write_results
+from stub_ollama import start_stub_server
+
+
+def start_app_server(stub_url, mode='sync'):
+    """Serve the Flask app (threaded WSGI) or the aiohttp app in this process; returns its base URL"""
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    os.environ['OLLAMA_BASE_URL'] = stub_url
+    os.environ['RESULT_CACHE_DIR'] = os.path.join(workdir, 'cache')
+    os.chdir(workdir)
+
+    if mode == 'async':
+        return start_async_app_server()
+
+    from werkzeug.serving import make_server
+    from app import app
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def start_async_app_server():
+    """Run the aiohttp app on its own event loop in a background thread"""
+    from aiohttp import web
+    from async_app import create_app
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(create_app())
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    loop.run_until_complete(site.start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+
+def run_load(url, pdf_bytes, clients, total_requests, cache_mode, endpoint, route='llm'):
+    """Send total_requests uploads from `clients` concurrent workers"""
+    local = threading.local()
+
+    def one_request(index):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            response = session.post(
+                f"{url}{endpoint}",
+                files={'file': (f"load_{index}.pdf", pdf_bytes, 'application/pdf')},
+                data={'cache': cache_mode, 'route': route},
+                timeout=300
+            )
+            status = response.status_code
+        except requests.RequestException:
+            status = 'error'
+        return status, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        outcomes = list(executor.map(one_request, range(total_requests)))
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for status, _ in outcomes:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    ok_timings = [ms for status, ms in outcomes if status == 200]
+    return {
+        'clients': clients,
+        'requests': total_requests,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(total_requests / elapsed, 2),
+        'statuses': statuses,
+        'latency': summarize(ok_timings),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='existing server to target (default: start the app in-process)')
+    parser.add_argument('--server', default='sync', choices=['sync', 'async'], help='app to start in-process')
+    parser.add_argument('--endpoint', default='/process')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--requests', type=int, default=32)
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=2.0, help='stub Ollama seconds before first token')
+    parser.add_argument('--tokens-per-second', type=float, default=200)
+    parser.add_argument('--cache', default='bypass', choices=['use', 'refresh', 'bypass'])
+    parser.add_argument('--route', default='llm', choices=['auto', 'llm', 'fallback'],
+                        help="generation route; 'llm' keeps adaptive routing from moving load off the Mistral path")
+    parser.add_argument('--json', help='write machine-readable results to this file')
+    args = parser.parse_args()
+
+    url = args.url
+    if not url:
+        _, stub_url = start_stub_server(latency=args.latency, tokens_per_second=args.tokens_per_second)
+        url = start_app_server(stub_url, args.server)
+        print(f"[INFO] App at {url}, stub Ollama at {stub_url}")
+
+    pdf_bytes = make_mindmap_pdf(args.pages)
+    results = {
+        'url': url,
+        'server': None if args.url else args.server,
+        'endpoint': args.endpoint,
+        'route': args.route,
+        'pages': args.pages,
+        'stub_latency_s': None if args.url else args.latency,
+        'runs': [run_load(url, pdf_bytes, clients, args.requests, args.cache, args.endpoint, args.route)
+                 for clients in args.clients]
+    }
+    write_results('loadtest', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
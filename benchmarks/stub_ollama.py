@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Deterministic stand-in for Ollama's /api/generate with configurable latency
+
+Usage: python benchmarks/stub_ollama.py [--port 11435] [--latency 2.0] [--tokens-per-second 200]
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import common  # noqa: F401  (puts the repository root on sys.path)
+from llm_client import stub_completion  # the same answers as the in-process stub:// backend
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    """Serve /api/generate (streaming and non-streaming) and /api/tags"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self._send_json(200, {'models': [{'name': 'stub'}]})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/api/generate':
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        settings = self.server.settings
+        with self.server.lock:
+            self.server.requests_served += 1
+            fail = settings['fail_every'] and self.server.requests_served % settings['fail_every'] == 0
+        if fail:
+            self._send_json(503, {'error': 'stub failure'})
+            return
+
+        completion = stub_completion(request.get('prompt', ''))
+        time.sleep(settings['latency'])
+
+        if not request.get('stream', True):
+            time.sleep(len(completion) / 4 / settings['tokens_per_second'])
+            self._send_json(200, {'model': request.get('model'), 'response': completion, 'done': True})
+            return
+
+        # Stream roughly four characters per token
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        delay = 1 / settings['tokens_per_second']
+        for start in range(0, len(completion), 4):
+            self._write_chunk({'model': request.get('model'), 'response': completion[start:start + 4], 'done': False})
+            time.sleep(delay)
+        self._write_chunk({'model': request.get('model'), 'response': '', 'done': True})
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, payload):
+        data = json.dumps(payload).encode('utf-8') + b'\n'
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+
+def start_stub_server(port=0, latency=0.5, tokens_per_second=500, fail_every=0):
+    """Start the stub in a background thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubOllamaHandler)
+    server.daemon_threads = True
+    server.settings = {'latency': latency, 'tokens_per_second': tokens_per_second, 'fail_every': fail_every}
+    server.lock = threading.Lock()
+    server.requests_served = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--latency', type=float, default=2.0, help='seconds before the first token')
+    parser.add_argument('--tokens-per-second', type=float, default=200)
+    parser.add_argument('--fail-every', type=int, default=0, help='answer every Nth request with 503')
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.latency, args.tokens_per_second, args.fail_every)
+    print(f"Stub Ollama listening on {base_url} (set OLLAMA_BASE_URL={base_url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
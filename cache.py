@@ -0,0 +1,141 @@
+"""
+Content-addressed result cache for processed PDF documents
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Configure cache settings
+CACHE_DIR = os.environ.get('RESULT_CACHE_DIR', 'cache')
+CACHE_MAX_BYTES = int(os.environ.get('RESULT_CACHE_MAX_BYTES', 256 * 1024 * 1024))  # 256MB on disk
+
+
+def make_cache_key(pdf_bytes, prompt_version):
+    """Build a cache key from the uploaded bytes and the prompt/model version"""
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(pdf_bytes).digest())
+    digest.update(prompt_version.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Size-bounded LRU cache persisted as one JSON file per entry"""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self):
+        """Rebuild the LRU order from file modification times"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return  # the directory is created by the first put
+        found = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            found.append((stat.st_mtime, name[:-len('.json')], stat.st_size))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its budget"""
+        while self._entries and self._total_bytes > self.max_bytes:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _forget(self, key):
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def get(self, key):
+        """Return the cached entry for key, or None"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                os.utime(path)  # persist recency across restarts
+            except (OSError, ValueError):
+                self._forget(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        """Store an entry, evicting old ones if the cache grows too large"""
+        data = json.dumps(entry).encode('utf-8')
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._forget(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def invalidate(self, key):
+        """Remove a single entry; returns True if it existed"""
+        with self._lock:
+            existed = key in self._entries
+            self._forget(key)
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+            return existed
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    os.unlink(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """Return cache counters for monitoring"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
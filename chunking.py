@@ -0,0 +1,48 @@
+"""
+Split large outlines into chunks and generate them concurrently
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from outline import as_outline
+
+# Configure chunking settings
+LLM_PARALLELISM = int(os.environ.get('LLM_PARALLELISM', 2))  # concurrent LLM calls per document
+LLM_CHUNK_MAX_CHARS = int(os.environ.get('LLM_CHUNK_MAX_CHARS', 3000))  # outline characters per prompt
+
+
+def split_sections(outline):
+    """Split an Outline (or outline text) into Outlines starting at top-level numbered topics"""
+    return as_outline(outline).sections()
+
+
+def split_outline(outline, max_chars=LLM_CHUNK_MAX_CHARS):
+    """Group whole top-level sections into chunks of at most max_chars (one section may exceed it)"""
+    sections = [section.text for section in split_sections(outline)]
+    return ['\n'.join(sections[index] for index in group) for group in pack_sections(sections, max_chars)]
+
+
+def pack_sections(section_texts, max_chars=LLM_CHUNK_MAX_CHARS):
+    """Group consecutive sections into runs of at most max_chars; returns lists of section indexes"""
+    groups = []
+    current = []
+    size = 0
+    for index, section_text in enumerate(section_texts):
+        if current and size + len(section_text) + 1 > max_chars:
+            groups.append(current)
+            current = []
+            size = 0
+        current.append(index)
+        size += len(section_text) + 1
+    if current:
+        groups.append(current)
+    return groups
+
+
+def generate_chunks(chunks, generate, max_parallel=LLM_PARALLELISM):
+    """Run generate on every chunk with bounded concurrency, returning results in outline order"""
+    if len(chunks) <= 1 or max_parallel <= 1:
+        return [generate(chunk) for chunk in chunks]
+    with ThreadPoolExecutor(max_workers=min(max_parallel, len(chunks)), thread_name_prefix='chunk') as executor:
+        return list(executor.map(generate, chunks))
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Headless batch converter: turn directories or globs of PDF mindmaps into agent JSON, one JSON Lines record per file
+
+Usage: python cli.py mindmaps/ 'archive/**/*.pdf' -o results.jsonl [--resume] [--fallback-only] [--workers 8]
+"""
+
+import argparse
+import functools
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from batch import BATCH_LLM_CONCURRENCY
+from extraction import PDF_WORKERS, extract_outline_from_pdf
+from fallback import generate_structured_json
+from outline import OutlineBuilder
+from pipeline import (
+    ProcessingError, generate_agent_json, lookup_cached_result, parse_json_response, route_generation,
+    store_cached_result
+)
+
+PROGRESS_INTERVAL = 5.0  # seconds between progress lines
+
+
+def iter_pdf_paths(inputs, recursive=True):
+    """Yield PDF paths from files, directories and glob patterns, each once, in sorted order per input"""
+    seen = set()
+    for value in inputs:
+        if os.path.isdir(value):
+            pattern = os.path.join(value, '**', '*') if recursive else os.path.join(value, '*')
+            paths = glob.glob(pattern, recursive=recursive)
+        elif os.path.isfile(value):
+            paths = [value]
+        else:
+            paths = glob.glob(value, recursive=True)
+        for path in sorted(paths):
+            if path.lower().endswith('.pdf') and os.path.isfile(path):
+                key = os.path.realpath(path)
+                if key not in seen:
+                    seen.add(key)
+                    yield path
+
+
+def read_done_hashes(output_path, retry_fallback=False):
+    """Return the file hashes already converted successfully in an existing JSON Lines output"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut off by an interrupted run
+            if record.get('status') == 'ok' and not (retry_fallback and record.get('source') == 'fallback'):
+                done.add(record['sha256'])
+    return done
+
+
+def extract_items(path):
+    """Worker: return the (label, page, bbox, root) outline lines of one PDF"""
+    outline = extract_outline_from_pdf(path, parallel=False)
+    # An unnumbered top-level line (a loose mindmap box) must not attach to the topic before it when rebuilt
+    return [(node.label, node.page, node.bbox, node.depth == 1 and not node.path) for node in outline.nodes]
+
+
+def build_outline(items):
+    builder = OutlineBuilder()
+    for label, page, bbox, root in items:
+        builder.add(label, page, bbox, root)
+    return builder.finish()
+
+
+class Converter:
+    """Extract across a process pool, generate with bounded concurrency and append one record per file"""
+
+    def __init__(self, output, workers=PDF_WORKERS, llm_concurrency=BATCH_LLM_CONCURRENCY, route='auto',
+                 cache_mode='use', done=None, progress_interval=PROGRESS_INTERVAL):
+        self.output = output
+        self.workers = workers
+        self.llm_concurrency = llm_concurrency
+        self.route = route
+        self.cache_mode = cache_mode
+        self.done = done if done is not None else set()
+        self.progress_interval = progress_interval
+        # Documents extracted but not yet written; keeps memory flat when extraction outpaces generation
+        self.window = workers * 2 + llm_concurrency
+        self._slots = threading.BoundedSemaphore(self.window)
+        self._lock = threading.Lock()
+        self.counts = {'found': 0, 'skipped': 0, 'ok': 0, 'failed': 0}
+        self.sources = {}
+        self.started = None
+        self._last_progress = 0.0
+
+    def run(self, paths):
+        """Convert every path and return the final counts"""
+        self.started = self._last_progress = time.monotonic()
+        # Spawned (not forked) workers, as for page-parallel extraction
+        extract_pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        generate_pool = ThreadPoolExecutor(max_workers=self.llm_concurrency, thread_name_prefix='generate')
+        try:
+            for path in paths:
+                self.counts['found'] += 1
+                with open(path, 'rb') as f:
+                    pdf_bytes = f.read()
+                digest = hashlib.sha256(pdf_bytes).hexdigest()
+                if digest in self.done:
+                    self.counts['skipped'] += 1
+                    continue
+                self.done.add(digest)  # identical files later in this run are skipped too
+
+                self._slots.acquire()
+                cache_key, cached = lookup_cached_result(pdf_bytes, self.cache_mode)
+                if cached:
+                    self._write(self._record(path, digest, 'cache', None, cached['json_data'], cached['extracted_text'],
+                                             time.monotonic()))
+                    continue
+                submitted = time.monotonic()
+                future = extract_pool.submit(extract_items, path)
+                # Generation is queued as soon as the extraction finishes, with the finished future as last argument
+                future.add_done_callback(functools.partial(generate_pool.submit, self._generate, path, digest,
+                                                           cache_key, submitted))
+
+            # Every slot comes back once the last record is written
+            for _ in range(self.window):
+                self._slots.acquire()
+        finally:
+            extract_pool.shutdown()
+            generate_pool.shutdown()
+        self._report(final=True)
+        return self.counts
+
+    def _generate(self, path, digest, cache_key, submitted, future):
+        try:
+            outline = build_outline(future.result())
+            if not outline.nodes:
+                raise ProcessingError('No text could be extracted from the PDF', 400)
+            decision = route_generation(outline, os.path.basename(path), self.route)
+            if decision.uses_llm:
+                raw_output, source = generate_agent_json(outline, self.cache_mode)
+            else:
+                raw_output, source = generate_structured_json(outline), 'fallback'
+            parsed_json, parse_error = parse_json_response(raw_output)
+            if parse_error:
+                raise ProcessingError(parse_error, 500)
+            store_cached_result(cache_key, self.cache_mode, source, outline, raw_output, parsed_json)
+            record = self._record(path, digest, source, decision.to_dict(), parsed_json, outline.text, submitted)
+        except Exception as e:
+            print(f"[ERROR] {path}: {e}")
+            record = {'file': path, 'sha256': digest, 'status': 'error', 'error': str(e),
+                      'seconds': round(time.monotonic() - submitted, 3)}
+        self._write(record)
+
+    def _record(self, path, digest, source, route, parsed_json, mindmap_text, submitted):
+        return {
+            'file': path,
+            'sha256': digest,
+            'status': 'ok',
+            'source': source,
+            'route': route,
+            'json_data': parsed_json,
+            'extracted_text': mindmap_text,
+            'seconds': round(time.monotonic() - submitted, 3)
+        }
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            # Flushed per record so an interrupted run can be resumed from the file
+            self.output.write(line + '\n')
+            self.output.flush()
+            if record['status'] == 'ok':
+                self.counts['ok'] += 1
+                self.sources[record['source']] = self.sources.get(record['source'], 0) + 1
+            else:
+                self.counts['failed'] += 1
+            self._report()
+        self._slots.release()
+
+    def _report(self, final=False):
+        now = time.monotonic()
+        if not final and now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+        elapsed = max(now - self.started, 1e-9)
+        converted = self.counts['ok'] + self.counts['failed']
+        sources = ', '.join(f"{source}={count}" for source, count in sorted(self.sources.items())) or 'none'
+        label = 'DONE' if final else 'PROGRESS'
+        print(f"[{label}] {converted} converted ({self.counts['ok']} ok, {self.counts['failed']} failed), "
+              f"{self.counts['skipped']} skipped of {self.counts['found']} found in {elapsed:.1f}s "
+              f"- {converted / elapsed:.2f} files/s (sources: {sources})", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help='PDF files, directories or glob patterns')
+    parser.add_argument('-o', '--output', required=True, help='JSON Lines file to write')
+    parser.add_argument('--resume', action='store_true', help='append to the output, skipping files already converted')
+    parser.add_argument('--retry-fallback', action='store_true',
+                        help='with --resume, convert files again whose previous result came from the fallback')
+    parser.add_argument('--fallback-only', action='store_true', help='use the rule-based generator, never Mistral')
+    parser.add_argument('--workers', type=int, default=PDF_WORKERS, help='extraction processes')
+    parser.add_argument('--llm-concurrency', type=int, default=BATCH_LLM_CONCURRENCY,
+                        help='documents generating at once')
+    parser.add_argument('--cache', default='use', choices=['use', 'refresh', 'bypass'], help='result cache mode')
+    parser.add_argument('--no-recursive', action='store_true', help='do not descend into subdirectories')
+    args = parser.parse_args(argv)
+
+    done = read_done_hashes(args.output, args.retry_fallback) if args.resume else set()
+    if done:
+        print(f"[INFO] Resuming: {len(done)} files already converted in {args.output}", file=sys.stderr)
+
+    with open(args.output, 'a' if args.resume else 'w', encoding='utf-8') as output:
+        converter = Converter(output, workers=max(1, args.workers), llm_concurrency=max(1, args.llm_concurrency),
+                              route='fallback' if args.fallback_only else 'auto', cache_mode=args.cache, done=done)
+        try:
+            counts = converter.run(iter_pdf_paths(args.inputs, recursive=not args.no_recursive))
+        except KeyboardInterrupt:
+            print("[WARN] Interrupted; run again with --resume to continue", file=sys.stderr)
+            return 130
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+Streaming PDF text extraction with optional page-parallel processing
+"""
+
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+
+from layout import mindmap_items
+from outline import OutlineBuilder
+
+# Configure extraction settings
+PDF_MAX_PAGES = int(os.environ.get('PDF_MAX_PAGES', 500))
+PDF_MAX_TEXT_CHARS = int(os.environ.get('PDF_MAX_TEXT_CHARS', 1_000_000))
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', os.cpu_count() or 1))  # processes for parallel extraction
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 32))  # smaller documents stay serial
+PDF_PAGES_PER_TASK = int(os.environ.get('PDF_PAGES_PER_TASK', 8))
+PDF_LAYOUT = os.environ.get('PDF_LAYOUT', 'auto')  # 'auto', 'graph' (connectors always win) or 'text'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PDFLimitError(ValueError):
+    """Raised when a PDF exceeds the configured page or text limits"""
+
+
+def iter_page_items(page):
+    """Yield (line, bbox) for the non-empty text lines of a page, top-to-bottom"""
+    blocks = page.get_text("blocks")
+    for block in sorted(blocks, key=lambda b: (b[1], b[0])):  # sort top-to-bottom
+        bbox = tuple(round(value, 1) for value in block[:4])
+        # Split block text into individual lines
+        for line in block[4].split('\n'):
+            line = line.strip()
+            if line:
+                yield line, bbox
+
+
+def iter_page_lines(page):
+    """Yield the non-empty text lines of a page, top-to-bottom"""
+    for line, _ in iter_page_items(page):
+        yield line
+
+
+def _page_items(page, layout):
+    """Return (line, bbox, level) for a page, using connector geometry when the page is a mindmap"""
+    if layout != 'text':
+        items = mindmap_items(page, force=layout == 'graph')
+        if items is not None:
+            return items
+    return [(line, bbox, None) for line, bbox in iter_page_items(page)]
+
+
+def _number_levels(items):
+    """Turn mindmap levels into outline numbering that continues across pages; returns (line, page, bbox, root)
+
+    Every central topic becomes a numbered top-level topic with its branches nested under it. root marks
+    the boxes no connector reaches on a mindmap page, which start a new top-level line of their own.
+    """
+    counters = []
+    for page, page_items in groupby(items, key=lambda item: item[1]):
+        page_items = list(page_items)
+        mindmap = any(level is not None for _, _, _, level in page_items)
+        for line, _, bbox, level in page_items:
+            if level is not None:
+                depth = level + 1
+                del counters[depth:]
+                counters.extend([0] * (depth - len(counters)))
+                counters[depth - 1] += 1
+                number = '.'.join(map(str, counters))
+                line = f"{number}. {line}" if depth == 1 else f"{number} {line}"
+            yield line, page, bbox, mindmap and level is None
+
+
+def open_pdf(source):
+    """Open a PDF from a path, bytes or a binary file-like object"""
+    # PyMuPDF is imported on first use so processes that never open a PDF start faster
+    import fitz  # PyMuPDF
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=bytes(source), filetype='pdf')
+    if hasattr(source, 'read'):
+        return fitz.open(stream=source.read(), filetype='pdf')
+    return fitz.open(source)
+
+
+def _extract_page_range(pdf_path, start, stop, layout):
+    """Worker: return the (line, page, bbox, level) items of pages [start, stop)"""
+    with open_pdf(pdf_path) as doc:
+        return [[(line, number + 1, bbox, level) for line, bbox, level in _page_items(doc[number], layout)]
+                for number in range(start, stop)]
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned (not forked) workers are safe to start from a threaded server
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _iter_parallel_items(pdf_path, page_count, layout):
+    """Extract page ranges across the process pool, yielding items in page order"""
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count))
+              for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+    futures = [_get_pool().submit(_extract_page_range, pdf_path, start, stop, layout) for start, stop in ranges]
+    try:
+        for future in futures:
+            for page_items in future.result():
+                yield from page_items
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _iter_spilled_items(doc, page_count, layout):
+    """Write an in-memory document to a temporary file so pool workers can open it by path"""
+    with tempfile.NamedTemporaryFile(suffix='.pdf') as temp_file:
+        temp_file.write(doc.tobytes())
+        temp_file.flush()
+        doc.close()
+        yield from _iter_parallel_items(temp_file.name, page_count, layout)
+
+
+def iter_pdf_items(source, max_pages=PDF_MAX_PAGES, parallel=None, layout=PDF_LAYOUT):
+    """Yield (line, page, bbox) page by page, enforcing the page limit before any extraction"""
+    for line, page, bbox, _ in _number_levels(_iter_leveled_items(source, max_pages, parallel, layout)):
+        yield line, page, bbox
+
+
+def _iter_leveled_items(source, max_pages, parallel, layout):
+    doc = open_pdf(source)
+    try:
+        page_count = doc.page_count
+        if page_count > max_pages:
+            raise PDFLimitError(f"PDF has {page_count} pages (limit is {max_pages})")
+
+        if parallel is None:
+            parallel = PDF_WORKERS > 1 and page_count >= PDF_PARALLEL_MIN_PAGES
+
+        if parallel and isinstance(source, (str, os.PathLike)):
+            # PyMuPDF holds the GIL, so pages are extracted in separate processes
+            doc.close()
+            yield from _iter_parallel_items(source, page_count, layout)
+        elif parallel:
+            # Spill once rather than pickling the whole document into every task
+            yield from _iter_spilled_items(doc, page_count, layout)
+        else:
+            for number, page in enumerate(doc, 1):
+                for line, bbox, level in _page_items(page, layout):
+                    yield line, number, bbox, level
+    finally:
+        if not doc.is_closed:
+            doc.close()
+
+
+def iter_pdf_lines(source, max_pages=PDF_MAX_PAGES, parallel=None, layout=PDF_LAYOUT):
+    """Yield text lines page by page, enforcing the page limit before any extraction"""
+    for line, _, _ in iter_pdf_items(source, max_pages, parallel, layout):
+        yield line
+
+
+def extract_outline_from_pdf(source, max_pages=PDF_MAX_PAGES, max_chars=PDF_MAX_TEXT_CHARS, parallel=None,
+                             layout=PDF_LAYOUT):
+    """Extract the outline tree from a PDF path, bytes or file-like object in a single pass"""
+    builder = OutlineBuilder()
+    total_chars = 0
+    for line, page, bbox, root in _number_levels(_iter_leveled_items(source, max_pages, parallel, layout)):
+        node = builder.add(line, page, bbox, root)
+        total_chars += len(node.label) + 3  # "- " bullet and newline
+        if total_chars > max_chars:
+            raise PDFLimitError(f"PDF text exceeds {max_chars} characters")
+    return builder.finish()
+
+
+def extract_text_from_pdf(source, max_pages=PDF_MAX_PAGES, max_chars=PDF_MAX_TEXT_CHARS, parallel=None,
+                          layout=PDF_LAYOUT):
+    """Extract text from a PDF path, bytes or file-like object using PyMuPDF"""
+    return extract_outline_from_pdf(source, max_pages, max_chars, parallel, layout).text
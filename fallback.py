@@ -0,0 +1,333 @@
+"""
+Rule-based agent hierarchy generator used when Mistral is not available
+"""
+
+import json
+from collections import namedtuple
+
+from outline import as_outline
+
+# Topic categories in priority order: the first keyword found in a topic wins
+Category = namedtuple('Category', 'keyword agent_name agent_description subagent_name subagent_description')
+
+CATEGORIES = (
+    Category('load', 'Raw Data Handler Agent',
+             'Manages the initial acquisition and loading of raw data from various sources including databases, files, and APIs.',
+             'Data Loader',
+             'Executes data loading operations from various sources and handles connection management.'),
+    Category('inspect', 'Data Inspector Agent',
+             'Performs comprehensive inspection and profiling of data to understand structure, quality, and characteristics.',
+             'Data Inspector',
+             'Performs detailed data inspection and generates comprehensive data quality reports.'),
+    Category('clean', 'Data Cleaner Agent',
+             'Handles data cleaning operations including removing inconsistencies, duplicates, and handling missing values.',
+             'Data Cleaner',
+             'Implements specific data cleaning algorithms and quality improvement procedures.'),
+    Category('column', 'Column Manager Agent',
+             'Manages column-level operations including renaming, reordering, and metadata management.',
+             'Column Processor',
+             'Handles column-specific transformations and metadata operations.'),
+    Category('data type', 'Data Type Manager Agent',
+             'Handles data type conversions and ensures proper data type assignments across the dataset.',
+             'Type Converter',
+             'Executes data type conversions and validates type consistency.'),
+    Category('inconsistent', 'Inconsistency Resolver Agent',
+             'Identifies and resolves data inconsistencies, standardizes formats, and ensures data integrity.',
+             'Consistency Manager',
+             'Identifies inconsistencies and applies standardization rules.'),
+    Category('outlier', 'Outlier Handler Agent',
+             'Detects, analyzes, and handles outliers using statistical methods and domain knowledge.',
+             'Outlier Detector',
+             'Detects anomalies and applies appropriate outlier treatment strategies.'),
+    Category('missing', 'Missing Data Handler Agent',
+             'Implements strategies for handling missing data including imputation, removal, and flagging.',
+             'Missing Value Handler',
+             'Implements missing data strategies including imputation and removal techniques.'),
+    Category('duplicate', 'Duplicate Data Handler Agent',
+             'Identifies and removes duplicate records while preserving data integrity and relationships.',
+             'Duplicate Resolver',
+             'Identifies duplicate records and applies deduplication algorithms.'),
+    Category('standardize', 'Value Standardizer Agent',
+             'Standardizes data values, formats, and structures to ensure consistency across the dataset.',
+             'Value Standardizer',
+             'Applies standardization rules and format conversions.'),
+    Category('encode', 'Categorical Encoder Agent',
+             'Handles categorical data encoding including one-hot encoding, label encoding, and feature engineering.',
+             'Category Encoder',
+             'Performs categorical encoding and feature transformation operations.'),
+    Category('validate', 'Data Validator Agent',
+             'Performs data validation checks to ensure data quality, completeness, and business rule compliance.',
+             'Data Validator',
+             'Executes validation rules and ensures data quality standards.'),
+    Category('normalize', 'Data Normalizer Agent',
+             'Applies normalization and scaling techniques to prepare data for analysis and modeling.',
+             'Data Normalizer',
+             'Applies normalization algorithms and scaling transformations.'),
+)
+
+# Keywords that mark a line as a main topic, unless it also looks like a detailed sub-action
+MAIN_TOPIC_KEYWORDS = frozenset([
+    'load', 'inspect', 'clean', 'handle', 'process', 'analyze',
+    'normalize', 'validate', 'convert', 'standardize', 'encode'
+])
+SUB_ACTION_KEYWORDS = frozenset([
+    'remove', 'strip', 'fix', 'map', 'merge', 'drop', 'find',
+    'parse', 'convert data types', 'impute', 'encode categorical'
+])
+
+# Groups for the default structure in output order; the last group catches everything else
+DefaultGroup = namedtuple('DefaultGroup', 'agent_name agent_description subagent_name subagent_description keywords')
+
+DEFAULT_GROUPS = (
+    DefaultGroup('Raw Data Handler Agent',
+                 'Manages the initial acquisition and loading of raw data from various sources including databases, files, and APIs.',
+                 'Data Loader',
+                 'Executes data loading operations from various sources and handles connection management.',
+                 ('load', 'import', 'extract', 'file format', 'encoding')),
+    DefaultGroup('Column Manager Agent',
+                 'Manages column-level operations including renaming, reordering, and metadata management.',
+                 'Column Processor',
+                 'Handles column-specific transformations and metadata operations.',
+                 ('column', 'header', 'metadata', 'whitespace')),
+    DefaultGroup('Data Type Manager Agent',
+                 'Handles data type conversions and ensures proper data type assignments across the dataset.',
+                 'Type Converter',
+                 'Executes data type conversions and validates type consistency.',
+                 ('data type', 'convert', 'numeric', 'categorical', 'parse')),
+    DefaultGroup('Data Cleaner Agent',
+                 'Handles data cleaning operations including removing inconsistencies, duplicates, and handling missing values.',
+                 'Data Processor',
+                 'Implements specific data cleaning algorithms and quality improvement procedures.',
+                 ()),
+)
+
+_encode_string = json.encoder.encode_basestring_ascii
+
+
+class KeywordMatcher:
+    """Find every keyword occurring in a text with one pass over a precompiled keyword table"""
+
+    def __init__(self, keywords):
+        # For a few dozen keywords, C substring search beats a regex alternation
+        # that has to be attempted at every character position
+        self.keywords = tuple(sorted(set(keywords)))
+
+    def find(self, text):
+        """Return the set of keywords that occur in text (case-insensitive)"""
+        text = text.lower()
+        return {keyword for keyword in self.keywords if keyword in text}
+
+
+CATEGORY_RANK = {category.keyword: rank for rank, category in enumerate(CATEGORIES)}
+
+# One matcher answers both "is this a main topic?" and "which category?" per line
+MATCHER = KeywordMatcher(list(CATEGORY_RANK) + list(MAIN_TOPIC_KEYWORDS) + list(SUB_ACTION_KEYWORDS))
+
+
+def _category(found):
+    """Return the highest-priority category among the found keywords, or None"""
+    ranks = [CATEGORY_RANK[keyword] for keyword in found if keyword in CATEGORY_RANK]
+    return CATEGORIES[min(ranks)] if ranks else None
+
+
+def _is_main_topic(found):
+    return bool(found & MAIN_TOPIC_KEYWORDS) and not (found & SUB_ACTION_KEYWORDS)
+
+
+def _default_group(line_lower):
+    # Groups are tried in order, so stopping at the first hit needs no full keyword set
+    for group in DEFAULT_GROUPS:
+        if not group.keywords:
+            return group
+        for keyword in group.keywords:
+            if keyword in line_lower:
+                return group
+
+
+def generate_structured_json(outline):
+    """Generate a well-structured hierarchical JSON when Mistral is not available"""
+    outline = as_outline(outline)
+
+    # Walk the outline to identify main topics and subtopics
+    parsed_structure = []
+    current_main = None
+    group = None  # numbered subtopic whose deeper levels become a subagent of their own
+
+    for node in outline.nodes:
+        if group is not None and node.index < group['end']:
+            group['actions'].append(node.label)
+            continue
+        group = None
+
+        found = MATCHER.find(node.label)
+
+        # Check if it's a main topic (top-level numbered or major heading); third-level numbering never is
+        if (node.depth == 1 and node.path) or (_is_main_topic(found) and (node.depth <= 2 or not node.path)):
+            if current_main:
+                parsed_structure.append(current_main)
+            current_main = {
+                'topic': node.label,
+                'category': _category(found),
+                'subtopics': [],
+                'groups': []
+            }
+            continue
+
+        if not current_main:
+            # Create a default main topic if none exists
+            current_main = {
+                'topic': 'Base Processing Tasks',
+                'category': None,
+                'subtopics': [],
+                'groups': []
+            }
+        if node.path and any(child.path for child in node.children):
+            group = {'topic': node.text, 'category': _category(found), 'end': node.end, 'actions': []}
+            current_main['groups'].append(group)
+        else:
+            # This is a subtopic/action
+            current_main['subtopics'].append(node.label)
+
+    # Don't forget the last main topic
+    if current_main:
+        parsed_structure.append(current_main)
+
+    # Convert parsed structure to agent hierarchy
+    agents = []
+
+    for item in parsed_structure:
+        topic = item['topic']
+        subtopics = item['subtopics']
+        category = item['category']
+
+        subagents = [_subagent(group['topic'], group['category'], group['actions']) for group in item['groups']]
+        if subtopics or not subagents:
+            subagents.insert(0, _subagent(topic, category, subtopics if subtopics else [topic]))
+        agents.append({
+            "name": category.agent_name if category else _default_agent_name(topic),
+            "description": category.agent_description if category else _default_agent_description(topic),
+            "subagents": subagents
+        })
+
+    # If no structure was found, create a comprehensive data processing structure
+    if not agents:
+        agents = create_default_structure([node.label for node in outline.nodes])
+
+    result = {
+        "agents": agents
+    }
+
+    return dump_agents(result)
+
+
+def _subagent(topic, category, actions):
+    return {
+        "name": category.subagent_name if category else _default_subagent_name(topic),
+        "description": category.subagent_description if category else _default_subagent_description(topic),
+        "actions": actions
+    }
+
+
+def dump_agents(result):
+    """Serialize an agents hierarchy exactly like json.dumps(result, indent=2), much faster"""
+    # json.dumps falls back to its pure-Python encoder whenever indent is set; the
+    # hierarchy has a fixed shape, so it is laid out here with C-encoded strings instead
+    if list(result) != ['agents'] or not all(_is_plain_agent(agent) for agent in result['agents']):
+        return json.dumps(result, indent=2)
+    if not result['agents']:
+        return '{\n  "agents": []\n}'
+
+    agents = []
+    for agent in result['agents']:
+        subagents = []
+        for subagent in agent['subagents']:
+            if subagent['actions']:
+                actions = '[\n            ' + ',\n            '.join(map(_encode_string, subagent['actions'])) + '\n          ]'
+            else:
+                actions = '[]'
+            subagents.append(
+                '{\n          "name": ' + _encode_string(subagent['name'])
+                + ',\n          "description": ' + _encode_string(subagent['description'])
+                + ',\n          "actions": ' + actions + '\n        }'
+            )
+        agents.append(
+            '{\n      "name": ' + _encode_string(agent['name'])
+            + ',\n      "description": ' + _encode_string(agent['description'])
+            + ',\n      "subagents": '
+            + ('[\n        ' + ',\n        '.join(subagents) + '\n      ]' if subagents else '[]')
+            + '\n    }'
+        )
+    return '{\n  "agents": [\n    ' + ',\n    '.join(agents) + '\n  ]\n}'
+
+
+def _is_plain_agent(agent):
+    return (list(agent) == ['name', 'description', 'subagents']
+            and all(list(subagent) == ['name', 'description', 'actions']
+                    and all(isinstance(action, str) for action in subagent['actions'])
+                    for subagent in agent['subagents']))
+
+
+def _default_agent_name(topic):
+    return f"{topic.split('.')[0].strip().title()} Handler Agent"
+
+
+def _default_agent_description(topic):
+    return f"Handles {topic.lower()} operations and ensures proper processing of related tasks."
+
+
+def _default_subagent_name(topic):
+    return f"{topic.split('.')[0].strip().title()} Processor"
+
+
+def _default_subagent_description(topic):
+    return f"Processes {topic.lower()} related tasks and maintains data quality standards."
+
+
+def is_main_topic(line):
+    """Determine if a line represents a main topic"""
+    return _is_main_topic(MATCHER.find(line))
+
+
+def generate_agent_name(topic):
+    """Generate descriptive agent name from topic"""
+    category = _category(MATCHER.find(topic))
+    return category.agent_name if category else _default_agent_name(topic)
+
+
+def generate_agent_description(topic):
+    """Generate descriptive agent description from topic"""
+    category = _category(MATCHER.find(topic))
+    return category.agent_description if category else _default_agent_description(topic)
+
+
+def generate_subagent_name(topic):
+    """Generate descriptive subagent name from topic"""
+    category = _category(MATCHER.find(topic))
+    return category.subagent_name if category else _default_subagent_name(topic)
+
+
+def generate_subagent_description(topic):
+    """Generate descriptive subagent description from topic"""
+    category = _category(MATCHER.find(topic))
+    return category.subagent_description if category else _default_subagent_description(topic)
+
+
+def create_default_structure(lines):
+    """Create a comprehensive default structure for data processing"""
+    actions = {group.agent_name: [] for group in DEFAULT_GROUPS}
+
+    # Categorize actions based on keywords
+    for line in lines:
+        line_clean = line[2:] if line.startswith('- ') else line
+        actions[_default_group(line_clean.lower()).agent_name].append(line_clean)
+
+    # Build agents structure, only including agents with actions
+    return [{
+        "name": group.agent_name,
+        "description": group.agent_description,
+        "subagents": [{
+            "name": group.subagent_name,
+            "description": group.subagent_description,
+            "actions": actions[group.agent_name]
+        }]
+    } for group in DEFAULT_GROUPS if actions[group.agent_name]]
@@ -0,0 +1,17 @@
+"""
+Gunicorn hooks, loaded automatically from the working directory
+
+Heavy libraries are imported once in the master, so recycled and newly forked workers start with them
+already loaded; each worker then warms its own extraction, fallback and Ollama connection.
+"""
+
+from warmup import preload_libraries, warm_up
+
+
+def on_starting(server):
+    loaded = preload_libraries()
+    server.log.info("Preloaded %s", ', '.join(loaded))
+
+
+def post_fork(server, worker):
+    warm_up()
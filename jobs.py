@@ -0,0 +1,157 @@
+"""
+Background job queue for long-running document processing
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure job settings
+JOB_MAX_WORKERS = int(os.environ.get('JOB_MAX_WORKERS', 2))  # concurrent jobs against Ollama
+JOB_MAX_QUEUE = int(os.environ.get('JOB_MAX_QUEUE', 16))  # queued + running jobs
+JOB_TIMEOUT = float(os.environ.get('JOB_TIMEOUT', 120))  # seconds per job, from the start of generation
+JOB_RESULT_TTL = float(os.environ.get('JOB_RESULT_TTL', 3600))  # seconds to keep finished jobs
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no free slots"""
+
+
+class Job:
+    """State of a single submitted job"""
+
+    def __init__(self, filename):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.status = 'queued'  # queued (until generation starts), running, succeeded, failed
+        self.stage = 'queued'
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.status_code = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    def to_dict(self):
+        """Serialize the job for the status endpoint"""
+        data = {
+            'id': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': round(self.progress, 2),
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.error:
+            data['error'] = self.error
+        if self.result is not None:
+            data['result'] = self.result
+        return data
+
+
+class JobQueue:
+    """Bounded worker pool that runs a processing function in the background
+
+    The handler is called with progress(stage, fraction) and started() keyword arguments. A job stays queued,
+    and its timeout does not run, until the handler calls started() (e.g. once it holds a generation slot).
+    """
+
+    def __init__(self, handler, max_workers=JOB_MAX_WORKERS, max_queue=JOB_MAX_QUEUE,
+                 timeout=JOB_TIMEOUT, result_ttl=JOB_RESULT_TTL):
+        self.handler = handler
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def _active_count(self):
+        return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def _prune(self):
+        """Forget finished jobs older than the result TTL"""
+        cutoff = time.time() - self.result_ttl
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def submit(self, filename, *args, **kwargs):
+        """Queue a job and return it; raises QueueFullError when saturated"""
+        with self._lock:
+            self._prune()
+            if self._active_count() >= self.max_queue:
+                raise QueueFullError(f"Job queue is full ({self.max_queue} jobs pending)")
+            job = Job(filename)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        """Return the job with the given id, applying the timeout to stale runs"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                self._check_timeout(job)
+            return job
+
+    def stats(self):
+        """Return queue counters for monitoring"""
+        with self._lock:
+            counts = {'queued': 0, 'running': 0, 'succeeded': 0, 'failed': 0}
+            for job in self._jobs.values():
+                self._check_timeout(job)
+                counts[job.status] += 1
+            counts['max_queue'] = self.max_queue
+            return counts
+
+    def _check_timeout(self, job):
+        # Worker threads cannot be interrupted, so an overdue job is reported as
+        # failed and whatever it eventually produces is discarded
+        if job.status == 'running' and time.time() - job.started_at > self.timeout:
+            self._finish(job, error=f"Job timed out after {self.timeout:.0f}s", status_code=504)
+
+    def _finish(self, job, result=None, error=None, status_code=None):
+        job.status = 'failed' if error else 'succeeded'
+        job.stage = 'done'
+        job.result = result
+        job.error = error
+        job.status_code = status_code
+        job.finished_at = time.time()
+        if not error:
+            job.progress = 1.0
+
+    def _run(self, job, args, kwargs):
+        def report(stage, progress):
+            with self._lock:
+                if not job.finished:
+                    job.stage = stage
+                    job.progress = progress
+
+        def started():
+            # Time spent waiting for a generation slot does not count against the timeout
+            with self._lock:
+                if not job.finished and job.started_at is None:
+                    job.status = 'running'
+                    job.started_at = time.time()
+
+        try:
+            result = self.handler(*args, progress=report, started=started, **kwargs)
+            error, status_code = None, None
+        except Exception as e:
+            result = None
+            error = str(e)
+            status_code = getattr(e, 'status_code', 500)
+            print(f"[ERROR] Job {job.id} failed: {error}")
+
+        with self._lock:
+            if not job.finished:
+                self._finish(job, result, error, status_code)
@@ -0,0 +1,246 @@
+"""
+Recover the agents JSON document from imperfect LLM output
+"""
+
+import json
+import re
+from collections import namedtuple
+
+Recovery = namedtuple('Recovery', ['data', 'repairs'])
+
+CODE_FENCE = re.compile(r"^```(?:json)?|```$", re.MULTILINE)
+STRUCTURAL = re.compile(r"""[{}\[\],"']""")
+STRING_SPECIAL = {'"': re.compile(r'["\\]'), "'": re.compile(r"""['"\\]""")}
+CLOSERS = {'{': '}', '[': ']'}
+
+
+class JSONRecoveryError(ValueError):
+    """Raised when no usable agents document can be recovered"""
+
+
+def strip_code_fences(text):
+    """Remove ```json wrappers around a response"""
+    return CODE_FENCE.sub('', text.strip()).strip()
+
+
+def parse_agents_json(text):
+    """Parse an agents document, repairing common defects; returns Recovery(data, repairs)"""
+    try:
+        # Well-formed output takes the C parser and never reaches the scanner
+        data, repairs = json.loads(strip_code_fences(text)), []
+    except ValueError:
+        data, repairs = recover_json(text)
+
+    if isinstance(data, list):
+        data = {'agents': data}
+        repairs.append('wrapped_agents_list')
+    if 'closed_brackets' in repairs and _drop_incomplete_tail(data):
+        repairs.append('dropped_incomplete_agent')
+
+    problems = validate_agents(data)
+    if problems:
+        more = f" (+{len(problems) - 1} more)" if len(problems) > 1 else ''
+        raise JSONRecoveryError(f"Output does not match the agents schema: {problems[0]}{more}")
+    if 'closed_brackets' in repairs and not data['agents']:
+        raise JSONRecoveryError('Output was truncated before the first complete agent')
+    return Recovery(data, repairs)
+
+
+def recover_json(text):
+    """Locate the outermost JSON value in text in one pass and repair it; returns Recovery(data, repairs)"""
+    starts = [index for index in (text.find('{'), text.find('[')) if index != -1]
+    if not starts:
+        raise JSONRecoveryError('JSON parsing error: no JSON object found in output')
+    start = min(starts)
+
+    repairs = []
+
+    def repaired(name):
+        if name not in repairs:
+            repairs.append(name)
+
+    if text[:start].strip():
+        repaired('stripped_leading_text')
+
+    out = []
+    stack = []
+    cut = None  # (output length, open brackets) at the last point where every member was complete
+    pos = start
+    end = None
+    in_string = False
+
+    while pos < len(text):
+        match = STRUCTURAL.search(text, pos)
+        if not match:
+            out.append(text[pos:])
+            break
+        index = match.start()
+        char = text[index]
+        out.append(text[pos:index])
+        pos = index + 1
+
+        if char in '{[':
+            stack.append(char)
+            out.append(char)
+            cut = (len(out), tuple(stack))
+        elif char in '}]':
+            if _drop_trailing_comma(out):
+                repaired('trailing_commas')
+            if CLOSERS[stack[-1]] != char:
+                repaired('mismatched_brackets')
+                if ('{' if char == '}' else '[') not in stack:
+                    continue  # stray closer with nothing to close
+                while CLOSERS[stack[-1]] != char:
+                    out.append(CLOSERS[stack.pop()])
+            stack.pop()
+            out.append(char)
+            if not stack:
+                end = pos
+                break
+            cut = (len(out), tuple(stack))
+        elif char == ',':
+            cut = (len(out), tuple(stack))
+            out.append(char)
+        else:
+            if char == "'":
+                repaired('single_quotes')
+            closed, pos = _scan_string(text, pos, char, out)
+            if not closed:
+                in_string = True
+                break
+
+    if end is not None:
+        if text[end:].strip():
+            repaired('stripped_trailing_text')
+        try:
+            return Recovery(json.loads(''.join(out), strict=False), repairs)
+        except ValueError as e:
+            raise JSONRecoveryError(f"JSON parsing error: {e}")
+
+    # Truncated output: close what is open, or drop the incomplete last member and close that
+    repaired('closed_brackets')
+    try:
+        data = json.loads(_close(out, stack, in_string), strict=False)
+        if in_string:
+            repaired('closed_string')
+        return Recovery(data, repairs)
+    except ValueError as e:
+        if cut is None:
+            raise JSONRecoveryError(f"JSON parsing error: {e}")
+        length, open_brackets = cut
+
+    try:
+        data = json.loads(_close(out[:length], list(open_brackets), False), strict=False)
+    except ValueError as e:
+        raise JSONRecoveryError(f"JSON parsing error: {e}")
+    repaired('dropped_incomplete_value')
+    return Recovery(data, repairs)
+
+
+def _scan_string(text, pos, quote, out):
+    """Append the string opened by quote as a JSON string; returns (closed, next position)"""
+    special = STRING_SPECIAL[quote]
+    out.append('"')
+    while True:
+        match = special.search(text, pos)
+        if not match:
+            out.append(text[pos:])
+            return False, len(text)
+        index = match.start()
+        char = text[index]
+        out.append(text[pos:index])
+        if char == quote:
+            out.append('"')
+            return True, index + 1
+        if char == '"':
+            out.append('\\"')  # double quote inside a single-quoted string
+            pos = index + 1
+            continue
+        escaped = text[index + 1:index + 2]
+        if not escaped:
+            return False, len(text)  # truncated in the middle of an escape
+        out.append("'" if escaped == "'" and quote == "'" else '\\' + escaped)
+        pos = index + 2
+
+
+def _drop_trailing_comma(out):
+    """Remove a comma (and whitespace after it) at the end of the output; returns whether one was found"""
+    while out and not out[-1].strip():
+        out.pop()
+    if out and out[-1].rstrip().endswith(','):
+        out[-1] = out[-1].rstrip()[:-1]
+        return True
+    return False
+
+
+def _close(out, stack, in_string):
+    """Return the output with an open string and all open brackets closed"""
+    out = list(out)
+    if in_string:
+        out.append('"')
+    _drop_trailing_comma(out)
+    if out and out[-1].rstrip().endswith(':'):
+        out.append(' null')
+    out.extend(CLOSERS[opener] for opener in reversed(stack))
+    return ''.join(out)
+
+
+def validate_agents(data):
+    """Return the ways data deviates from the agents/subagents/actions schema"""
+    if not isinstance(data, dict) or not isinstance(data.get('agents'), list):
+        return ['expected an object with an "agents" list']
+
+    problems = []
+    for i, agent in enumerate(data['agents']):
+        problems.extend(_agent_problems(agent, f"agents[{i}]"))
+    return problems
+
+
+def _agent_problems(agent, where):
+    problems = _item_problems(agent, where)
+    if problems:
+        return problems
+    if not isinstance(agent.get('subagents'), list):
+        return [f"{where}.subagents is not a list"]
+    for j, subagent in enumerate(agent['subagents']):
+        problems.extend(_subagent_problems(subagent, f"{where}.subagents[{j}]"))
+    return problems
+
+
+def _subagent_problems(subagent, where):
+    problems = _item_problems(subagent, where)
+    if problems:
+        return problems
+    actions = subagent.get('actions')
+    if not isinstance(actions, list) or not all(isinstance(action, str) for action in actions):
+        return [f"{where}.actions is not a list of strings"]
+    return []
+
+
+def _item_problems(item, where):
+    if not isinstance(item, dict):
+        return [f"{where} is not an object"]
+    problems = []
+    if not isinstance(item.get('name'), str):
+        problems.append(f"{where}.name is missing")
+    if not isinstance(item.get('description', ''), str):
+        problems.append(f"{where}.description is not a string")
+    return problems
+
+
+def _drop_incomplete_tail(data):
+    """Drop the trailing subagent and agent cut short by truncation; returns whether anything was dropped"""
+    agents = data.get('agents') if isinstance(data, dict) else None
+    if not isinstance(agents, list) or not agents:
+        return False
+
+    dropped = False
+    last = agents[-1]
+    subagents = last.get('subagents') if isinstance(last, dict) else None
+    if isinstance(subagents, list) and subagents and _subagent_problems(subagents[-1], ''):
+        subagents.pop()
+        dropped = True
+    if _agent_problems(last, ''):
+        agents.pop()
+        dropped = True
+    return dropped
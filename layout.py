@@ -0,0 +1,259 @@
+"""
+Rebuild mindmap hierarchy from page geometry: text boxes joined by drawn connector lines
+"""
+
+import math
+import os
+from collections import defaultdict, deque
+
+from outline import NUMBERING
+
+# Configure layout settings
+PDF_LAYOUT_SNAP = float(os.environ.get('PDF_LAYOUT_SNAP', 8))  # points between a connector end and a box
+PDF_LAYOUT_MIN_LINKED = float(os.environ.get('PDF_LAYOUT_MIN_LINKED', 0.5))  # share of boxes connected in auto mode
+
+GRID_CELL = 64  # points; a few boxes per cell on typical mindmap pages
+POINT_EPSILON = 0.5
+WORD_GAP = 2.0  # word heights between two words that still belong to one label
+MAX_BOX_LINES = 8  # a drawn shape around more text pieces than this is a frame, not a topic box
+
+
+class SpatialGrid:
+    """Uniform grid over rectangles answering nearest-rectangle and overlap queries"""
+
+    def __init__(self, cell=GRID_CELL):
+        self.cell = cell
+        self.rects = []
+        self._cells = defaultdict(list)
+
+    def _span(self, x0, y0, x1, y1):
+        cell = self.cell
+        for cx in range(math.floor(x0 / cell), math.floor(x1 / cell) + 1):
+            for cy in range(math.floor(y0 / cell), math.floor(y1 / cell) + 1):
+                yield cx, cy
+
+    def insert(self, rect):
+        index = len(self.rects)
+        self.rects.append(rect)
+        for key in self._span(*rect):
+            self._cells[key].append(index)
+        return index
+
+    def overlapping(self, rect):
+        """Return indexes of rectangles sharing a grid cell with rect"""
+        found = set()
+        for key in self._span(*rect):
+            found.update(self._cells.get(key, ()))
+        return found
+
+    def nearest(self, x, y, tolerance):
+        """Return the index of the rectangle closest to (x, y) within tolerance, or None"""
+        best, best_distance = None, tolerance
+        for index in self.overlapping((x - tolerance, y - tolerance, x + tolerance, y + tolerance)):
+            x0, y0, x1, y1 = self.rects[index]
+            distance = math.hypot(max(x0 - x, 0, x - x1), max(y0 - y, 0, y - y1))
+            if distance <= best_distance:
+                best, best_distance = index, distance
+        return best
+
+
+def page_boxes(page, shapes=()):
+    """Return (text, bbox, text height, hit rect) per topic: words split at wide gaps, joined inside drawn boxes"""
+    # Text at the same baseline is reported as one line however far apart it is, so split on the words' gaps
+    pieces = []
+    for x0, y0, x1, y1, word, block, line, _ in page.get_text('words'):
+        last = pieces[-1] if pieces else None
+        if last and last[3] == (block, line) and x0 - last[1][2] <= WORD_GAP * (y1 - y0):
+            last[0].append(word)
+            last[1] = _union(last[1], (x0, y0, x1, y1))
+            last[2] = max(last[2], y1 - y0)
+        else:
+            pieces.append([[word], (x0, y0, x1, y1), y1 - y0, (block, line)])
+
+    # Each piece belongs to the smallest drawn shape around its center
+    shape_grid = SpatialGrid()
+    for shape in shapes:
+        shape_grid.insert(shape)
+    groups = defaultdict(list)
+    for position, (_, bbox, _, _) in enumerate(pieces):
+        cx, cy = (bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2
+        around = [index for index in shape_grid.overlapping((cx, cy, cx, cy)) if _contains_center(shapes[index], bbox)]
+        owner = min(around, key=lambda index: _area(shapes[index])) if around else None
+        groups[owner if owner is not None else ('piece', position)].append(position)
+
+    boxes = []
+    for owner, members in groups.items():
+        if isinstance(owner, tuple) or len(members) > MAX_BOX_LINES:
+            boxes.extend((' '.join(pieces[m][0]), pieces[m][1], pieces[m][2], pieces[m][1]) for m in members)
+            continue
+        members.sort(key=lambda m: (pieces[m][1][1], pieces[m][1][0]))
+        bbox = pieces[members[0]][1]
+        for m in members[1:]:
+            bbox = _union(bbox, pieces[m][1])
+        text = ' '.join(word for m in members for word in pieces[m][0])
+        boxes.append((text, bbox, max(pieces[m][2] for m in members), _union(bbox, shapes[owner])))
+    return boxes
+
+
+def _path_chains(drawing):
+    """Split a drawing into runs of joined segments; returns lists of points"""
+    chains = []
+    for item in drawing['items']:
+        kind = item[0]
+        if kind == 'l':
+            points = [item[1], item[2]]
+        elif kind == 'c':
+            points = [item[1], item[4]]
+        elif kind == 're':
+            rect = item[1]
+            points = [rect.tl, rect.tr, rect.br, rect.bl, rect.tl]
+        elif kind == 'qu':
+            quad = item[1]
+            points = [quad.ul, quad.ur, quad.lr, quad.ll, quad.ul]
+        else:
+            continue
+        if chains and _same_point(chains[-1][-1], points[0]):
+            chains[-1].extend(points[1:])
+        else:
+            chains.append(list(points))
+    return chains
+
+
+def _same_point(a, b):
+    return abs(a[0] - b[0]) <= POINT_EPSILON and abs(a[1] - b[1]) <= POINT_EPSILON
+
+
+def page_paths(page):
+    """Return (connectors, shapes): open paths as (start, end) points and closed paths as bounding rects"""
+    connectors = []
+    shapes = []
+    for drawing in page.get_drawings():
+        closed_fill = drawing.get('closePath') or drawing.get('fill') is not None
+        for chain in _path_chains(drawing):
+            if closed_fill or len(chain) > 2 and _same_point(chain[0], chain[-1]):
+                xs = [point[0] for point in chain]
+                ys = [point[1] for point in chain]
+                shapes.append((min(xs), min(ys), max(xs), max(ys)))
+            else:
+                connectors.append((chain[0], chain[-1]))
+    return connectors, shapes
+
+
+def link_boxes(boxes, connectors, snap=PDF_LAYOUT_SNAP):
+    """Return the set of (a, b) box index pairs joined by a connector"""
+    grid = SpatialGrid()
+    for _, _, _, hit_rect in boxes:
+        grid.insert(hit_rect)
+
+    edges = set()
+    for start, end in connectors:
+        a = grid.nearest(start[0], start[1], snap)
+        b = grid.nearest(end[0], end[1], snap)
+        if a is not None and b is not None and a != b:
+            edges.add((min(a, b), max(a, b)))
+    return edges
+
+
+def _contains_center(rect, bbox):
+    cx, cy = (bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2
+    return rect[0] <= cx <= rect[2] and rect[1] <= cy <= rect[3]
+
+
+def _union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _area(rect):
+    return (rect[2] - rect[0]) * (rect[3] - rect[1])
+
+
+def _bfs(adjacency, start):
+    """Return (distances, order) of a breadth-first walk from start"""
+    distances = {start: 0}
+    order = [start]
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for neighbour in adjacency[node]:
+            if neighbour not in distances:
+                distances[neighbour] = distances[node] + 1
+                order.append(neighbour)
+                queue.append(neighbour)
+    return distances, order
+
+
+def _choose_root(adjacency, component, boxes):
+    """Pick the central topic: tallest text, then most branches, then closest to the tree's center"""
+    far, _ = _bfs(adjacency, component[0])
+    u = max(far, key=far.get)
+    from_u, _ = _bfs(adjacency, u)
+    v = max(from_u, key=from_u.get)
+    from_v, _ = _bfs(adjacency, v)
+    diameter = from_u[v]
+    center_distance = {node: max(from_u[node], from_v[node]) - (diameter + 1) // 2 for node in component}
+    return max(component, key=lambda node: (round(boxes[node][2] * 2), len(adjacency[node]), -center_distance[node]))
+
+
+def _child_order(boxes, parent, is_root):
+    """Sort key for children: clockwise from 12 o'clock around the root, top-to-bottom elsewhere"""
+    px0, py0, px1, py1 = boxes[parent][1]
+    px, py = (px0 + px1) / 2, (py0 + py1) / 2
+
+    def key(child):
+        x0, y0, x1, y1 = boxes[child][1]
+        if is_root:
+            return (math.atan2((x0 + x1) / 2 - px, py - (y0 + y1) / 2) % (2 * math.pi), y0, x0)
+        return (y0, x0)
+    return key
+
+
+def mindmap_items(page, force=False, min_linked=PDF_LAYOUT_MIN_LINKED, snap=PDF_LAYOUT_SNAP):
+    """Return (text, bbox, level) per box in outline order, or None when the page is not a connected mindmap
+
+    Level 0 is a central topic, level 1 its branches and so on; None marks boxes that no connector reaches.
+    """
+    connectors, shapes = page_paths(page)
+    if not connectors:
+        return None
+    boxes = page_boxes(page, shapes)
+    edges = link_boxes(boxes, connectors, snap)
+    adjacency = defaultdict(list)
+    for a, b in edges:
+        adjacency[a].append(b)
+        adjacency[b].append(a)
+    if not edges or (not force and len(adjacency) < max(3, min_linked * len(boxes))):
+        return None
+
+    items = [(_strip_numbering(boxes[index][0]), _round_bbox(boxes[index][1]), None)
+             for index in sorted(set(range(len(boxes))) - set(adjacency), key=lambda i: (boxes[i][1][1], boxes[i][1][0]))]
+
+    seen = set()
+    roots = []
+    for index in sorted(adjacency, key=lambda i: (boxes[i][1][1], boxes[i][1][0])):
+        if index not in seen:
+            _, component = _bfs(adjacency, index)
+            seen.update(component)
+            roots.append(_choose_root(adjacency, component, boxes))
+
+    for root in sorted(roots, key=lambda i: (boxes[i][1][1], boxes[i][1][0])):
+        # Depth-first from the root, with an explicit stack so long chains cannot hit the recursion limit
+        visited = {root}
+        stack = [(root, 0)]
+        while stack:
+            node, level = stack.pop()
+            items.append((_strip_numbering(boxes[node][0]), _round_bbox(boxes[node][1]), level))
+            children = [child for child in adjacency[node] if child not in visited]
+            visited.update(children)
+            children.sort(key=_child_order(boxes, node, level == 0))
+            stack.extend((child, level + 1) for child in reversed(children))
+    return items
+
+
+def _strip_numbering(text):
+    # Numbering is reassigned from the reconstructed hierarchy
+    match = NUMBERING.match(text)
+    return text[match.end():] if match else text
+
+
+def _round_bbox(bbox):
+    return tuple(round(value, 1) for value in bbox)
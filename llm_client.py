@@ -0,0 +1,819 @@
+"""
+Shared HTTP clients for the Ollama backend with retries and a circuit breaker
+"""
+
+import collections
+import json
+import os
+import threading
+import time
+
+# Configure Ollama settings
+OLLAMA_BASE_URL = os.environ.get('OLLAMA_BASE_URL', 'http://localhost:11434')
+OLLAMA_MODEL = os.environ.get('OLLAMA_MODEL', 'mistral')
+OLLAMA_CONNECT_TIMEOUT = float(os.environ.get('OLLAMA_CONNECT_TIMEOUT', 5))
+OLLAMA_READ_TIMEOUT = float(os.environ.get('OLLAMA_READ_TIMEOUT', 30))
+OLLAMA_POOL_SIZE = int(os.environ.get('OLLAMA_POOL_SIZE', 8))
+OLLAMA_ASYNC_POOL_SIZE = int(os.environ.get('OLLAMA_ASYNC_POOL_SIZE', 64))  # connections per asyncio worker
+OLLAMA_MAX_RETRIES = int(os.environ.get('OLLAMA_MAX_RETRIES', 2))
+OLLAMA_RETRY_BACKOFF = float(os.environ.get('OLLAMA_RETRY_BACKOFF', 0.5))  # seconds, doubled per retry
+OLLAMA_BREAKER_THRESHOLD = int(os.environ.get('OLLAMA_BREAKER_THRESHOLD', 3))  # consecutive failures
+OLLAMA_BREAKER_RESET = float(os.environ.get('OLLAMA_BREAKER_RESET', 30))  # seconds before probing again
+OLLAMA_KEEP_ALIVE = os.environ.get('OLLAMA_KEEP_ALIVE', '30m')  # keep the model and its prompt cache loaded between calls
+
+# Configure backend pool settings
+LLM_BACKENDS = os.environ.get('LLM_BACKENDS', OLLAMA_BASE_URL)  # comma-separated, see parse_backend()
+LLM_BALANCE = os.environ.get('LLM_BALANCE', 'least_loaded')  # least_loaded or round_robin
+LLM_HEDGE = os.environ.get('LLM_HEDGE', '0') == '1'  # resend slow calls to a second backend
+LLM_HEDGE_PERCENTILE = float(os.environ.get('LLM_HEDGE_PERCENTILE', 95))  # latency percentile that counts as slow
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get('LLM_HEDGE_MIN_SAMPLES', 20))  # calls timed before hedging starts
+LLM_API_KEY = os.environ.get('LLM_API_KEY', '')  # bearer token for OpenAI-compatible servers
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+MALFORMED_RESPONSE = (ValueError, LookupError, TypeError, AttributeError)  # body is not JSON or not a completion
+LATENCY_WINDOW = 200  # recent calls per backend kept for latency percentiles
+OUTLINE_MARKER = 'Now convert the following mindmap text into structured JSON:'
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the backend is failing or the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Stop calling a failing backend and probe it again after a cool-down"""
+
+    def __init__(self, threshold=OLLAMA_BREAKER_THRESHOLD, reset_timeout=OLLAMA_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'  # closed, open, half_open
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may go through, 'probe' for the single trial call after the cool-down"""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                # Let exactly one probe through; everyone else keeps short-circuiting
+                self.state = 'half_open'
+                return 'probe'
+            return False
+
+    def available(self):
+        """Return True if allow() would let a call through now, without changing state"""
+        with self._lock:
+            return self.state == 'closed' or (
+                self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout)
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.threshold:
+                if self.state != 'open':
+                    print(f"[WARN] LLM circuit breaker opened after {self.failures} failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """Reopen the breaker if the probe ended without a verdict (abandoned stream, cancelled call)"""
+        with self._lock:
+            if self.state == 'half_open':
+                # opened_at is already past the cool-down, so the next call probes again
+                self.state = 'open'
+
+
+class BaseClient:
+    """Counters, latency tracking and circuit breaker shared by the sync and async clients"""
+
+    kind = 'ollama'
+
+    def __init__(self, base_url=OLLAMA_BASE_URL, model=OLLAMA_MODEL,
+                 connect_timeout=OLLAMA_CONNECT_TIMEOUT, read_timeout=OLLAMA_READ_TIMEOUT,
+                 max_retries=OLLAMA_MAX_RETRIES, retry_backoff=OLLAMA_RETRY_BACKOFF, breaker=None,
+                 keep_alive=OLLAMA_KEEP_ALIVE):
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.keep_alive = keep_alive
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.breaker = breaker or CircuitBreaker()
+
+        self._lock = threading.Lock()
+        self._counters = {
+            'calls': 0,
+            'failures': 0,
+            'retries': 0,
+            'short_circuits': 0,
+            'fallbacks': 0
+        }
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._latency_count = 0
+        self._recent = collections.deque(maxlen=LATENCY_WINDOW)
+        self.in_flight = 0  # calls currently running, maintained by LLMPool
+
+    @property
+    def generate_url(self):
+        return f"{self.base_url}/api/generate"
+
+    def _headers(self):
+        return None
+
+    def _completion(self, result):
+        return result['response']
+
+    def _stream_token(self, line):
+        """Return (token or None, done) for one line of a streaming response"""
+        if not line.strip():
+            return None, False
+        chunk = json.loads(line)
+        if chunk.get('error'):
+            raise LLMUnavailableError(f"Mistral API error: {chunk['error']}")
+        return chunk.get('response'), bool(chunk.get('done'))
+
+    def _payload(self, prompt, stream, options):
+        payload = {'model': self.model, 'prompt': prompt, 'stream': stream}
+        if self.keep_alive:
+            # While the model stays loaded Ollama reuses the evaluated prompt prefix shared with the last call
+            payload['keep_alive'] = self.keep_alive
+        payload.update(options)
+        return payload
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _observe_latency(self, seconds):
+        with self._lock:
+            self._latency_count += 1
+            self._latency_total += seconds
+            self._latency_max = max(self._latency_max, seconds)
+            self._recent.append(seconds)
+
+    def latency_percentile(self, percentile, min_samples=1):
+        """Seconds under which percentile % of recent successful calls finished, or None with too few calls"""
+        with self._lock:
+            recent = sorted(self._recent)
+        if len(recent) < max(min_samples, 1):
+            return None
+        return recent[min(len(recent) - 1, int(len(recent) * percentile / 100))]
+
+    def _check_breaker(self):
+        """Count the call and return whether it is the breaker's half-open probe"""
+        self._count('calls')
+        allowed = self.breaker.allow()
+        if not allowed:
+            self._count('short_circuits')
+            raise LLMUnavailableError('LLM backend unavailable (circuit open)')
+        return allowed == 'probe'
+
+    def record_fallback(self):
+        """Count a request that was answered by the rule-based fallback"""
+        self._count('fallbacks')
+
+    def stats(self):
+        """Return call counters, latency and breaker state"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['latency'] = {
+                'count': self._latency_count,
+                'avg_ms': round(self._latency_total / self._latency_count * 1000, 1) if self._latency_count else None,
+                'max_ms': round(self._latency_max * 1000, 1)
+            }
+        stats['breaker'] = self.breaker.state
+        stats['kind'] = self.kind
+        stats['model'] = self.model
+        stats['base_url'] = self.base_url
+        return stats
+
+
+class OllamaClient(BaseClient):
+    """Pooled keep-alive client for Ollama's /api/generate endpoint"""
+
+    def __init__(self, pool_size=OLLAMA_POOL_SIZE, **kwargs):
+        super().__init__(**kwargs)
+        self.pool_size = pool_size
+        self._session = None
+
+    @property
+    def session(self):
+        # Created on first use so importing the client does not load requests
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    def warm_up(self):
+        """Open a pooled connection to Ollama ahead of the first request; returns whether it answered"""
+        import requests
+
+        try:
+            self.session.get(self.base_url, timeout=self.timeout).close()
+            return True
+        except requests.exceptions.RequestException:
+            return False
+
+    def generate(self, prompt, **options):
+        """Return the full completion for prompt, retrying transient failures"""
+        import requests
+
+        probe = self._check_breaker()
+        payload = self._payload(prompt, False, options)
+
+        started = time.monotonic()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = self.session.post(self.generate_url, json=payload, headers=self._headers(),
+                                                 timeout=self.timeout)
+                    if response.status_code == 200:
+                        completion = self._completion(response.json())
+                        self.breaker.record_success()
+                        self._observe_latency(time.monotonic() - started)
+                        return completion
+                    error = LLMUnavailableError(f"Mistral API error: {response.status_code}")
+                    retryable = response.status_code in RETRYABLE_STATUS
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    error = LLMUnavailableError(f"Mistral API unreachable: {e}")
+                    retryable = True
+                except MALFORMED_RESPONSE as e:
+                    error = LLMUnavailableError(f"Mistral API returned an unusable response: {e!r}")
+                    retryable = False
+
+                if not retryable or attempt == self.max_retries:
+                    break
+                self._count('retries')
+                time.sleep(self.retry_backoff * (2 ** attempt))
+
+            self._count('failures')
+            self.breaker.record_failure()
+            raise error
+        finally:
+            if probe:
+                self.breaker.release_probe()
+
+    def stream(self, prompt, **options):
+        """Yield completion tokens for prompt as they are generated"""
+        import requests
+
+        probe = self._check_breaker()
+        payload = self._payload(prompt, True, options)
+
+        started = time.monotonic()
+        try:
+            # The read timeout applies between chunks, so long outlines are not cut off
+            with self.session.post(self.generate_url, json=payload, headers=self._headers(), stream=True,
+                                   timeout=self.timeout) as response:
+                if response.status_code != 200:
+                    raise LLMUnavailableError(f"Mistral API error: {response.status_code}")
+
+                for line in response.iter_lines():
+                    token, done = self._stream_token(line)
+                    if token:
+                        yield token
+                    if done:
+                        break
+        except LLMUnavailableError:
+            self._count('failures')
+            self.breaker.record_failure()
+            raise
+        except (requests.exceptions.RequestException, *MALFORMED_RESPONSE) as e:
+            # Raised as LLMUnavailableError so LLMPool can fail over before the first token
+            self._count('failures')
+            self.breaker.record_failure()
+            raise LLMUnavailableError(f"Mistral API stream failed: {e!r}") from e
+        else:
+            self.breaker.record_success()
+            self._observe_latency(time.monotonic() - started)
+        finally:
+            # A consumer that stops early closes the generator here, before any verdict
+            if probe:
+                self.breaker.release_probe()
+
+
+class AsyncOllamaClient(BaseClient):
+    """Non-blocking client for the asyncio server; waiting calls hold no thread"""
+
+    def __init__(self, pool_size=OLLAMA_ASYNC_POOL_SIZE, **kwargs):
+        super().__init__(**kwargs)
+        self.pool_size = pool_size
+        self._session = None
+
+    def _get_session(self):
+        import aiohttp
+
+        # Created lazily so the session binds to the running event loop
+        if self._session is None or self._session.closed:
+            connect_timeout, read_timeout = self.timeout
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def generate(self, prompt, **options):
+        """Return the full completion for prompt, retrying transient failures"""
+        import asyncio
+        import aiohttp
+
+        probe = self._check_breaker()
+        payload = self._payload(prompt, False, options)
+
+        started = time.monotonic()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    request = self._get_session().post(self.generate_url, json=payload, headers=self._headers())
+                    async with request as response:
+                        if response.status == 200:
+                            completion = self._completion(await response.json(content_type=None))
+                            self.breaker.record_success()
+                            self._observe_latency(time.monotonic() - started)
+                            return completion
+                        error = LLMUnavailableError(f"Mistral API error: {response.status}")
+                        retryable = response.status in RETRYABLE_STATUS
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = LLMUnavailableError(f"Mistral API unreachable: {e!r}")
+                    retryable = True
+                except MALFORMED_RESPONSE as e:
+                    error = LLMUnavailableError(f"Mistral API returned an unusable response: {e!r}")
+                    retryable = False
+
+                if not retryable or attempt == self.max_retries:
+                    break
+                self._count('retries')
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+
+            self._count('failures')
+            self.breaker.record_failure()
+            raise error
+        finally:
+            # Also reached when a hedged or timed-out call is cancelled
+            if probe:
+                self.breaker.release_probe()
+
+    async def stream(self, prompt, **options):
+        """Yield completion tokens for prompt as they are generated"""
+        import asyncio
+        import aiohttp
+
+        probe = self._check_breaker()
+        payload = self._payload(prompt, True, options)
+
+        started = time.monotonic()
+        try:
+            async with self._get_session().post(self.generate_url, json=payload, headers=self._headers()) as response:
+                if response.status != 200:
+                    raise LLMUnavailableError(f"Mistral API error: {response.status}")
+
+                async for line in response.content:
+                    token, done = self._stream_token(line)
+                    if token:
+                        yield token
+                    if done:
+                        break
+        except LLMUnavailableError:
+            self._count('failures')
+            self.breaker.record_failure()
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError, *MALFORMED_RESPONSE) as e:
+            # Raised as LLMUnavailableError so AsyncLLMPool can fail over before the first token
+            self._count('failures')
+            self.breaker.record_failure()
+            raise LLMUnavailableError(f"Mistral API stream failed: {e!r}") from e
+        else:
+            self.breaker.record_success()
+            self._observe_latency(time.monotonic() - started)
+        finally:
+            if probe:
+                self.breaker.release_probe()
+
+
+class OpenAIProtocol:
+    """Chat completions wire format of OpenAI-compatible servers (vLLM, llama.cpp server, LM Studio)"""
+
+    kind = 'openai'
+
+    @property
+    def generate_url(self):
+        return f"{self.base_url}/chat/completions"
+
+    def _headers(self):
+        return {'Authorization': f"Bearer {LLM_API_KEY}"} if LLM_API_KEY else None
+
+    def _payload(self, prompt, stream, options):
+        payload = {'model': self.model, 'messages': [{'role': 'user', 'content': prompt}], 'stream': stream}
+        payload.update(options)
+        return payload
+
+    def _completion(self, result):
+        return result['choices'][0]['message']['content']
+
+    def _stream_token(self, line):
+        line = line.strip()
+        if not line.startswith(b'data:'):
+            return None, False
+        data = line[5:].strip()
+        if data == b'[DONE]':
+            return None, True
+        chunk = json.loads(data)
+        if chunk.get('error'):
+            raise LLMUnavailableError(f"Mistral API error: {chunk['error']}")
+        choice = (chunk.get('choices') or [{}])[0]
+        return (choice.get('delta') or {}).get('content'), choice.get('finish_reason') is not None
+
+
+class OpenAIClient(OpenAIProtocol, OllamaClient):
+    """Pooled keep-alive client for an OpenAI-compatible /chat/completions endpoint"""
+
+
+class AsyncOpenAIClient(OpenAIProtocol, AsyncOllamaClient):
+    """Non-blocking client for an OpenAI-compatible /chat/completions endpoint"""
+
+
+def stub_completion(prompt):
+    """Answer a prompt deterministically using the rule-based generator on its outline"""
+    from fallback import generate_structured_json
+
+    outline = prompt.rsplit(OUTLINE_MARKER, 1)[-1]
+    return generate_structured_json(outline)
+
+
+class StubClient(BaseClient):
+    """In-process deterministic backend for tests and benchmarks; answers after latency seconds"""
+
+    kind = 'stub'
+
+    def __init__(self, base_url='stub://', latency=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url  # a label only; nothing is requested
+        self.latency = latency
+
+    def warm_up(self):
+        return True
+
+    def generate(self, prompt, **options):
+        self._check_breaker()
+        started = time.monotonic()
+        time.sleep(self.latency)
+        completion = stub_completion(prompt)
+        self._observe_latency(time.monotonic() - started)
+        return completion
+
+    def stream(self, prompt, **options):
+        completion = self.generate(prompt)
+        for start in range(0, len(completion), 4):
+            yield completion[start:start + 4]
+
+
+class AsyncStubClient(StubClient):
+    """Asyncio variant of StubClient"""
+
+    async def close(self):
+        pass
+
+    async def generate(self, prompt, **options):
+        import asyncio
+
+        self._check_breaker()
+        started = time.monotonic()
+        await asyncio.sleep(self.latency)
+        completion = stub_completion(prompt)
+        self._observe_latency(time.monotonic() - started)
+        return completion
+
+    async def stream(self, prompt, **options):
+        completion = await self.generate(prompt)
+        for start in range(0, len(completion), 4):
+            yield completion[start:start + 4]
+
+
+BACKEND_CLIENTS = {
+    'ollama': (OllamaClient, AsyncOllamaClient),
+    'openai': (OpenAIClient, AsyncOpenAIClient),
+    'stub': (StubClient, AsyncStubClient)
+}
+
+
+def parse_backend(spec):
+    """Return (kind, base_url, options) for a backend spec
+
+    Specs are an Ollama URL (http://gpu1:11434), an OpenAI-compatible URL prefixed with openai+
+    (openai+http://gpu2:8000/v1) or stub://. Query parameters set model=... and, for the stub, latency=...
+    """
+    from urllib.parse import parse_qsl
+
+    kind = 'ollama'
+    if spec.startswith('openai+'):
+        kind, spec = 'openai', spec[len('openai+'):]
+    elif spec.startswith('stub:'):
+        kind = 'stub'
+    base_url, _, query = spec.partition('?')
+    query = dict(parse_qsl(query))
+    options = {'model': query['model']} if 'model' in query else {}
+    if kind == 'stub':
+        options = {'model': query.get('model', 'stub'), 'latency': float(query.get('latency', 0))}
+    return kind, base_url, options
+
+
+class BasePool:
+    """Balancing, health and counters shared by the sync and async backend pools"""
+
+    def __init__(self, clients, balance=LLM_BALANCE, hedge=LLM_HEDGE, hedge_percentile=LLM_HEDGE_PERCENTILE,
+                 hedge_min_samples=LLM_HEDGE_MIN_SAMPLES):
+        if balance not in ('least_loaded', 'round_robin'):
+            raise ValueError(f"Unknown LLM_BALANCE {balance!r}; use 'least_loaded' or 'round_robin'")
+        self.clients = clients
+        self.balance = balance
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.model = ','.join(sorted({client.model for client in clients}))
+        self.base_url = ', '.join(client.base_url for client in clients)
+        self._lock = threading.Lock()
+        self._next = 0
+        self._counters = {'fallbacks': 0, 'failovers': 0, 'hedged': 0, 'hedge_wins': 0}
+
+    def pick(self, exclude=()):
+        """Choose the next backend not in exclude, preferring those whose circuit breaker is closed"""
+        candidates = [client for client in self.clients if client not in exclude]
+        if not candidates:
+            return None
+        # With every breaker open the call still goes through one, which short-circuits as a single client would
+        candidates = [client for client in candidates if client.breaker.available()] or candidates
+        with self._lock:
+            start = self._next
+            self._next += 1
+            # Rotating the order spreads ties (and round_robin picks) evenly
+            rotated = [candidates[(start + i) % len(candidates)] for i in range(len(candidates))]
+            if self.balance == 'round_robin':
+                return rotated[0]
+            return min(rotated, key=lambda client: client.in_flight)
+
+    def hedge_delay(self, client):
+        """Seconds to wait on client before hedging, or None when hedging does not apply"""
+        if not self.hedge or len(self.clients) < 2:
+            return None
+        return client.latency_percentile(self.hedge_percentile, self.hedge_min_samples)
+
+    def _begin(self, client):
+        with self._lock:
+            client.in_flight += 1
+
+    def _end(self, client):
+        with self._lock:
+            client.in_flight -= 1
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def record_fallback(self):
+        """Count a request that was answered by the rule-based fallback"""
+        self._count('fallbacks')
+
+    def stats(self):
+        """Return summed call counters, pool counters and each backend's stats"""
+        backends = []
+        for client in self.clients:
+            client_stats = client.stats()
+            client_stats['in_flight'] = client.in_flight
+            backends.append(client_stats)
+        stats = {name: sum(backend[name] for backend in backends)
+                 for name in ('calls', 'failures', 'retries', 'short_circuits')}
+        with self._lock:
+            stats.update(self._counters)
+        # The pool is open only when no backend would take a call
+        stats['breaker'] = 'closed' if any(client.breaker.available() for client in self.clients) else 'open'
+        stats['balance'] = self.balance
+        stats['hedge'] = self.hedge
+        stats['model'] = self.model
+        stats['base_url'] = self.base_url
+        stats['backends'] = backends
+        return stats
+
+
+class LLMPool(BasePool):
+    """Spread calls over several backends, failing over on errors and optionally hedging slow calls"""
+
+    def __init__(self, clients, **kwargs):
+        super().__init__(clients, **kwargs)
+        self._executor = None
+
+    def warm_up(self):
+        """Warm every backend; returns whether any answered"""
+        return any([client.warm_up() for client in self.clients])
+
+    def _call(self, client, prompt, options):
+        self._begin(client)
+        try:
+            return client.generate(prompt, **options)
+        finally:
+            self._end(client)
+
+    def generate(self, prompt, **options):
+        """Return the full completion from the first backend that answers"""
+        tried = []
+        error = None
+        while True:
+            client = self.pick(tried)
+            if client is None:
+                raise error
+            if tried:
+                self._count('failovers')
+                print(f"[WARN] {error}, retrying on {client.base_url}")
+            tried.append(client)
+            try:
+                delay = self.hedge_delay(client) if len(tried) == 1 else None
+                if delay is not None:
+                    return self._hedged(client, delay, tried, prompt, options)
+                return self._call(client, prompt, options)
+            except LLMUnavailableError as e:
+                error = e
+
+    def _hedged(self, client, delay, tried, prompt, options):
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        with self._lock:
+            if self._executor is None:
+                workers = sum(getattr(c, 'pool_size', 1) for c in self.clients) * 2
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hedge')
+        primary = self._executor.submit(self._call, client, prompt, options)
+        done, _ = wait([primary], timeout=delay)
+        backup_client = None if done else self.pick(tried)
+        if backup_client is None or not backup_client.breaker.available():
+            return primary.result()
+
+        # The slower call is not interrupted; its answer is discarded
+        self._count('hedged')
+        tried.append(backup_client)
+        backup = self._executor.submit(self._call, backup_client, prompt, options)
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except LLMUnavailableError as e:
+                    error = e
+                    continue
+                if future is backup:
+                    self._count('hedge_wins')
+                return result
+        raise error
+
+    def stream(self, prompt, **options):
+        """Yield completion tokens, failing over to another backend until the first token arrives"""
+        tried = []
+        error = None
+        while True:
+            client = self.pick(tried)
+            if client is None:
+                raise error
+            if tried:
+                self._count('failovers')
+                print(f"[WARN] {error}, retrying on {client.base_url}")
+            tried.append(client)
+            started = False
+            self._begin(client)
+            try:
+                for token in client.stream(prompt, **options):
+                    started = True
+                    yield token
+                return
+            except LLMUnavailableError as e:
+                if started:
+                    raise
+                error = e
+            finally:
+                self._end(client)
+
+
+class AsyncLLMPool(BasePool):
+    """Asyncio variant of LLMPool; a hedged call's loser is cancelled"""
+
+    async def close(self):
+        for client in self.clients:
+            await client.close()
+
+    async def _call(self, client, prompt, options):
+        self._begin(client)
+        try:
+            return await client.generate(prompt, **options)
+        finally:
+            self._end(client)
+
+    async def generate(self, prompt, **options):
+        """Return the full completion from the first backend that answers"""
+        tried = []
+        error = None
+        while True:
+            client = self.pick(tried)
+            if client is None:
+                raise error
+            if tried:
+                self._count('failovers')
+                print(f"[WARN] {error}, retrying on {client.base_url}")
+            tried.append(client)
+            try:
+                delay = self.hedge_delay(client) if len(tried) == 1 else None
+                if delay is not None:
+                    return await self._hedged(client, delay, tried, prompt, options)
+                return await self._call(client, prompt, options)
+            except LLMUnavailableError as e:
+                error = e
+
+    async def _hedged(self, client, delay, tried, prompt, options):
+        import asyncio
+
+        primary = asyncio.ensure_future(self._call(client, prompt, options))
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        backup_client = None if done else self.pick(tried)
+        if backup_client is None or not backup_client.breaker.available():
+            return await primary
+
+        self._count('hedged')
+        tried.append(backup_client)
+        backup = asyncio.ensure_future(self._call(backup_client, prompt, options))
+        pending = {primary, backup}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        result = task.result()
+                    except LLMUnavailableError as e:
+                        error = e
+                        continue
+                    if task is backup:
+                        self._count('hedge_wins')
+                    return result
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream(self, prompt, **options):
+        """Yield completion tokens, failing over to another backend until the first token arrives"""
+        tried = []
+        error = None
+        while True:
+            client = self.pick(tried)
+            if client is None:
+                raise error
+            if tried:
+                self._count('failovers')
+                print(f"[WARN] {error}, retrying on {client.base_url}")
+            tried.append(client)
+            started = False
+            self._begin(client)
+            try:
+                async for token in client.stream(prompt, **options):
+                    started = True
+                    yield token
+                return
+            except LLMUnavailableError as e:
+                if started:
+                    raise
+                error = e
+            finally:
+                self._end(client)
+
+
+def make_llm_client(asynchronous=False, backends=LLM_BACKENDS):
+    """Build the client for the configured backends: a single client, or a pool for several"""
+    clients = []
+    for spec in backends.split(','):
+        if not spec.strip():
+            continue
+        kind, base_url, options = parse_backend(spec.strip())
+        client_class = BACKEND_CLIENTS[kind][1 if asynchronous else 0]
+        clients.append(client_class(base_url=base_url, **options))
+    if not clients:
+        raise ValueError('LLM_BACKENDS names no backend')
+    if len(clients) == 1:
+        return clients[0]
+    return (AsyncLLMPool if asynchronous else LLMPool)(clients)
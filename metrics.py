@@ -0,0 +1,191 @@
+"""
+Lightweight Prometheus metrics and per-request stage timing
+"""
+
+import bisect
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Upper bounds in seconds; Ollama calls sit in the upper buckets, parsing in the lower ones
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        samples = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                samples.append((f"{self.name}_bucket", labels, cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append((f"{self.name}_sum", labels, series[-1]))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class CallbackMetric:
+    """Metric whose value is read from a function at scrape time"""
+
+    def __init__(self, name, documentation, func, type='gauge', labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self.type = type
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        value = self.func()
+        if not isinstance(value, dict):
+            return [(self.name, '', value)]
+        return [(self.name, _format_labels(self.labelnames, key if isinstance(key, tuple) else (key,)), v)
+                for key, v in value.items()]
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text format
+
+    A registry with a parent renders the parent's metrics first, so each server in a process can add its own
+    component metrics to the shared ones without two servers repeating a name.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self._metrics = []
+
+    def names(self):
+        names = self.parent.names() if self.parent else set()
+        return names | {metric.name for metric in self._metrics}
+
+    def register(self, metric):
+        # Prometheus rejects a scrape that repeats a metric's HELP and TYPE lines
+        if metric.name in self.names():
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, func, type='gauge', labelnames=()):
+        return self.register(CallbackMetric(name, documentation, func, type, labelnames))
+
+    def render(self):
+        lines = [self.parent.render().rstrip('\n')] if self.parent else []
+        for metric in self._metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                print(f"[WARN] Metric {metric.name} failed: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'agentscript_stage_duration_seconds', 'Time spent in each processing stage', ['stage'])
+
+
+class RequestTimer:
+    """Collect per-stage timings for one request"""
+
+    def __init__(self, request_id=None):
+        self.request_id = request_id or new_request_id()
+        self.stages = {}
+
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def record(self, stage, seconds):
+        """Add a measured duration to a stage"""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        STAGE_SECONDS.observe(seconds, stage=stage)
+
+    def breakdown(self):
+        """Return stage timings in milliseconds"""
+        return {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()}
+
+    def log(self):
+        stages = ' '.join(f"{stage}={ms}ms" for stage, ms in self.breakdown().items())
+        print(f"[TIMING] request_id={self.request_id} {stages}")
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
@@ -0,0 +1,161 @@
+"""
+Typed outline tree built in one pass over extracted mindmap lines
+"""
+
+import re
+
+# "1.", "1.2", "1.2.3." followed by whitespace; a bare "2024 budget" is not numbering
+NUMBERING = re.compile(r'(\d+\.(?:\d+\.?)*)\s+')
+
+
+class OutlineNode:
+    """One outline line with its numbering path, depth, title and position in the PDF"""
+
+    __slots__ = ('label', 'text', 'path', 'depth', 'page', 'bbox', 'index', 'end', 'children')
+
+    def __init__(self, label, text, path, depth, page, bbox, index):
+        self.label = label  # the line as extracted, numbering included
+        self.text = text  # the line without its numbering
+        self.path = path  # numbering as a tuple of ints, () for unnumbered lines
+        self.depth = depth
+        self.page = page  # 1-based page number, None for outlines parsed from text
+        self.bbox = bbox  # (x0, y0, x1, y1) of the text block, None for outlines parsed from text
+        self.index = index  # position in Outline.nodes
+        self.end = index + 1  # one past the node's last descendant in Outline.nodes
+        self.children = []
+
+    @property
+    def number(self):
+        return '.'.join(map(str, self.path)) if self.path else None
+
+    def __repr__(self):
+        return f"OutlineNode({self.label!r}, depth={self.depth})"
+
+
+class Outline:
+    """Outline lines in document order plus the tree over them"""
+
+    __slots__ = ('roots', 'nodes', '_text')
+
+    def __init__(self, roots, nodes):
+        self.roots = roots
+        self.nodes = nodes
+        self._text = None
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def lines(self):
+        """Return the lines in the "- item" form sent to Mistral"""
+        return ['- ' + node.label for node in self.nodes]
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = '\n'.join(self.lines())
+        return self._text
+
+    def sections(self):
+        """Split into sections starting at top-level numbered topics"""
+        sections = []
+        start = 0
+        seen_topic = False
+        for position, root in enumerate(self.roots):
+            is_topic = root.depth == 1 and bool(root.path)
+            # Lines before the first numbered topic stay with the first section
+            if is_topic and seen_topic:
+                sections.append(self._slice(start, position))
+                start = position
+            seen_topic = seen_topic or is_topic
+        if self.roots:
+            sections.append(self._slice(start, len(self.roots)))
+        return sections
+
+    def _slice(self, first_root, stop_root):
+        roots = self.roots[first_root:stop_root]
+        offset = self.nodes[0].index
+        return Outline(roots, self.nodes[roots[0].index - offset:roots[-1].end - offset])
+
+    @classmethod
+    def join(cls, outlines):
+        """Concatenate consecutive sections of one outline"""
+        outlines = list(outlines)
+        return cls([root for outline in outlines for root in outline.roots],
+                   [node for outline in outlines for node in outline.nodes])
+
+    def to_list(self):
+        """Return the nodes in document order for JSON responses, each pointing at its parent's position"""
+        # Flat rather than nested, so a deep outline cannot exceed the JSON encoder's recursion limit
+        result = []
+        offset = self.nodes[0].index if self.nodes else 0
+        open_nodes = []  # (end, position) of ancestors of the current node
+        for node in self.nodes:
+            while open_nodes and open_nodes[-1][0] <= node.index:
+                open_nodes.pop()
+            result.append({
+                'number': node.number,
+                'text': node.text,
+                'depth': node.depth,
+                'parent': open_nodes[-1][1] if open_nodes else None,
+                'page': node.page,
+                'bbox': list(node.bbox) if node.bbox else None
+            })
+            open_nodes.append((node.end, node.index - offset))
+        return result
+
+
+class OutlineBuilder:
+    """Build an Outline from lines fed one at a time"""
+
+    def __init__(self):
+        self.roots = []
+        self.nodes = []
+        self._open = []  # numbered nodes that can still receive children, outermost first
+
+    def add(self, line, page=None, bbox=None, root=False):
+        """Append one extracted line (with or without its "- " bullet); root=True closes every open topic first"""
+        if root:
+            self._close()
+        label = line[2:] if line.startswith('- ') else line
+        match = NUMBERING.match(label)
+        if match:
+            path = tuple(int(part) for part in match.group(1).rstrip('.').split('.'))
+            text = label[match.end():]
+            depth = len(path)
+            # A node's parent is the nearest open node whose numbering is a prefix of its own
+            while self._open and (self._open[-1].depth >= depth or path[:self._open[-1].depth] != self._open[-1].path):
+                self._open.pop().end = len(self.nodes)
+        else:
+            path = ()
+            text = label
+            depth = self._open[-1].depth + 1 if self._open else 1
+
+        node = OutlineNode(label, text, path, depth, page, bbox, len(self.nodes))
+        (self._open[-1].children if self._open else self.roots).append(node)
+        self.nodes.append(node)
+        if path:
+            self._open.append(node)
+        return node
+
+    def _close(self):
+        while self._open:
+            self._open.pop().end = len(self.nodes)
+
+    def finish(self):
+        self._close()
+        return Outline(self.roots, self.nodes)
+
+
+def parse_outline(mindmap_text):
+    """Parse "- item" outline text into an Outline"""
+    builder = OutlineBuilder()
+    for line in mindmap_text.split('\n'):
+        line = line.strip()
+        if line:
+            builder.add(line)
+    return builder.finish()
+
+
+def as_outline(value):
+    """Return value if it is already an Outline, otherwise parse it as outline text"""
+    return value if isinstance(value, Outline) else parse_outline(value)
@@ -0,0 +1,124 @@
+"""
+Section-level outline cache: reuse agents for top-level topics that did not change between revisions
+"""
+
+import hashlib
+import os
+import re
+from collections import namedtuple
+
+from cache import CACHE_DIR
+from chunking import LLM_CHUNK_MAX_CHARS, pack_sections, split_sections
+from outline import Outline
+
+# Configure outline cache settings
+OUTLINE_CACHE_ENABLED = os.environ.get('OUTLINE_CACHE', '1') != '0'
+OUTLINE_CACHE_DIR = os.environ.get('OUTLINE_CACHE_DIR', os.path.join(CACHE_DIR, 'sections'))
+OUTLINE_CACHE_MAX_BYTES = int(os.environ.get('OUTLINE_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # 64MB on disk
+
+BULLET = re.compile(r'^[-*•–·]\s*')
+NUMBERING = re.compile(r'^\d+(?:\.\d+)*\.?\s*')
+WHITESPACE = re.compile(r'\s+')
+
+PendingChunk = namedtuple('PendingChunk', ['outline', 'sections'])  # sections: indexes into OutlinePlan.sections
+
+
+def normalize_line(line):
+    """Strip bullets, numbering, case and spacing so renumbered or reformatted lines compare equal"""
+    text = NUMBERING.sub('', BULLET.sub('', line.strip()))
+    return WHITESPACE.sub(' ', text).strip().lower()
+
+
+def section_fingerprint(lines, prompt_version):
+    """Fingerprint a section's normalized lines for the given prompt/model version"""
+    digest = hashlib.sha256(prompt_version.encode('utf-8'))
+    for line in lines:
+        normalized = normalize_line(line)
+        if normalized:
+            digest.update(b'\n' + normalized.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def plan_outline(outline, prompt_version, store, cache_mode='use'):
+    """Look up every top-level section of an Outline (or outline text) and return an OutlinePlan"""
+    sections = split_sections(outline)
+    fingerprints = [section_fingerprint(section.lines(), prompt_version) for section in sections]
+    agents = [None] * len(sections)
+    if store is not None and cache_mode == 'use':
+        for index, key in enumerate(fingerprints):
+            entry = store.get(key)
+            if entry:
+                agents[index] = entry['agents']
+    writable = store is not None and cache_mode != 'bypass'
+    return OutlinePlan(sections, fingerprints, agents, store if writable else None)
+
+
+class OutlinePlan:
+    """Cached agents per section, plus the chunks still to be generated and their results"""
+
+    def __init__(self, sections, fingerprints, agents, store=None):
+        self.sections = sections
+        self.fingerprints = fingerprints
+        self.agents = agents
+        self.store = store
+        self._generated = {}  # first section index of a generated run -> agents
+
+    @property
+    def reused(self):
+        return sum(agents is not None for agents in self.agents)
+
+    def pending_chunks(self, max_chars=LLM_CHUNK_MAX_CHARS):
+        """Pack each run of consecutive uncached sections into prompt-sized chunks"""
+        chunks = []
+        run = []
+        for index in range(len(self.sections) + 1):
+            if index < len(self.sections) and self.agents[index] is None:
+                run.append(index)
+                continue
+            if run:
+                for group in pack_sections([self.sections[i].text for i in run], max_chars):
+                    indexes = [run[i] for i in group]
+                    chunks.append(PendingChunk(Outline.join(self.sections[i] for i in indexes), indexes))
+                run = []
+        return chunks
+
+    def fill(self, sections, agents, cacheable=True):
+        """Record generated agents for consecutive sections, caching them when each maps to its section"""
+        sections = list(sections)
+        self._generated[sections[0]] = agents
+        # Agents can only be attributed when the prompt covered one section or each agent covers its own section
+        if self.store is None or not cacheable:
+            return
+        if len(sections) == 1:
+            self.store.put(self.fingerprints[sections[0]], {'agents': agents})
+        elif len(agents) == len(sections) and self._matches_sections(sections, agents):
+            for index, agent in zip(sections, agents):
+                self.store.put(self.fingerprints[index], {'agents': [agent]})
+
+    def _matches_sections(self, sections, agents):
+        """Whether every agent's actions come from its own section's lines and none from another section's"""
+        # The model may regroup actions across topics, so equal counts alone do not mean agent i is section i
+        owners = {}
+        for index in sections:
+            for line in self.sections[index].lines():
+                owners.setdefault(normalize_line(line), set()).add(index)
+        for index, agent in zip(sections, agents):
+            matched = False
+            for subagent in agent.get('subagents', []):
+                for action in subagent.get('actions', []):
+                    found = owners.get(normalize_line(action))
+                    if found is None:
+                        continue  # an action the model added; it belongs to no line
+                    if index not in found:
+                        return False
+                    matched = True
+            if not matched:
+                return False
+        return True
+
+    def assemble(self):
+        """Splice cached and generated agents back together in outline order"""
+        agents = []
+        for index, cached in enumerate(self.agents):
+            agents.extend(cached if cached is not None else self._generated.get(index, []))
+        return agents
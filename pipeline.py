@@ -0,0 +1,471 @@
+"""
+Processing pipeline shared by the Flask and asyncio servers: extraction, generation, parsing and output
+"""
+
+import hashlib
+import json
+import os
+import time
+from contextlib import nullcontext
+
+from admission import AdmissionError
+from cache import ResultCache, make_cache_key
+from chunking import LLM_CHUNK_MAX_CHARS, LLM_PARALLELISM, generate_chunks
+from extraction import PDFLimitError, extract_outline_from_pdf
+from fallback import generate_structured_json
+from json_recovery import JSONRecoveryError, parse_agents_json
+from llm_client import LLMUnavailableError, make_llm_client
+from metrics import REGISTRY, RequestTimer
+from outline import parse_outline
+from outline_cache import OUTLINE_CACHE_DIR, OUTLINE_CACHE_ENABLED, OUTLINE_CACHE_MAX_BYTES, plan_outline
+from prompts import PromptBuilder
+from result_index import RESULT_INDEX_ENABLED, ResultIndex
+from routing import Router
+from storage import OutputWriter
+from streaming import IncrementalAgentParser, format_sse
+
+ALLOWED_EXTENSIONS = {'pdf'}
+
+result_cache = ResultCache()
+section_cache = ResultCache(OUTLINE_CACHE_DIR, OUTLINE_CACHE_MAX_BYTES) if OUTLINE_CACHE_ENABLED else None
+result_index = ResultIndex() if RESULT_INDEX_ENABLED else None
+output_writer = OutputWriter(index=result_index)
+llm_client = make_llm_client()
+router = Router()
+prompt_builder = PromptBuilder()
+
+# Metrics exposed at /metrics
+REQUESTS = REGISTRY.counter('agentscript_http_requests_total', 'HTTP requests by endpoint and status', ['endpoint', 'status'])
+REQUEST_SECONDS = REGISTRY.histogram('agentscript_http_request_duration_seconds', 'HTTP request latency', ['endpoint'])
+CACHE_LOOKUPS = REGISTRY.counter('agentscript_cache_lookups_total', 'Result cache lookups by outcome', ['result'])
+GENERATIONS = REGISTRY.counter('agentscript_generations_total', 'Agent generations by source', ['source'])
+PARSE_ERRORS = REGISTRY.counter('agentscript_parse_errors_total', 'Generated output that could not be parsed')
+JSON_REPAIRS = REGISTRY.counter('agentscript_json_repairs_total', 'Repairs applied to generated JSON', ['repair'])
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+STREAM_PROGRESS_EVERY = 20  # tokens between progress events
+
+# Cached results are only valid for the prompt and model that produced them
+PROMPT_VERSION = hashlib.sha256(f"{llm_client.model}\n{prompt_builder.version}".encode('utf-8')).hexdigest()[:16]
+
+def ask_mistral_agent(mindmap_text):
+    """Send request to Mistral API"""
+    raw_output, _ = generate_agent_json(parse_outline(mindmap_text))
+    return raw_output
+
+def plan_generation(outline, cache_mode='use'):
+    """Look up cached agents for each outline section; returns an OutlinePlan"""
+    plan = plan_outline(outline, PROMPT_VERSION, section_cache, cache_mode)
+    if plan.reused:
+        print(f"[INFO] Reusing cached agents for {plan.reused} of {len(plan.sections)} outline sections")
+    return plan
+
+def generate_agent_json(outline, cache_mode='use', plan=None):
+    """Generate agent JSON for an Outline, returning the raw output and whether it came from 'mistral' or 'fallback'"""
+    plan = plan or plan_generation(outline, cache_mode)
+    chunks = plan.pending_chunks(LLM_CHUNK_MAX_CHARS)
+    if len(chunks) == 1 and not plan.reused:
+        raw_output, source = generate_chunk_json(outline)
+        remember_sections(plan, range(len(plan.sections)), raw_output, source)
+        return raw_output, source
+    
+    if chunks:
+        print(f"[INFO] Generating {len(chunks)} outline chunks with parallelism {LLM_PARALLELISM}")
+    results = generate_chunks([chunk.outline for chunk in chunks], generate_chunk_json, LLM_PARALLELISM)
+    return merge_chunk_results(plan, chunks, results)
+
+def remember_sections(plan, sections, raw_output, source):
+    """Cache per-section agents from a Mistral response that covered the given sections"""
+    if plan.store is None or source != 'mistral':
+        return
+    parsed_json, parse_error = parse_json_response(raw_output)
+    if not parse_error:
+        plan.fill(sections, parsed_json['agents'])
+
+def merge_chunk_results(plan, chunks, results):
+    """Splice per-chunk (raw_output, source) results and cached sections into one agents document"""
+    # A chunk that fails to parse is regenerated by the fallback; fallback agents are never cached
+    sources = {'mistral'} if plan.reused else set()
+    for chunk, (raw_output, source) in zip(chunks, results):
+        parsed_json, parse_error = parse_json_response(raw_output)
+        if parse_error:
+            print(f"[WARN] Chunk output unusable ({parse_error}), using fallback")
+            parsed_json = json.loads(generate_structured_json(chunk.outline))
+            source = 'fallback'
+        plan.fill(chunk.sections, parsed_json['agents'], cacheable=source == 'mistral')
+        sources.add(source)
+    
+    source = 'mistral' if sources == {'mistral'} else 'fallback'
+    return json.dumps({"agents": plan.assemble()}, indent=2), source
+
+def generate_chunk_json(outline):
+    """Generate agent JSON for a single prompt-sized Outline"""
+    prompt = prompt_builder.build(outline).text
+
+    try:
+        started = time.monotonic()
+        raw_output = llm_client.generate(prompt)
+        router.observe(len(outline.text), time.monotonic() - started)
+        return raw_output, 'mistral'
+    except LLMUnavailableError as e:
+        # Fallback: Generate a structured hierarchy based on the input
+        print(f"[WARN] {e}, using fallback")
+    except Exception as e:
+        print(f"Error calling Mistral API: {e}")
+    
+    llm_client.record_fallback()
+    return generate_structured_json(outline), 'fallback'
+
+def route_generation(outline, filename, route='auto', interactive=False, can_refine=False):
+    """Decide whether the outline goes to Mistral, the fallback or both, and log the decision"""
+    decision = router.decide(outline, route, interactive, can_refine)
+    print(f"[ROUTE] {filename}: {decision.describe()}")
+    return decision
+
+def refine_later(decision, refine, pdf_bytes, filename, cache_mode):
+    """Return the decision for the response, scheduling the Mistral regeneration of a 'refine' route"""
+    route_info = decision.to_dict()
+    if decision.route == 'refine':
+        route_info['refine'] = refine(pdf_bytes, filename, cache_mode)
+        if route_info['refine'] is None:
+            print(f"[WARN] Could not schedule refinement for {filename}, keeping the fallback result")
+    return route_info
+
+def stream_mistral_agent(mindmap_text):
+    """Yield response tokens from Mistral as they are generated"""
+    prompt = prompt_builder.build(mindmap_text).text
+    return llm_client.stream(prompt)
+
+def parse_json_response(raw_response):
+    """Parse the agents JSON, repairing chatter, fences, trailing commas, quotes and truncation"""
+    try:
+        parsed, repairs = parse_agents_json(raw_response)
+    except JSONRecoveryError as e:
+        return None, str(e)
+    
+    # A repaired response saves a regeneration; report what was changed
+    if repairs:
+        print(f"[WARN] Recovered malformed JSON response ({', '.join(repairs)})")
+        for repair in repairs:
+            JSON_REPAIRS.inc(repair=repair)
+    return parsed, None
+
+class ProcessingError(Exception):
+    """Processing failure that maps to an HTTP error response"""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+def extract_upload_outline(pdf_bytes, filename):
+    """Extract the mindmap outline from uploaded PDF bytes"""
+    try:
+        # Extract text straight from memory; no temporary file is written
+        print(f"[INFO] Processing file: {filename}")
+        outline = extract_outline_from_pdf(pdf_bytes)
+    except PDFLimitError as e:
+        raise ProcessingError(str(e), 413)
+    
+    if not outline.nodes:
+        raise ProcessingError('No text could be extracted from the PDF', 400)
+    
+    print(f"[DEBUG] Extracted text:\n{outline.text}")
+    return outline
+
+def cached_outline(cached):
+    """Return the outline tree stored with a cached result, rebuilding it for older entries"""
+    return cached.get('outline') or parse_outline(cached['extracted_text']).to_list()
+
+def lookup_cached_result(pdf_bytes, cache_mode):
+    """Return (cache_key, cached entry or None) for an upload"""
+    cache_key = make_cache_key(pdf_bytes, PROMPT_VERSION)
+    cached = result_cache.get(cache_key) if cache_mode == 'use' else None
+    CACHE_LOOKUPS.inc(result='bypass' if cache_mode != 'use' else 'hit' if cached else 'miss')
+    return cache_key, cached
+
+def store_cached_result(cache_key, cache_mode, source, outline, raw_output, parsed_json):
+    """Cache a fresh result when allowed; returns whether it was stored"""
+    # Fallback output is not cached so results improve once Mistral is back
+    stored = cache_mode != 'bypass' and source == 'mistral'
+    if stored:
+        result_cache.put(cache_key, {
+            'extracted_text': outline.text,
+            'outline': outline.to_list(),
+            'raw_response': raw_output,
+            'json_data': parsed_json
+        })
+    return stored
+
+def save_outputs(filename, raw_output, parsed_json, mindmap_text):
+    """Queue the parsed JSON (plus raw response and extracted text) for the background writer"""
+    from werkzeug.utils import secure_filename
+
+    base_filename = secure_filename(os.path.splitext(filename)[0]) or 'document'
+    return output_writer.save(base_filename, raw_output, parsed_json, mindmap_text)
+
+class PipelineRun:
+    """One PDF moving through the pipeline
+
+    The Flask and asyncio servers drive the same steps; the asyncio server runs the blocking ones in its thread
+    pool and awaits generation itself. interactive requests are held to the routing latency budget.
+    """
+
+    def __init__(self, pdf_bytes, filename, cache_mode='use', timer=None, route='auto', interactive=False,
+                 can_refine=False):
+        self.pdf_bytes = pdf_bytes
+        self.filename = filename
+        self.cache_mode = cache_mode
+        self.timer = timer or RequestTimer()
+        self.route = route
+        self.interactive = interactive
+        self.can_refine = can_refine
+        self.started = time.monotonic()
+        self.first_agent_ms = None
+        self.outline = None
+        self.decision = None
+        self.prompt_info = None
+        self.plan = None
+        self.streaming = False  # whether the whole outline went to Mistral as one streamed prompt
+        self.parser = IncrementalAgentParser()
+        self.tokens = []
+    
+    def lookup(self):
+        """Look the upload up in the result cache; returns whether it was a hit"""
+        with self.timer.span('cache_lookup'):
+            self.cache_key, cached = lookup_cached_result(self.pdf_bytes, self.cache_mode)
+        if not cached:
+            return False
+        
+        print(f"[INFO] Cache hit for file: {self.filename} ({self.cache_key[:12]})")
+        self.mindmap_text = cached['extracted_text']
+        self.outline_tree = cached_outline(cached)
+        self.raw_output = cached['raw_response']
+        self.parsed_json = cached['json_data']
+        self.cache_info = {'key': self.cache_key, 'hit': True, 'stored': False}
+        return True
+    
+    def extract(self):
+        """Extract the mindmap outline from the upload"""
+        with self.timer.span('extract'):
+            self.outline = extract_upload_outline(self.pdf_bytes, self.filename)
+        self.mindmap_text = self.outline.text
+        self.outline_tree = self.outline.to_list()
+    
+    def decide(self):
+        """Route the outline to Mistral, the fallback or both; returns the RouteDecision"""
+        self.decision = route_generation(self.outline, self.filename, self.route, self.interactive, self.can_refine)
+        self.prompt_info = prompt_builder.estimate(self.outline) if self.decision.uses_llm else None
+        return self.decision
+    
+    def plan_stream(self):
+        """Look up cached sections before streaming; returns whether the outline can be streamed as one prompt"""
+        self.plan = plan_generation(self.outline, self.cache_mode)
+        # Reused sections and outlines past LLM_CHUNK_MAX_CHARS go through generate_agent_json instead
+        chunks = self.plan.pending_chunks(LLM_CHUNK_MAX_CHARS)
+        self.streaming = not self.plan.reused and len(chunks) == 1
+        if len(chunks) > 1:
+            print(f"[INFO] Outline needs {len(chunks)} chunks, sending agents once they are merged")
+        return self.streaming
+    
+    def generated(self, raw_output, source):
+        """Record the raw output and whether it came from 'mistral' or 'fallback'"""
+        self.raw_output = raw_output
+        self.source = source
+        GENERATIONS.inc(source=source)
+    
+    def generate_fallback(self):
+        with self.timer.span('generate'):
+            self.generated(generate_structured_json(self.outline), 'fallback')
+    
+    def streamed(self, seconds):
+        """Record a Mistral stream that finished after seconds"""
+        router.observe(len(self.mindmap_text), seconds)
+        self.generated(''.join(self.tokens), 'mistral')
+    
+    def parse(self):
+        """Parse the generated output and cache it; raises ProcessingError when it is unusable"""
+        with self.timer.span('parse'):
+            parsed_json, parse_error = parse_json_response(self.raw_output)
+        if parse_error:
+            PARSE_ERRORS.inc()
+            raise ProcessingError(parse_error, 500)
+        self.parsed_json = parsed_json
+        if self.streaming:
+            self.plan.fill(range(len(self.plan.sections)), parsed_json['agents'], cacheable=self.source == 'mistral')
+        
+        with self.timer.span('cache_store'):
+            stored = store_cached_result(self.cache_key, self.cache_mode, self.source, self.outline,
+                                         self.raw_output, parsed_json)
+        self.cache_info = {'key': self.cache_key, 'hit': False, 'stored': stored}
+    
+    def save(self):
+        """Queue the output files and log the stage timings"""
+        with self.timer.span('save'):
+            self.files_saved = save_outputs(self.filename, self.raw_output, self.parsed_json, self.mindmap_text)
+        self.timer.log()
+    
+    def result(self, refine=None):
+        """Return the response payload; refine schedules the Mistral regeneration of a 'refine' route"""
+        return {
+            'success': True,
+            'json_data': self.parsed_json,
+            'raw_response': self.raw_output,
+            'extracted_text': self.mindmap_text,
+            'outline': self.outline_tree,
+            'cache': self.cache_info,
+            'route': (refine_later(self.decision, refine, self.pdf_bytes, self.filename, self.cache_mode)
+                      if self.decision else None),
+            'prompt': self.prompt_info,
+            'files_saved': self.files_saved
+        }
+    
+    def timing(self):
+        return {
+            'request_id': self.timer.request_id,
+            'first_agent_ms': self.first_agent_ms,
+            'total_ms': round((time.monotonic() - self.started) * 1000, 1),
+            'stages_ms': self.timer.breakdown()
+        }
+    
+    def agent_event(self, index, agent):
+        if self.first_agent_ms is None:
+            self.first_agent_ms = round((time.monotonic() - self.started) * 1000, 1)
+        return format_sse('agent', {'index': index, 'agent': agent})
+    
+    def extracted_event(self):
+        return format_sse('extracted', {'extracted_text': self.mindmap_text, 'outline': self.outline_tree})
+    
+    def token_events(self, token):
+        """Consume one streamed token; returns the agent and progress events it completes"""
+        self.tokens.append(token)
+        first = self.parser.count  # feed() counts every agent it completes before returning them
+        events = [self.agent_event(first + offset, agent) for offset, agent in enumerate(self.parser.feed(token))]
+        if len(self.tokens) % STREAM_PROGRESS_EVERY == 0:
+            events.append(format_sse('progress', {'tokens': len(self.tokens), 'chars': len(self.parser.buffer)}))
+        return events
+    
+    def agent_events(self):
+        """Events for the final agent list, replacing any agents sent from a partial Mistral stream"""
+        agents = self.parsed_json.get('agents', [])
+        if self.cache_info['hit']:
+            events = []
+        elif self.source == 'fallback' or self.parser.count != len(agents):
+            events = [format_sse('reset', {})]
+        else:
+            return []  # every agent was already sent while streaming
+        return events + [self.agent_event(index, agent) for index, agent in enumerate(agents)]
+
+def process_pdf(pdf_bytes, filename, cache_mode='use', progress=None, generation_slots=None, timer=None,
+                route='auto', interactive=False, refine=None):
+    """Run extraction, generation and parsing for one PDF and return the response payload
+
+    route forces 'llm' or 'fallback'; interactive requests are held to the routing latency budget, and refine
+    (a callable taking pdf_bytes, filename and cache_mode) schedules the Mistral upgrade of a fallback answer.
+    """
+    def report(stage, fraction):
+        if progress:
+            progress(stage, fraction)
+
+    run = PipelineRun(pdf_bytes, filename, cache_mode, timer, route, interactive, refine is not None)
+    if not run.lookup():
+        report('extracting', 0.1)
+        run.extract()
+        run.decide()
+        if run.decision.uses_llm:
+            # Send to Mistral agent
+            print("[INFO] Sending to Mistral agent...")
+            with generation_slots or nullcontext():
+                report('generating', 0.3)
+                with run.timer.span('generate'):
+                    run.generated(*generate_agent_json(run.outline, cache_mode))
+        else:
+            report('generating', 0.3)
+            run.generate_fallback()
+        
+        # Parse JSON response
+        report('parsing', 0.8)
+        run.parse()
+    
+    # Save output files
+    report('saving', 0.9)
+    run.save()
+    return run.result(refine)
+
+def stream_process_pdf(pdf_bytes, filename, cache_mode='use', timer=None, generation_slots=None, route='auto',
+                       refine=None):
+    """Process one PDF, yielding server-sent events as agents are generated"""
+    run = PipelineRun(pdf_bytes, filename, cache_mode, timer, route, True, refine is not None)
+    
+    try:
+        if run.lookup():
+            yield run.extracted_event()
+            yield from run.agent_events()
+        else:
+            yield format_sse('status', {'stage': 'extracting'})
+            run.extract()
+            yield run.extracted_event()
+            
+            run.decide()
+            yield format_sse('status', {'stage': 'generating', 'route': run.decision.route})
+            if run.decision.uses_llm:
+                print("[INFO] Streaming from Mistral agent...")
+                with generation_slots or nullcontext():
+                    generate_started = time.perf_counter()
+                    if not run.plan_stream():
+                        # Chunks (or only the changed sections) are generated; all agents are sent once spliced
+                        run.generated(*generate_agent_json(run.outline, cache_mode, run.plan))
+                    else:
+                        try:
+                            for token in stream_mistral_agent(run.mindmap_text):
+                                yield from run.token_events(token)
+                            run.streamed(time.perf_counter() - generate_started)
+                        except Exception as e:
+                            print(f"Error streaming from Mistral API: {e}")
+                            llm_client.record_fallback()
+                            run.generated(generate_structured_json(run.outline), 'fallback')
+                    run.timer.record('generate', time.perf_counter() - generate_started)
+            else:
+                run.generate_fallback()
+            
+            yield format_sse('status', {'stage': 'parsing'})
+            run.parse()
+            yield from run.agent_events()
+        
+        run.save()
+        yield format_sse('result', dict(run.result(refine), timing=run.timing()))
+    
+    except ProcessingError as e:
+        yield format_sse('error', {'error': str(e), 'status': e.status_code})
+    except AdmissionError as e:
+        yield format_sse('error', {'error': str(e), 'status': e.status_code, 'retry_after': e.retry_after})
+    except Exception as e:
+        print(f"[ERROR] Processing failed: {str(e)}")
+        yield format_sse('error', {'error': f'Processing failed: {str(e)}', 'status': 500})
+
+# Component state is read at scrape time so the hot path pays nothing for it
+REGISTRY.callback('agentscript_cache_entries', 'Entries in the result cache', lambda: result_cache.stats()['entries'])
+REGISTRY.callback('agentscript_cache_bytes', 'Bytes stored in the result cache', lambda: result_cache.stats()['bytes'])
+REGISTRY.callback('agentscript_output_writes_pending', 'Outputs queued for the background writer',
+                  lambda: output_writer.stats()['pending'])
+REGISTRY.callback('agentscript_output_events_total', 'Output writer events (written, failed, inline, evicted)',
+                  lambda: {name: output_writer.stats()[name] for name in ('written', 'failed', 'inline', 'evicted')},
+                  type='counter', labelnames=['event'])
+
+def register_llm_metrics(client, registry=REGISTRY):
+    """Expose the counters and breaker state of the client a server uses for Mistral calls"""
+    registry.callback('agentscript_llm_events_total', 'Mistral client events',
+                      lambda: {name: value for name, value in client.stats().items()
+                               if isinstance(value, int) and not isinstance(value, bool)},
+                      type='counter', labelnames=['event'])
+    registry.callback('agentscript_llm_circuit_open', 'Whether the Mistral circuit breaker is open',
+                      lambda: int(client.stats()['breaker'] != 'closed'))
+    if hasattr(client, 'clients'):
+        # Backend pools also report each backend
+        registry.callback('agentscript_llm_backend_in_flight', 'Mistral calls running per backend',
+                          lambda: {backend.base_url: backend.in_flight for backend in client.clients},
+                          labelnames=['backend'])
+        registry.callback('agentscript_llm_backend_up', 'Whether the backend circuit breaker lets calls through',
+                          lambda: {backend.base_url: int(backend.breaker.available()) for backend in client.clients},
+                          labelnames=['backend'])
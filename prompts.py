@@ -0,0 +1,176 @@
+"""
+Prompt construction for Mistral: a fixed instruction block followed by the compacted outline
+"""
+
+import hashlib
+import os
+import re
+
+from metrics import REGISTRY
+from outline import as_outline
+from outline_cache import BULLET
+
+# Configure prompt settings
+PROMPT_COMPACT = os.environ.get('PROMPT_COMPACT', '1') == '1'  # drop bullets, repeated whitespace and duplicate lines
+PROMPT_NUMBERING = os.environ.get('PROMPT_NUMBERING', 'full')  # 'full' ("1.2 Task") or 'short' (indented "2. Task")
+
+# Sent byte-for-byte identical before every outline, so Ollama can reuse its evaluation from the previous call
+PROMPT_PREFIX = """
+You are a JSON-generating assistant that creates structured agent hierarchies with detailed descriptions.
+
+Convert the following structured outline into a hierarchical JSON format with agents, subagents, descriptions, and actions.
+
+Input format (outline extracted from a PDF mindmap, one topic per line):
+1. Load and Inspect Raw Data
+1.1 Extract Data From Database
+1.2 Import CSV Files
+2. Clean Data
+2.1 Remove Duplicates
+2.2 Handle Missing Values
+
+Expected JSON output format:
+{
+  "agents": [
+    {
+      "name": "Raw Data Handler Agent",
+      "description": "Manages the initial acquisition and inspection of raw data from various sources.",
+      "subagents": [
+        {
+          "name": "Data Loader",
+          "description": "Handles the extraction and import of data from databases and files.",
+          "actions": [
+            "Extract Data From Database",
+            "Import CSV Files",
+            "Validate data source connections"
+          ]
+        }
+      ]
+    },
+    {
+      "name": "Data Cleaner Agent",
+      "description": "Performs comprehensive data cleaning and quality assurance operations.",
+      "subagents": [
+        {
+          "name": "Data Processor",
+          "description": "Removes inconsistencies and handles data quality issues.",
+          "actions": [
+            "Remove Duplicates",
+            "Handle Missing Values",
+            "Standardize data formats"
+          ]
+        }
+      ]
+    }
+  ]
+}
+
+Rules:
+- Group related actions under meaningful agent names
+- Create subagents that represent specialized roles
+- Use descriptive agent names ending with "Agent"
+- Use descriptive subagent names for specialized roles
+- Include meaningful descriptions for both agents and subagents (1-2 sentences each)
+- Group actions logically under appropriate subagents
+- Return only raw JSON, no markdown or commentary
+
+Now convert the following mindmap text into structured JSON:
+
+"""[1:]
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+PROMPT_TOKENS = REGISTRY.histogram('agentscript_prompt_tokens', 'Estimated tokens per Mistral prompt', ['part'],
+                                   buckets=TOKEN_BUCKETS)
+PROMPT_TOKENS_SAVED = REGISTRY.counter('agentscript_prompt_tokens_saved_total',
+                                       'Estimated outline tokens removed by compaction')
+
+
+def estimate_tokens(text):
+    """Approximate token count (words plus punctuation marks) without loading a tokenizer"""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+class Prompt:
+    """A built prompt with its token estimates"""
+
+    def __init__(self, text, prefix_tokens, outline_tokens, saved_tokens, dropped_lines):
+        self.text = text
+        self.prefix_tokens = prefix_tokens
+        self.outline_tokens = outline_tokens
+        self.saved_tokens = saved_tokens  # outline tokens removed by compaction
+        self.dropped_lines = dropped_lines
+
+    @property
+    def tokens(self):
+        return self.prefix_tokens + self.outline_tokens
+
+    def to_dict(self):
+        return {
+            'estimated_tokens': self.tokens,
+            'prefix_tokens': self.prefix_tokens,
+            'outline_tokens': self.outline_tokens,
+            'saved_tokens': self.saved_tokens,
+            'dropped_lines': self.dropped_lines
+        }
+
+
+class PromptBuilder:
+    """Render outlines compactly after the shared instruction prefix"""
+
+    def __init__(self, prefix=PROMPT_PREFIX, compact=PROMPT_COMPACT, numbering=PROMPT_NUMBERING):
+        if numbering not in ('full', 'short'):
+            raise ValueError(f"Unknown PROMPT_NUMBERING {numbering!r}; use 'full' or 'short'")
+        self.prefix = prefix
+        self.compact = compact
+        self.numbering = numbering
+        self.prefix_tokens = estimate_tokens(prefix)
+
+    @property
+    def version(self):
+        """Identifies everything that changes the prompt text, for cache keys"""
+        settings = f"compact={self.compact} numbering={self.numbering}\n{self.prefix}"
+        return hashlib.sha256(settings.encode('utf-8')).hexdigest()[:16]
+
+    def outline_lines(self, outline):
+        """Return (lines, dropped line count) for an Outline"""
+        if not self.compact:
+            return outline.lines(), 0
+        lines = []
+        seen = set()
+        previous = None
+        for node in outline.nodes:
+            label = ' '.join(BULLET.sub('', node.label.strip()).split())
+            # A numbered line seen before, or any line repeating the one above it, adds nothing
+            if label == previous or (node.path and label in seen):
+                continue
+            if node.path:
+                seen.add(label)
+            previous = label
+            if self.numbering == 'short':
+                text = ' '.join(BULLET.sub('', node.text.strip()).split())
+                label = f"{node.path[-1]}. {text}" if node.path else text
+                label = '  ' * (node.depth - 1) + label
+            lines.append(label)
+        return lines, len(outline.nodes) - len(lines)
+
+    def compact_outline(self, outline):
+        """Return (outline text, outline tokens, tokens saved, lines dropped) for an Outline"""
+        lines, dropped = self.outline_lines(outline)
+        outline_text = '\n'.join(lines)
+        outline_tokens = estimate_tokens(outline_text)
+        saved = max(0, estimate_tokens(outline.text) - outline_tokens) if self.compact else 0
+        return outline_text, outline_tokens, saved, dropped
+
+    def build(self, outline):
+        """Return the Prompt for an Outline (or outline text)"""
+        outline_text, outline_tokens, saved, dropped = self.compact_outline(as_outline(outline))
+        PROMPT_TOKENS.observe(self.prefix_tokens, part='prefix')
+        PROMPT_TOKENS.observe(outline_tokens, part='outline')
+        PROMPT_TOKENS_SAVED.inc(saved)
+        return Prompt(self.prefix + outline_text, self.prefix_tokens, outline_tokens, saved, dropped)
+
+    def estimate(self, outline):
+        """Token estimates for the prompt of a whole outline, without recording metrics"""
+        _, outline_tokens, saved, dropped = self.compact_outline(as_outline(outline))
+        return Prompt(None, self.prefix_tokens, outline_tokens, saved, dropped).to_dict()
@@ -0,0 +1,266 @@
+"""
+Searchable index of generated agent hierarchies: SQLite with full-text search over agent, subagent and action names
+
+Usage: python result_index.py --import outputs/   (index *_output.json files written before the index existed)
+"""
+
+import argparse
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from storage import OUTPUT_DIR
+
+# Configure result index settings
+RESULT_INDEX_ENABLED = os.environ.get('RESULT_INDEX', '1') == '1'
+RESULT_INDEX_PATH = os.environ.get('RESULT_INDEX_PATH', os.path.join('index', 'results.db'))  # outside OUTPUT_DIR
+RESULT_INDEX_MMAP = int(os.environ.get('RESULT_INDEX_MMAP', 256 * 1024 * 1024))  # bytes of the database read via mmap
+RESULT_PAGE_SIZE = int(os.environ.get('RESULT_PAGE_SIZE', 20))
+RESULT_PAGE_MAX = int(os.environ.get('RESULT_PAGE_MAX', 100))
+
+SEARCH_FIELDS = {'all': None, 'name': 'name', 'agent': 'agents', 'subagent': 'subagents', 'action': 'actions'}
+QUERY_TERM = re.compile(r'"([^"]*)"|([\w]+\*?)')
+SUMMARY_COLUMNS = 'r.id, r.record, r.name, r.created, r.agents, r.subagents, r.actions'
+MAX_ID = 2 ** 63 - 1
+
+
+class QueryError(ValueError):
+    """Invalid search query or pagination parameters"""
+
+
+def match_expression(query, field='all'):
+    """Turn a user query into an FTS5 expression: every word (word* for a prefix, "..." for a phrase) must match"""
+    if field not in SEARCH_FIELDS:
+        raise QueryError(f"Unknown search field '{field}', expected one of {', '.join(SEARCH_FIELDS)}")
+    phrases = []
+    for phrase, word in QUERY_TERM.findall(query):
+        if phrase.strip():
+            phrases.append('"' + phrase.strip() + '"')
+        elif word:
+            phrases.append(f'"{word.rstrip("*")}"*' if word.endswith('*') else f'"{word}"')
+    if not phrases:
+        raise QueryError('Search query must contain at least one word')
+    expression = ' '.join(phrases)
+    column = SEARCH_FIELDS[field]
+    return f"{{{column}}} : ({expression})" if column else expression
+
+
+def read_page_args(args):
+    """Return (limit, cursor) from request arguments (Flask request.args or aiohttp request.query)"""
+    try:
+        limit = int(args.get('limit', RESULT_PAGE_SIZE))
+        cursor = int(args['cursor']) if args.get('cursor') else None
+    except ValueError:
+        raise QueryError('limit and cursor must be integers')
+    if not 1 <= limit <= RESULT_PAGE_MAX:
+        raise QueryError(f"limit must be between 1 and {RESULT_PAGE_MAX}")
+    return limit, cursor
+
+
+def hierarchy_names(parsed_json):
+    """Return the agent, subagent and action names of an agents document as three lists"""
+    agents, subagents, actions = [], [], []
+    for agent in parsed_json.get('agents', []):
+        agents.append(str(agent.get('name', '')))
+        for subagent in agent.get('subagents', []):
+            subagents.append(str(subagent.get('name', '')))
+            actions.extend(str(action) for action in subagent.get('actions', []))
+    return agents, subagents, actions
+
+
+class ResultIndex:
+    """Append-only store of generated hierarchies with a full-text index and newest-first pagination"""
+
+    def __init__(self, path=RESULT_INDEX_PATH, mmap_size=RESULT_INDEX_MMAP):
+        self.path = path
+        self.mmap_size = mmap_size
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._db = None  # the database is created by the first write, so importing the app leaves no files
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        db.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        return db
+
+    def _writer(self):
+        # Called with self._lock held
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            db = self._connect()
+            with db:
+                db.execute('PRAGMA journal_mode=WAL')
+                db.execute(
+                    'CREATE TABLE IF NOT EXISTS results ('
+                    'id INTEGER PRIMARY KEY, record TEXT UNIQUE NOT NULL, name TEXT, created REAL, '
+                    'agents INTEGER, subagents INTEGER, actions INTEGER, data BLOB)'
+                )
+                db.execute('CREATE INDEX IF NOT EXISTS results_created ON results (created)')
+                # The FTS row shares its rowid with the results row
+                db.execute('CREATE VIRTUAL TABLE IF NOT EXISTS results_fts USING fts5('
+                           "name, agents, subagents, actions, tokenize='unicode61 remove_diacritics 2')")
+            self._db = db
+        return self._db
+
+    def _reader(self):
+        """This thread's connection, or None while nothing has been indexed"""
+        # One connection per thread, so searches run alongside each other and the writer (WAL)
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            if not self._exists():
+                return None
+            db = self._local.db = self._connect()
+        return db
+
+    def _exists(self):
+        with self._lock:
+            return self._db is not None or os.path.exists(self.path)
+
+    def add(self, record, json_bytes, created=None):
+        """Index one document's agents JSON (bytes, as written to storage); returns whether it was new"""
+        return self.add_many([(record, json_bytes, created)]) == 1
+
+    def add_many(self, items):
+        """Index (record, json_bytes, created) items in one transaction; returns how many were new"""
+        rows = []
+        for record, json_bytes, created in items:
+            agents, subagents, actions = hierarchy_names(json.loads(json_bytes))
+            name = record.rsplit('_', 1)[0]
+            rows.append((record, name, created or time.time(), agents, subagents, actions,
+                         gzip.compress(json_bytes, compresslevel=6)))
+        added = 0
+        with self._lock, self._writer():
+            for record, name, created, agents, subagents, actions, data in rows:
+                # Records are content-addressed, so a known record is already indexed with the same agents
+                cursor = self._db.execute(
+                    'INSERT OR IGNORE INTO results (record, name, created, agents, subagents, actions, data) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (record, name, created, len(agents), len(subagents), len(actions), data))
+                if cursor.rowcount:
+                    self._db.execute(
+                        'INSERT INTO results_fts (rowid, name, agents, subagents, actions) VALUES (?, ?, ?, ?, ?)',
+                        (cursor.lastrowid, name, '\n'.join(agents), '\n'.join(subagents), '\n'.join(actions)))
+                    added += 1
+        return added
+
+    def _summary(self, row):
+        return {
+            'id': row[0],
+            'record': row[1],
+            'name': row[2],
+            'created_at': row[3],
+            'agents': row[4],
+            'subagents': row[5],
+            'actions': row[6]
+        }
+
+    def _page(self, rows, limit):
+        # One row past the page tells whether there is a next page
+        results = [self._summary(row) for row in rows[:limit]]
+        next_cursor = results[-1]['id'] if len(rows) > limit else None
+        return results, next_cursor
+
+    def list(self, limit=RESULT_PAGE_SIZE, cursor=None):
+        """Return (summaries newest first, next cursor or None); cursor is the id of the last result seen"""
+        db = self._reader()
+        if db is None:
+            return [], None
+        rows = db.execute(
+            f'SELECT {SUMMARY_COLUMNS} FROM results r WHERE r.id < ? ORDER BY r.id DESC LIMIT ?',
+            (MAX_ID if cursor is None else cursor, limit + 1)).fetchall()
+        return self._page(rows, limit)
+
+    def search(self, query, field='all', limit=RESULT_PAGE_SIZE, cursor=None):
+        """Return (matching summaries newest first with a highlighted snippet, next cursor or None)"""
+        expression = match_expression(query, field)
+        db = self._reader()
+        if db is None:
+            return [], None
+        try:
+            rows = db.execute(
+                f"SELECT {SUMMARY_COLUMNS}, snippet(results_fts, -1, '[', ']', '...', 12) "
+                'FROM results_fts JOIN results r ON r.id = results_fts.rowid '
+                'WHERE results_fts MATCH ? AND results_fts.rowid < ? ORDER BY results_fts.rowid DESC LIMIT ?',
+                (expression, MAX_ID if cursor is None else cursor, limit + 1)).fetchall()
+        except sqlite3.OperationalError as e:
+            raise QueryError(f"Invalid search query: {e}")
+        results, next_cursor = self._page(rows, limit)
+        for result, row in zip(results, rows):
+            result['snippet'] = row[7]
+        return results, next_cursor
+
+    def get(self, record):
+        """Return the summary and agents JSON of a record, or None"""
+        db = self._reader()
+        if db is None:
+            return None
+        row = db.execute(f'SELECT {SUMMARY_COLUMNS}, r.data FROM results r WHERE r.record = ?', (record,)).fetchone()
+        if row is None:
+            return None
+        result = self._summary(row)
+        result['json_data'] = json.loads(gzip.decompress(row[7]))
+        return result
+
+    def evict(self, max_age, records=()):
+        """Delete results older than max_age seconds and the given records; returns results removed"""
+        if not self._exists():
+            return 0
+        with self._lock, self._writer():
+            ids = set()
+            if max_age:
+                ids.update(row[0] for row in self._db.execute('SELECT id FROM results WHERE created < ?',
+                                                              (time.time() - max_age,)))
+            for record in records:
+                row = self._db.execute('SELECT id FROM results WHERE record = ?', (record,)).fetchone()
+                if row:
+                    ids.add(row[0])
+            rows = [(row_id,) for row_id in ids]
+            self._db.executemany('DELETE FROM results_fts WHERE rowid = ?', rows)
+            self._db.executemany('DELETE FROM results WHERE id = ?', rows)
+        return len(rows)
+
+    def import_directory(self, directory=OUTPUT_DIR, batch_size=500):
+        """Index the <record>_output.json(.gz) files of a local output directory; returns results added"""
+        suffixes = ('_output.json', '_output.json.gz')
+        added = 0
+        batch = []
+        for entry in sorted(os.scandir(directory), key=lambda entry: entry.stat().st_mtime):
+            suffix = next((suffix for suffix in suffixes if entry.name.endswith(suffix)), None)
+            if suffix is None or not entry.is_file():
+                continue
+            with open(entry.path, 'rb') as f:
+                data = f.read()
+            if suffix.endswith('.gz'):
+                data = gzip.decompress(data)
+            batch.append((entry.name[:-len(suffix)], data, entry.stat().st_mtime))
+            if len(batch) >= batch_size:
+                added += self.add_many(batch)
+                batch = []
+        if batch:
+            added += self.add_many(batch)
+        return added
+
+    def stats(self):
+        db = self._reader()
+        count = db.execute('SELECT COUNT(*) FROM results').fetchone()[0] if db else 0
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {'path': self.path, 'results': count, 'bytes': size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--import', dest='directory', default=OUTPUT_DIR, help='local output directory to index')
+    parser.add_argument('--index', default=RESULT_INDEX_PATH, help='index database')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    added = ResultIndex(args.index).import_directory(args.directory)
+    print(f"[INFO] Indexed {added} results from {args.directory} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Per-request choice between Mistral and the rule-based generator, from outline size, recent latency and queue depth
+"""
+
+import math
+import os
+import threading
+import time
+
+from chunking import LLM_CHUNK_MAX_CHARS, LLM_PARALLELISM
+from metrics import REGISTRY
+
+# Configure routing settings
+ROUTING_MODE = os.environ.get('ROUTING_MODE', 'adaptive')  # adaptive, llm (always try Mistral first) or fallback
+ROUTE_SMALL_MAX_NODES = int(os.environ.get('ROUTE_SMALL_MAX_NODES', 3))  # outlines this small skip Mistral
+ROUTE_SMALL_MAX_DEPTH = int(os.environ.get('ROUTE_SMALL_MAX_DEPTH', 2))
+ROUTE_LATENCY_BUDGET = float(os.environ.get('ROUTE_LATENCY_BUDGET', 20))  # predicted seconds an interactive request may take
+ROUTE_REFINE = os.environ.get('ROUTE_REFINE', '1') == '1'  # over budget: answer with the fallback, then regenerate
+ROUTE_LATENCY_HALF_LIFE = float(os.environ.get('ROUTE_LATENCY_HALF_LIFE', 300))  # seconds; 0 keeps estimates forever
+
+ROUTES = ('llm', 'fallback', 'refine')
+LATENCY_SMOOTHING = 0.2  # weight of the newest Mistral call in the moving averages
+
+ROUTE_DECISIONS = REGISTRY.counter('agentscript_route_decisions_total', 'Generation routing decisions',
+                                   ['route', 'reason'])
+
+
+class RouteDecision:
+    """Where one document's agents come from, and why"""
+
+    def __init__(self, route, reason, nodes, depth, predicted_seconds=None):
+        self.route = route  # 'llm', 'fallback' or 'refine' (fallback now, Mistral in the background)
+        self.reason = reason
+        self.nodes = nodes
+        self.depth = depth
+        self.predicted_seconds = predicted_seconds
+
+    @property
+    def uses_llm(self):
+        return self.route == 'llm'
+
+    def describe(self):
+        predicted = f", predicted {self.predicted_seconds:.1f}s" if self.predicted_seconds is not None else ''
+        return f"{self.route} ({self.reason}: {self.nodes} nodes, depth {self.depth}{predicted})"
+
+    def to_dict(self):
+        return {
+            'route': self.route,
+            'reason': self.reason,
+            'predicted_seconds': round(self.predicted_seconds, 2) if self.predicted_seconds is not None else None
+        }
+
+
+class Router:
+    """Decide per document whether Mistral is worth waiting for"""
+
+    def __init__(self, mode=ROUTING_MODE, small_max_nodes=ROUTE_SMALL_MAX_NODES, small_max_depth=ROUTE_SMALL_MAX_DEPTH,
+                 latency_budget=ROUTE_LATENCY_BUDGET, refine=ROUTE_REFINE, half_life=ROUTE_LATENCY_HALF_LIFE):
+        if mode not in ('adaptive', 'llm', 'fallback'):
+            raise ValueError(f"Unknown ROUTING_MODE {mode!r}; use 'adaptive', 'llm' or 'fallback'")
+        self.mode = mode
+        self.small_max_nodes = small_max_nodes
+        self.small_max_depth = small_max_depth
+        self.latency_budget = latency_budget
+        self.refine = refine
+        self.half_life = half_life
+        self.queue = None  # admission controller whose expected wait counts towards the budget
+        self._lock = threading.Lock()
+        self._call_seconds = None  # moving averages over successful Mistral calls
+        self._call_chars = None
+        self._observed_at = None
+
+    def watch(self, admission):
+        """Count the expected wait for a generation slot towards predicted latency"""
+        self.queue = admission
+
+    def observe(self, outline_chars, seconds):
+        """Record a successful Mistral call for an outline (or chunk) of outline_chars characters"""
+        with self._lock:
+            if self._call_seconds is None:
+                self._call_seconds, self._call_chars = seconds, outline_chars
+            else:
+                self._call_seconds += LATENCY_SMOOTHING * (seconds - self._call_seconds)
+                self._call_chars += LATENCY_SMOOTHING * (outline_chars - self._call_chars)
+            self._observed_at = time.monotonic()
+
+    def _seconds_per_char(self):
+        # Only calls routed to Mistral update the estimate, so a slow spell that sends everything to the fallback
+        # would never be measured again; the estimate halves every half_life without calls until one fits the budget
+        seconds_per_char = self._call_seconds / max(self._call_chars, 1)
+        if self.half_life > 0:
+            seconds_per_char *= 0.5 ** ((time.monotonic() - self._observed_at) / self.half_life)
+        return seconds_per_char
+
+    def predict(self, outline):
+        """Predicted seconds to generate the outline with Mistral once a slot is free, or None before any call"""
+        with self._lock:
+            if self._call_seconds is None:
+                return None
+            seconds_per_char = self._seconds_per_char()
+        chars = len(outline.text)
+        # Chunks run LLM_PARALLELISM at a time
+        parallel = max(1, min(LLM_PARALLELISM, math.ceil(chars / LLM_CHUNK_MAX_CHARS)))
+        return seconds_per_char * chars / parallel
+
+    def decide(self, outline, route='auto', interactive=False, can_refine=False):
+        """Return a RouteDecision; route forces 'llm' or 'fallback', interactive applies the latency budget"""
+        nodes = len(outline)
+        depth = max((node.depth for node in outline.nodes), default=0)
+        if route in ('llm', 'fallback'):
+            return self._record(RouteDecision(route, 'requested', nodes, depth))
+        if self.mode != 'adaptive':
+            return self._record(RouteDecision(self.mode, 'mode', nodes, depth))
+        if nodes <= self.small_max_nodes and depth <= self.small_max_depth:
+            return self._record(RouteDecision('fallback', 'small_outline', nodes, depth))
+        if not interactive:
+            return self._record(RouteDecision('llm', 'background', nodes, depth))
+
+        predicted = self.predict(outline)
+        if predicted is None:
+            return self._record(RouteDecision('llm', 'no_latency_data', nodes, depth))
+        if self.queue is not None:
+            predicted += self.queue.expected_wait()
+        if predicted <= self.latency_budget:
+            return self._record(RouteDecision('llm', 'within_budget', nodes, depth, predicted))
+        refine = self.refine and can_refine
+        return self._record(RouteDecision('refine' if refine else 'fallback', 'over_budget', nodes, depth, predicted))
+
+    def _record(self, decision):
+        ROUTE_DECISIONS.inc(route=decision.route, reason=decision.reason)
+        return decision
+
+    def stats(self):
+        with self._lock:
+            seconds_per_kchar = self._seconds_per_char() * 1000 if self._call_seconds is not None else None
+            estimate_age = time.monotonic() - self._observed_at if self._observed_at is not None else None
+        return {
+            'mode': self.mode,
+            'latency_budget': self.latency_budget,
+            'refine': self.refine,
+            'seconds_per_1k_chars': round(seconds_per_kchar, 3) if seconds_per_kchar is not None else None,
+            'estimate_age_seconds': round(estimate_age, 1) if estimate_age is not None else None,
+            'expected_queue_seconds': round(self.queue.expected_wait(), 2) if self.queue is not None else None
+        }
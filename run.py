@@ -4,12 +4,35 @@ Simple startup script for Agent Script Interface
 """
 
 import os
+import re
 import sys
 import subprocess
 import webbrowser
 import time
 import threading
 
+def requirements_satisfied(path="requirements.txt"):
+    """Check installed package versions against requirements.txt without importing the packages"""
+    from importlib import metadata
+    
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            # Only "name" and "name==version" lines are checked; anything else is left to pip
+            match = re.fullmatch(r'([A-Za-z0-9._-]+)\s*(?:==\s*([^\s;]+))?', line)
+            if not match:
+                return False
+            name, pinned = match.groups()
+            try:
+                installed = metadata.version(name)
+            except metadata.PackageNotFoundError:
+                return False
+            if pinned and installed != pinned:
+                return False
+    return True
+
 def install_dependencies():
     """Install required dependencies"""
     print("Installing dependencies...")
@@ -50,8 +73,10 @@ def main():
     if not check_files():
         sys.exit(1)
     
-    # Install dependencies
-    if not install_dependencies():
+    # Install dependencies (pass --install to force pip to run)
+    if '--install' not in sys.argv and requirements_satisfied():
+        print("✅ Dependencies already installed")
+    elif not install_dependencies():
         sys.exit(1)
     
     # Create outputs directory
@@ -0,0 +1,384 @@
+"""
+Background persistence of processing outputs with pluggable storage backends
+"""
+
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# Configure output storage settings
+OUTPUT_BACKEND = os.environ.get('OUTPUT_BACKEND', 'local')  # local, sqlite or objects
+OUTPUT_DIR = os.environ.get('OUTPUT_DIR', 'outputs')
+OUTPUT_COMPRESS = os.environ.get('OUTPUT_COMPRESS', '0') == '1'  # gzip every artifact
+OUTPUT_SAVE_DEBUG = os.environ.get('OUTPUT_SAVE_DEBUG', '1') != '0'  # raw response and extracted text
+OUTPUT_MAX_BYTES = int(os.environ.get('OUTPUT_MAX_BYTES', 512 * 1024 * 1024))  # 512MB; 0 disables the limit
+OUTPUT_MAX_AGE = float(os.environ.get('OUTPUT_MAX_AGE', 30 * 24 * 3600))  # seconds; 0 keeps outputs forever
+OUTPUT_QUEUE_SIZE = int(os.environ.get('OUTPUT_QUEUE_SIZE', 256))  # pending writes before saving inline
+OUTPUT_EVICT_INTERVAL = float(os.environ.get('OUTPUT_EVICT_INTERVAL', 60))  # seconds between retention passes
+
+ARTIFACT_NAMES = {'json': 'output.json', 'raw': 'raw_response.txt', 'debug': 'extracted_text.txt'}
+
+
+def artifact_file(name):
+    """Return (record, artifact) for a LocalBackend file name, or None for any other file"""
+    base = name[:-3] if name.endswith('.gz') else name
+    for artifact, artifact_name in ARTIFACT_NAMES.items():
+        if base.endswith(f"_{artifact_name}"):
+            return base[:-len(artifact_name) - 1], artifact
+    return None
+
+
+class LocalBackend:
+    """One file per artifact in a flat directory, named <record>_<artifact>"""
+
+    name = 'local'
+
+    def __init__(self, directory=OUTPUT_DIR):
+        self.directory = directory  # created by the first write
+
+    def locate(self, record, artifact, compressed):
+        suffix = '.gz' if compressed else ''
+        return os.path.join(self.directory, f"{record}_{ARTIFACT_NAMES[artifact]}{suffix}")
+
+    def write(self, record, artifacts, compressed):
+        os.makedirs(self.directory, exist_ok=True)
+        for artifact, data in artifacts.items():
+            path = self.locate(record, artifact, compressed)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    def _files(self):
+        # Only artifact files: anything else sharing the directory (an index database, say) is never evicted
+        files = []
+        if not os.path.isdir(self.directory):
+            return files
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and artifact_file(entry.name):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+        return sorted(files)
+
+    def evict(self, max_bytes, max_age):
+        """Delete files older than max_age, then the oldest until under max_bytes
+
+        Returns (files removed, records whose parsed JSON was removed).
+        """
+        files = self._files()
+        total = sum(size for _, _, size in files)
+        cutoff = time.time() - max_age if max_age else None
+        removed = 0
+        records = []
+        for mtime, path, size in files:
+            if not (cutoff and mtime < cutoff) and not (max_bytes and total > max_bytes):
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+            record, artifact = artifact_file(os.path.basename(path))
+            if artifact == 'json':
+                records.append(record)
+        return removed, records
+
+    def stats(self):
+        files = self._files()
+        return {'backend': self.name, 'directory': self.directory,
+                'files': len(files), 'bytes': sum(size for _, _, size in files)}
+
+
+class SQLiteBackend:
+    """Artifacts as rows of a single SQLite database"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=os.path.join(OUTPUT_DIR, 'outputs.db')):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None  # created by the first write
+
+    def _connect(self, create=False):
+        # Called with self._lock held; returns None while nothing has been written
+        if self._db is None and (create or os.path.exists(self.path)):
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            with db:
+                db.execute('PRAGMA journal_mode=WAL')
+                db.execute(
+                    'CREATE TABLE IF NOT EXISTS outputs ('
+                    'record TEXT, artifact TEXT, data BLOB, compressed INTEGER, created REAL, '
+                    'PRIMARY KEY (record, artifact))'
+                )
+                db.execute('CREATE INDEX IF NOT EXISTS outputs_created ON outputs (created)')
+            self._db = db
+        return self._db
+
+    def locate(self, record, artifact, compressed):
+        return f"sqlite:{self.path}#{record}/{artifact}"
+
+    def write(self, record, artifacts, compressed):
+        now = time.time()
+        rows = [(record, artifact, data, int(compressed), now) for artifact, data in artifacts.items()]
+        with self._lock, self._connect(create=True):
+            self._db.executemany('INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?)', rows)
+
+    def read(self, record, artifact):
+        """Return an artifact's bytes (decompressed), or None"""
+        with self._lock:
+            if self._connect() is None:
+                return None
+            row = self._db.execute('SELECT data, compressed FROM outputs WHERE record = ? AND artifact = ?',
+                                   (record, artifact)).fetchone()
+        if row is None:
+            return None
+        return gzip.decompress(row[0]) if row[1] else row[0]
+
+    def evict(self, max_bytes, max_age):
+        """Delete records older than max_age, then the oldest until under max_bytes
+
+        Returns (rows removed, records removed).
+        """
+        removed = 0
+        evicted = []
+        if self._db is None and not os.path.exists(self.path):
+            return removed, evicted
+        with self._lock, self._connect():
+            if max_age:
+                cutoff = time.time() - max_age
+                evicted += [row[0] for row in self._db.execute(
+                    "SELECT record FROM outputs WHERE created < ? AND artifact = 'json'", (cutoff,))]
+                removed += self._db.execute('DELETE FROM outputs WHERE created < ?', (cutoff,)).rowcount
+            if max_bytes:
+                total = self._db.execute('SELECT COALESCE(SUM(LENGTH(data)), 0) FROM outputs').fetchone()[0]
+                records = self._db.execute(
+                    'SELECT record, SUM(LENGTH(data)) FROM outputs GROUP BY record ORDER BY MIN(created)').fetchall()
+                for record, size in records:
+                    if total <= max_bytes:
+                        break
+                    removed += self._db.execute('DELETE FROM outputs WHERE record = ?', (record,)).rowcount
+                    evicted.append(record)
+                    total -= size
+        return removed, evicted
+
+    def stats(self):
+        with self._lock:
+            if self._connect() is None:
+                return {'backend': self.name, 'path': self.path, 'artifacts': 0, 'bytes': 0}
+            rows, size = self._db.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM outputs').fetchone()
+        return {'backend': self.name, 'path': self.path, 'artifacts': rows, 'bytes': size}
+
+
+class ObjectStoreBackend:
+    """Local stand-in for an object store: blobs named by their own hash plus a manifest per record"""
+
+    name = 'objects'
+
+    def __init__(self, directory=os.path.join(OUTPUT_DIR, 'objects')):
+        self.directory = directory
+        self.blob_dir = os.path.join(directory, 'blobs')
+        self.manifest_dir = os.path.join(directory, 'manifests')  # both created by the first write
+        self._lock = threading.Lock()
+
+    def locate(self, record, artifact, compressed):
+        suffix = '.gz' if compressed else ''
+        return f"objects://{record}/{ARTIFACT_NAMES[artifact]}{suffix}"
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def write(self, record, artifacts, compressed):
+        manifest = {'record': record, 'created': time.time(), 'compressed': compressed, 'artifacts': {}}
+        for artifact, data in artifacts.items():
+            digest = hashlib.sha256(data).hexdigest()
+            path = self._blob_path(digest)
+            # Identical artifacts across uploads share one blob
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(f"{path}.tmp", 'wb') as f:
+                    f.write(data)
+                os.replace(f"{path}.tmp", path)
+            manifest['artifacts'][artifact] = {'blob': digest, 'size': len(data)}
+
+        manifest_path = os.path.join(self.manifest_dir, f"{record}.json")
+        with self._lock:
+            os.makedirs(self.manifest_dir, exist_ok=True)
+            with open(f"{manifest_path}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+            os.replace(f"{manifest_path}.tmp", manifest_path)
+
+    def _manifests(self):
+        manifests = []
+        if not os.path.isdir(self.manifest_dir):
+            return manifests
+        for entry in os.scandir(self.manifest_dir):
+            if entry.name.endswith('.json'):
+                try:
+                    with open(entry.path, 'r', encoding='utf-8') as f:
+                        manifests.append((entry.path, json.load(f)))
+                except (OSError, ValueError):
+                    continue
+        return sorted(manifests, key=lambda item: item[1].get('created', 0))
+
+    def evict(self, max_bytes, max_age):
+        """Delete manifests by age and size, then blobs no manifest refers to
+
+        Returns (records removed, their names).
+        """
+        with self._lock:
+            manifests = self._manifests()
+            sizes = [sum(a['size'] for a in manifest['artifacts'].values()) for _, manifest in manifests]
+            total = sum(sizes)
+            cutoff = time.time() - max_age if max_age else None
+            removed = 0
+            for (path, manifest), size in zip(manifests, sizes):
+                if not (cutoff and manifest['created'] < cutoff) and not (max_bytes and total > max_bytes):
+                    break
+                os.unlink(path)
+                total -= size
+                removed += 1
+
+            if removed:
+                referenced = {a['blob'] for _, manifest in manifests[removed:] for a in manifest['artifacts'].values()}
+                for root, _, names in os.walk(self.blob_dir):
+                    for name in names:
+                        if name not in referenced and not name.endswith('.tmp'):
+                            os.unlink(os.path.join(root, name))
+        return removed, [manifest['record'] for _, manifest in manifests[:removed]]
+
+    def stats(self):
+        manifests = self._manifests()
+        blobs = [os.path.getsize(os.path.join(root, name))
+                 for root, _, names in os.walk(self.blob_dir) for name in names]
+        return {'backend': self.name, 'directory': self.directory,
+                'records': len(manifests), 'blobs': len(blobs), 'bytes': sum(blobs)}
+
+
+BACKENDS = {'local': LocalBackend, 'sqlite': SQLiteBackend, 'objects': ObjectStoreBackend}
+
+
+def make_backend(name=OUTPUT_BACKEND):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown OUTPUT_BACKEND '{name}', expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+class OutputWriter:
+    """Write outputs from a background thread so responses never wait on storage"""
+
+    def __init__(self, backend=None, compress=OUTPUT_COMPRESS, save_debug=OUTPUT_SAVE_DEBUG,
+                 max_bytes=OUTPUT_MAX_BYTES, max_age=OUTPUT_MAX_AGE, queue_size=OUTPUT_QUEUE_SIZE,
+                 evict_interval=OUTPUT_EVICT_INTERVAL, index=None):
+        self.backend = backend or make_backend()
+        self.index = index  # ResultIndex that every written document is added to
+        self.compress = compress
+        self.save_debug = save_debug
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_interval = evict_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+        self._counters = {'written': 0, 'failed': 0, 'inline': 0, 'evicted': 0}
+
+    def save(self, name, raw_output, parsed_json, mindmap_text):
+        """Queue the outputs of one document and return where each artifact will be stored"""
+        artifacts = {'json': json.dumps(parsed_json, separators=(',', ':')).encode('utf-8')}
+        if self.save_debug:
+            artifacts['raw'] = raw_output.encode('utf-8')
+            artifacts['debug'] = mindmap_text.encode('utf-8')
+
+        # Content-addressed records: identical outputs share a key, concurrent uploads never collide
+        digest = hashlib.sha256()
+        for artifact, data in artifacts.items():
+            digest.update(artifact.encode('ascii') + b'\0' + hashlib.sha256(data).digest())
+        record = f"{name}_{digest.hexdigest()[:16]}"
+        locations = {artifact: self.backend.locate(record, artifact, self.compress) for artifact in artifacts}
+
+        self._start()
+        try:
+            self._queue.put_nowait((record, artifacts))
+        except queue.Full:
+            print(f"[WARN] Output queue full, saving {record} inline")
+            self._count('inline')
+            self._write(record, artifacts)
+        return locations
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='output-writer', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            record, artifacts = self._queue.get()
+            try:
+                self._write(record, artifacts)
+                if time.monotonic() - self._last_evict >= self.evict_interval:
+                    self.evict()
+            finally:
+                self._queue.task_done()
+
+    def _write(self, record, artifacts):
+        json_bytes = artifacts['json']
+        if self.compress:
+            artifacts = {artifact: gzip.compress(data, compresslevel=6) for artifact, data in artifacts.items()}
+        try:
+            self.backend.write(record, artifacts, self.compress)
+        except Exception as e:
+            print(f"[ERROR] Failed to save outputs for {record}: {e}")
+            self._count('failed')
+            return
+        self._count('written')
+        print(f"[SUCCESS] Outputs saved: {record} ({self.backend.name})")
+        if self.index is not None:
+            try:
+                self.index.add(record, json_bytes)
+            except Exception as e:
+                print(f"[WARN] Failed to index outputs for {record}: {e}")
+
+    def evict(self):
+        """Apply the retention policy now"""
+        self._last_evict = time.monotonic()
+        if not (self.max_bytes or self.max_age):
+            return
+        try:
+            removed, records = self.backend.evict(self.max_bytes, self.max_age)
+            if self.index is not None:
+                # Index rows go with their artifacts, whether those aged out or were evicted for size
+                removed += self.index.evict(self.max_age, records)
+        except Exception as e:
+            print(f"[WARN] Output retention pass failed: {e}")
+            return
+        if removed:
+            print(f"[INFO] Output retention removed {removed} items")
+            self._count('evicted', removed)
+
+    def flush(self):
+        """Block until every queued output has been written"""
+        self._queue.join()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['pending'] = self._queue.qsize()
+        stats['backend'] = self.backend.name
+        if self.index is not None:
+            stats['index'] = self.index.stats()
+        return stats
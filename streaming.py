@@ -0,0 +1,80 @@
+"""
+Incremental parsing of streamed LLM output and server-sent event helpers
+"""
+
+import json
+
+
+def format_sse(event, data):
+    """Format a server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class IncrementalAgentParser:
+    """Extract completed agent objects from a partially generated agents JSON document"""
+
+    def __init__(self):
+        self.buffer = ''
+        self.count = 0  # agents emitted so far
+        self._pos = 0  # next character to scan
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._last_string = None  # most recent complete string, used to spot the "agents" key
+        self._agents_depth = None  # depth inside the agents array once found
+        self._agent_start = None
+
+    def feed(self, text):
+        """Consume more output and return agents completed by it"""
+        self.buffer += text
+        completed = []
+        buffer = self.buffer
+
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = buffer[self._string_start:i]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i + 1
+            elif char in '{[':
+                if char == '[' and self._agents_depth is None and self._depth == 1 and self._last_string == 'agents':
+                    self._agents_depth = self._depth + 1
+                elif char == '{' and self._agents_depth is not None and self._depth == self._agents_depth:
+                    self._agent_start = i
+                self._depth += 1
+                self._last_string = None
+            elif char in '}]':
+                self._depth -= 1
+                if self._agent_start is not None and self._depth == self._agents_depth:
+                    agent = self._decode(buffer[self._agent_start:i + 1])
+                    if agent is not None:
+                        completed.append(agent)
+                    self._agent_start = None
+                elif self._agents_depth is not None and self._depth < self._agents_depth:
+                    self._agents_depth = None  # agents array closed
+                self._last_string = None
+            elif char not in ' \t\r\n:':
+                self._last_string = None
+
+        self._pos = len(buffer)
+        self.count += len(completed)
+        return completed
+
+    @staticmethod
+    def _decode(fragment):
+        try:
+            agent = json.loads(fragment)
+        except ValueError:
+            return None
+        return agent if isinstance(agent, dict) else None
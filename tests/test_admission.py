@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import admission as admission_module
+from admission import Admission, AdmissionError, AsyncAdmission, RateLimiter
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not reached'
+        time.sleep(0.005)
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    controller = Admission(max_active=1, max_queue=10, queue_timeout=5)
+    order = []
+
+    def worker(name):
+        with controller.slot():
+            order.append(name)
+
+    with controller.slot():
+        threads = []
+        for index in range(5):
+            thread = threading.Thread(target=worker, args=(index,))
+            thread.start()
+            threads.append(thread)
+            wait_until(lambda: controller.stats()['waiting'] == index + 1)
+    for thread in threads:
+        thread.join(5)
+
+    assert order == [0, 1, 2, 3, 4]
+    assert controller.stats()['active'] == 0 and controller.admitted == 6
+
+
+def test_arrivals_cannot_jump_the_queue():
+    controller = Admission(max_active=1, max_queue=10, queue_timeout=5)
+    order = []
+
+    def worker(name):
+        with controller.slot():
+            order.append(name)
+
+    holder = controller.slot()
+    holder.__enter__()
+    queued = threading.Thread(target=worker, args=('queued',))
+    queued.start()
+    wait_until(lambda: controller.stats()['waiting'] == 1)
+    holder.__exit__(None, None, None)
+    # The released slot was handed to the waiter, so a new arrival finds none free
+    worker('arrival')
+    queued.join(5)
+    assert order[0] == 'queued'
+
+
+def test_full_queue_and_timeout_are_rejected():
+    controller = Admission(max_active=1, max_queue=1, queue_timeout=0.05)
+    release = threading.Event()
+
+    def hold():
+        with controller.slot():
+            release.wait(5)
+
+    threading.Thread(target=hold).start()
+    wait_until(lambda: controller.active == 1)
+    waiter = threading.Thread(target=hold)
+    waiter.start()
+    wait_until(lambda: controller.stats()['waiting'] == 1)
+
+    with pytest.raises(AdmissionError) as full:
+        with controller.slot():
+            pass
+    assert full.value.reason == 'queue_full' and full.value.status_code == 503 and full.value.retry_after >= 1
+
+    release.set()
+    waiter.join(5)
+    wait_until(lambda: controller.active == 0)
+    release.clear()
+    holder = threading.Thread(target=hold)
+    holder.start()
+    wait_until(lambda: controller.active == 1)
+    with pytest.raises(AdmissionError) as timed_out:
+        with controller.slot():
+            pass
+    assert timed_out.value.reason == 'timeout'
+    assert controller.stats()['waiting'] == 0
+    release.set()
+    holder.join(5)
+
+
+def test_async_waiters_are_admitted_in_arrival_order():
+    async def scenario():
+        controller = AsyncAdmission(max_active=1, max_queue=10, queue_timeout=5)
+        order = []
+
+        async def worker(name):
+            async with controller.slot():
+                order.append(name)
+                await asyncio.sleep(0)
+
+        async with controller.slot():
+            tasks = []
+            for index in range(5):
+                tasks.append(asyncio.ensure_future(worker(index)))
+                await asyncio.sleep(0)
+            assert controller.stats()['waiting'] == 5
+        await asyncio.gather(*tasks)
+        return order, controller
+
+    order, controller = asyncio.run(scenario())
+    assert order == [0, 1, 2, 3, 4]
+    assert controller.active == 0
+
+
+def test_async_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        controller = AsyncAdmission(max_active=1, max_queue=10, queue_timeout=5)
+        order = []
+
+        async def worker(name):
+            async with controller.slot():
+                order.append(name)
+
+        async with controller.slot():
+            first = asyncio.ensure_future(worker('cancelled'))
+            await asyncio.sleep(0)
+            second = asyncio.ensure_future(worker('kept'))
+            await asyncio.sleep(0)
+            first.cancel()
+            await asyncio.gather(first, return_exceptions=True)
+        await second
+        return order, controller
+
+    order, controller = asyncio.run(scenario())
+    assert order == ['kept']
+    assert controller.active == 0 and controller.stats()['waiting'] == 0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(admission_module.time, 'monotonic', fake)
+    return fake
+
+
+def test_token_bucket_allows_a_burst_then_the_sustained_rate(clock):
+    limiter = RateLimiter(per_minute=60, burst=3)
+    assert [limiter.check('client') for _ in range(3)] == [0, 0, 0]
+    assert limiter.check('client') == pytest.approx(1.0)
+
+    clock.now += 0.5
+    assert limiter.check('client') == pytest.approx(0.5)
+    clock.now += 0.5
+    assert limiter.check('client') == 0
+    assert limiter.check('client') == pytest.approx(1.0)
+
+    # Refills stop at the burst size
+    clock.now += 60
+    assert [limiter.check('client') for _ in range(4)][:3] == [0, 0, 0]
+
+
+def test_token_buckets_are_per_client(clock):
+    limiter = RateLimiter(per_minute=6, burst=1)
+    assert limiter.check('a') == 0
+    assert limiter.check('a') == pytest.approx(10.0)
+    assert limiter.check('b') == 0
+
+
+def test_disabled_rate_limiter_allows_everything():
+    limiter = RateLimiter(per_minute=0, burst=1)
+    assert not limiter.enabled
+    assert all(limiter.check('client') == 0 for _ in range(100))
+
+
+def test_idle_buckets_are_pruned(clock):
+    limiter = RateLimiter(per_minute=60, burst=1, max_clients=2)
+    limiter.check('a')
+    limiter.check('b')
+    clock.now += 5
+    limiter.check('c')
+    assert set(limiter._buckets) == {'c'}
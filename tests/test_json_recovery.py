@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from json_recovery import JSONRecoveryError, parse_agents_json
+
+
+def agent(name, actions=('Load data', 'Clean data')):
+    return {
+        'name': name,
+        'description': f"{name} description",
+        'subagents': [{'name': f"{name} helper", 'description': 'Helps', 'actions': list(actions)}]
+    }
+
+
+def agents_text(*names):
+    return json.dumps({'agents': [agent(name) for name in names]})
+
+
+def test_well_formed_output_needs_no_repairs():
+    data, repairs = parse_agents_json(agents_text('Alpha', 'Beta'))
+    assert [a['name'] for a in data['agents']] == ['Alpha', 'Beta']
+    assert repairs == []
+
+
+def test_truncated_output_keeps_complete_agents():
+    text = agents_text('Alpha', 'Beta')
+    data, repairs = parse_agents_json(text[:text.index('Beta') + 20])
+    assert [a['name'] for a in data['agents']] == ['Alpha']
+    assert data['agents'][0] == agent('Alpha')
+    assert 'closed_brackets' in repairs
+
+
+def test_truncated_inside_last_subagent_drops_it():
+    text = agents_text('Alpha', 'Beta')
+    cut = text.rindex('Clean data') + 3  # inside the last action string of Beta
+    data, repairs = parse_agents_json(text[:cut])
+    assert 'closed_brackets' in repairs
+    assert data['agents'][0] == agent('Alpha')
+    assert all(isinstance(action, str) for a in data['agents'] for s in a['subagents'] for action in s['actions'])
+
+
+def test_truncated_before_first_agent_is_an_error():
+    with pytest.raises(JSONRecoveryError):
+        parse_agents_json('{"agents": [{"name": "Alpha", "descr')
+
+
+def test_missing_closing_brackets_are_added():
+    text = agents_text('Alpha')
+    data, repairs = parse_agents_json(text[:-2])
+    assert data == {'agents': [agent('Alpha')]}
+    assert repairs == ['closed_brackets']
+
+
+def test_single_quoted_output():
+    text = "{'agents': [{'name': 'Alpha', 'description': 'Says \"hi\"', 'subagents': " \
+           "[{'name': 'Helper', 'description': 'Helps', 'actions': ['Load data']}]}]}"
+    data, repairs = parse_agents_json(text)
+    assert data['agents'][0]['name'] == 'Alpha'
+    assert data['agents'][0]['description'] == 'Says "hi"'
+    assert data['agents'][0]['subagents'][0]['actions'] == ['Load data']
+    assert repairs == ['single_quotes']
+
+
+def test_mismatched_bracket_closes_the_open_object():
+    text = agents_text('Alpha')
+    # The agent object is closed with ']' instead of '}]'
+    broken = text[:-3] + ']}'
+    data, repairs = parse_agents_json(broken)
+    assert data == {'agents': [agent('Alpha')]}
+    assert 'mismatched_brackets' in repairs
+
+
+def test_extra_closing_brace_ends_the_document():
+    text = agents_text('Alpha')
+    broken = text[:-2] + '}]}'
+    data, repairs = parse_agents_json(broken)
+    assert data == {'agents': [agent('Alpha')]}
+    assert 'mismatched_brackets' in repairs
+
+
+def test_chatter_fences_and_trailing_commas():
+    text = 'Here is the JSON:\n```json\n' + agents_text('Alpha')[:-2] + ',]}\n```\nLet me know!'
+    data, repairs = parse_agents_json(text)
+    assert data == {'agents': [agent('Alpha')]}
+    assert {'stripped_leading_text', 'trailing_commas', 'stripped_trailing_text'} <= set(repairs)
+
+
+def test_bare_agents_list_is_wrapped():
+    data, repairs = parse_agents_json(json.dumps([agent('Alpha')]))
+    assert data == {'agents': [agent('Alpha')]}
+    assert repairs == ['wrapped_agents_list']
+
+
+def test_schema_violations_are_rejected():
+    with pytest.raises(JSONRecoveryError, match='agents'):
+        parse_agents_json('{"agents": [{"description": "no name", "subagents": []}]}')
+    with pytest.raises(JSONRecoveryError):
+        parse_agents_json('no json here')
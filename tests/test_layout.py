@@ -0,0 +1,97 @@
+import fitz  # PyMuPDF
+
+from benchmarks.common import make_mindmap_pdf, make_radial_mindmap_pdf
+from extraction import extract_outline_from_pdf
+from layout import mindmap_items
+
+
+def first_page(pdf_bytes):
+    return fitz.open(stream=pdf_bytes, filetype='pdf')[0]
+
+
+def draw_box(page, x, y, text):
+    width = fitz.get_text_length(text, fontsize=10)
+    rect = fitz.Rect(x - width / 2 - 3, y - 10, x + width / 2 + 3, y + 4)
+    page.draw_rect(rect, color=(0, 0, 0))
+    page.insert_text((x - width / 2, y), text, fontsize=10)
+    return rect
+
+
+def test_radial_mindmap_levels_and_order():
+    data, nodes = make_radial_mindmap_pdf(4, children=2, depth=3, seed=1)
+    items = mindmap_items(first_page(data))
+    assert sorted((text, level) for text, _, level in items) == sorted((text, level) for _, level, text in nodes)
+    # Branches are read clockwise from the top, the order they were laid out in
+    assert [text for text, _, level in items if level == 1] == [text for _, level, text in nodes if level == 1]
+
+
+def test_radial_mindmap_rebuilds_parents():
+    data, nodes = make_radial_mindmap_pdf(4, children=2, depth=3, seed=2)
+    expected = {text: nodes[parent][2] if parent is not None else None for parent, _, text in nodes}
+    items = extract_outline_from_pdf(data).to_list()
+    assert len(items) == len(nodes)
+    for item in items:
+        parent = items[item['parent']]['text'] if item['parent'] is not None else None
+        assert parent == expected[item['text']], item['text']
+    # The central topic is the numbered top-level topic and its branches are nested under it
+    assert items[0]['text'] == 'Central Topic' and items[0]['number'] == '1'
+    assert [item['number'] for item in items if item['depth'] == 2] == ['1.1', '1.2', '1.3', '1.4']
+    assert all(item['page'] == 1 and item['bbox'] for item in items)
+
+
+def test_text_outline_page_is_not_a_mindmap():
+    assert mindmap_items(first_page(make_mindmap_pdf(1))) is None
+
+
+def test_unlinked_boxes_come_first_without_a_level():
+    doc = fitz.open()
+    page = doc.new_page(width=400, height=300)
+    root = draw_box(page, 200, 150, 'Root idea')
+    left = draw_box(page, 80, 60, 'Left branch')
+    right = draw_box(page, 320, 60, 'Right branch')
+    draw_box(page, 200, 270, 'Loose note')
+    for child in (left, right):
+        page.draw_line(((root.x0 + root.x1) / 2, root.y0), ((child.x0 + child.x1) / 2, child.y1), color=(0, 0, 0))
+    items = mindmap_items(page, force=True)
+    # Branches of a central topic go clockwise from 12 o'clock, so the right one comes first
+    assert [(text, level) for text, _, level in items] == [
+        ('Loose note', None), ('Root idea', 0), ('Right branch', 1), ('Left branch', 1)]
+    assert mindmap_items(page, min_linked=1.0) is None
+
+
+def link_boxes(page, parent, child):
+    page.draw_line(((parent.x0 + parent.x1) / 2, parent.y1), ((child.x0 + child.x1) / 2, child.y0), color=(0, 0, 0))
+
+
+def test_every_mindmap_on_every_page_is_its_own_topic():
+    doc = fitz.open()
+    page = doc.new_page(width=600, height=400)
+    alpha = draw_box(page, 150, 60, 'Alpha root')
+    alpha_left = draw_box(page, 80, 160, 'Alpha left')
+    alpha_right = draw_box(page, 220, 160, 'Alpha right')
+    alpha_deep = draw_box(page, 80, 260, 'Alpha deep')
+    beta = draw_box(page, 450, 60, 'Beta root')
+    beta_child = draw_box(page, 450, 160, 'Beta child')
+    for parent, child in ((alpha, alpha_left), (alpha, alpha_right), (alpha_left, alpha_deep), (beta, beta_child)):
+        link_boxes(page, parent, child)
+    page = doc.new_page(width=600, height=400)
+    draw_box(page, 500, 30, 'Loose note')
+    gamma = draw_box(page, 300, 100, 'Gamma root')
+    for x in (200, 400):
+        link_boxes(page, gamma, draw_box(page, x, 200, f"Gamma {x}"))
+
+    items = extract_outline_from_pdf(doc.tobytes(), layout='graph').to_list()
+    parents = [items[item['parent']]['text'] if item['parent'] is not None else None for item in items]
+    assert [(item['number'], item['text'], parent) for item, parent in zip(items, parents)] == [
+        ('1', 'Alpha root', None),
+        ('1.1', 'Alpha right', 'Alpha root'),
+        ('1.2', 'Alpha left', 'Alpha root'),
+        ('1.2.1', 'Alpha deep', 'Alpha left'),
+        ('2', 'Beta root', None),
+        ('2.1', 'Beta child', 'Beta root'),
+        # A loose box on the next page does not attach to the last open topic of the previous one
+        (None, 'Loose note', None),
+        ('3', 'Gamma root', None),
+        ('3.1', 'Gamma 400', 'Gamma root'),
+        ('3.2', 'Gamma 200', 'Gamma root')]
+    assert [item['page'] for item in items] == [1] * 6 + [2] * 4
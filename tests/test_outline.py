@@ -0,0 +1,84 @@
+from outline import OutlineBuilder, as_outline, parse_outline
+
+THREE_LEVELS = """
+- 1. Data cleaning
+- 1.1 Missing values
+- 1.1.1 Impute with median
+- 1.1.2 Drop empty rows
+- 1.2 Duplicates
+- 2. Reporting
+- 2.1 Charts
+- 2.1.1 Revenue by month
+"""
+
+
+def test_three_level_outline_tree():
+    outline = parse_outline(THREE_LEVELS)
+    assert len(outline) == 8
+    assert [root.text for root in outline.roots] == ['Data cleaning', 'Reporting']
+
+    cleaning = outline.roots[0]
+    assert [child.text for child in cleaning.children] == ['Missing values', 'Duplicates']
+    missing = cleaning.children[0]
+    assert [child.text for child in missing.children] == ['Impute with median', 'Drop empty rows']
+    assert [node.depth for node in outline.nodes] == [1, 2, 3, 3, 2, 1, 2, 3]
+    assert [node.number for node in outline.nodes] == ['1', '1.1', '1.1.1', '1.1.2', '1.2', '2', '2.1', '2.1.1']
+
+
+def test_node_end_spans_its_descendants():
+    outline = parse_outline(THREE_LEVELS)
+    cleaning, reporting = outline.roots
+    assert outline.nodes[cleaning.index:cleaning.end] == outline.nodes[:5]
+    assert outline.nodes[reporting.index:reporting.end] == outline.nodes[5:]
+    assert cleaning.children[0].end == 4
+
+
+def test_to_list_points_at_parents():
+    items = parse_outline(THREE_LEVELS).to_list()
+    assert [item['parent'] for item in items] == [None, 0, 1, 1, 0, None, 5, 6]
+    assert items[2] == {'number': '1.1.1', 'text': 'Impute with median', 'depth': 3, 'parent': 1,
+                        'page': None, 'bbox': None}
+
+
+def test_text_round_trips():
+    outline = parse_outline(THREE_LEVELS)
+    assert outline.text == THREE_LEVELS.strip()
+    assert parse_outline(outline.text).to_list() == outline.to_list()
+
+
+def test_unnumbered_lines_nest_under_the_last_numbered_line():
+    outline = parse_outline('- 1. Topic\n- 1.1 Subtopic\n- a plain note\n- 2024 budget\n- 2. Next')
+    note, budget = outline.nodes[2], outline.nodes[3]
+    assert note.path == () and note.depth == 3
+    assert budget.text == '2024 budget' and budget.depth == 3  # a year is not numbering
+    assert [node.text for node in outline.roots[0].children[0].children] == ['a plain note', '2024 budget']
+    assert outline.roots[1].text == 'Next'
+
+
+def test_numbering_that_skips_a_level_attaches_to_the_nearest_prefix():
+    outline = parse_outline('- 1. Topic\n- 1.1.1 Deep item\n- 1.2 Sibling')
+    topic = outline.roots[0]
+    assert [child.text for child in topic.children] == ['Deep item', 'Sibling']
+    assert outline.nodes[1].depth == 3
+
+
+def test_sections_split_at_top_level_topics():
+    outline = parse_outline('- Preface\n' + THREE_LEVELS)
+    sections = outline.sections()
+    assert [section.lines()[0] for section in sections] == ['- Preface', '- 2. Reporting']
+    assert [len(section) for section in sections] == [6, 3]
+
+
+def test_builder_records_page_and_bbox():
+    builder = OutlineBuilder()
+    builder.add('1. Topic', page=1, bbox=(0, 0, 10, 10))
+    builder.add('- 1.1 Child', page=2, bbox=(5, 5, 20, 20))
+    items = builder.finish().to_list()
+    assert items[1]['page'] == 2 and items[1]['bbox'] == [5, 5, 20, 20]
+    assert items[1]['parent'] == 0
+
+
+def test_as_outline_accepts_text_or_outline():
+    outline = parse_outline(THREE_LEVELS)
+    assert as_outline(outline) is outline
+    assert as_outline(THREE_LEVELS).to_list() == outline.to_list()
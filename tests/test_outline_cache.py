@@ -0,0 +1,116 @@
+import pytest
+
+from cache import ResultCache
+from outline import parse_outline
+from outline_cache import normalize_line, plan_outline
+
+VERSION = 'test-prompt'
+
+ORIGINAL = """
+- 1. Ingest
+- 1.1 Read CSV files
+- 2. Clean
+- 2.1 Drop duplicate rows
+- 3. Report
+- 3.1 Chart revenue
+"""
+
+# Section 2 changed; sections 1 and 3 were renumbered and reformatted only
+REVISED = """
+- 1.  INGEST
+- 1.1 read csv files
+- 2. Clean
+- 2.1 Drop duplicate rows
+- 2.2 Impute missing values
+- 3. Report
+- 3.1 Chart revenue
+"""
+
+
+def agent(name, actions=()):
+    return {'name': name, 'description': '', 'subagents': [{'name': name, 'description': '', 'actions': list(actions)}]}
+
+
+def section_agent(section, prefix=''):
+    """One agent whose actions are the section's subtopics, plus one the model made up"""
+    return agent(prefix + section.roots[0].text, [node.text for node in section.nodes[1:]] + ['Log progress'])
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultCache(str(tmp_path), max_bytes=1024 * 1024)
+
+
+def generate_all(plan, max_chars=10000, prefix=''):
+    """Fill every pending chunk with one agent per section, as a well-behaved model would"""
+    for chunk in plan.pending_chunks(max_chars):
+        plan.fill(chunk.sections, [section_agent(section, prefix) for section in chunk.outline.sections()])
+    return plan.assemble()
+
+
+def test_normalize_line_ignores_bullets_numbering_and_case():
+    assert normalize_line('- 1.2.  Read   CSV files') == normalize_line('• read csv files')
+
+
+def test_unchanged_sections_are_spliced_back_in_order(store):
+    first = plan_outline(parse_outline(ORIGINAL), VERSION, store)
+    assert first.reused == 0
+    assert [a['name'] for a in generate_all(first, prefix='v1 ')] == ['v1 Ingest', 'v1 Clean', 'v1 Report']
+
+    revised = plan_outline(parse_outline(REVISED), VERSION, store)
+    assert revised.reused == 2
+    pending = revised.pending_chunks()
+    assert [chunk.sections for chunk in pending] == [[1]]
+    assert 'Impute missing values' in pending[0].outline.text
+
+    revised.fill([1], [agent('v2 Clean')])
+    assert [a['name'] for a in revised.assemble()] == ['v1 Ingest', 'v2 Clean', 'v1 Report']
+
+
+def test_sections_are_cached_one_per_agent_from_a_multi_section_chunk(store):
+    plan = plan_outline(parse_outline(ORIGINAL), VERSION, store)
+    (chunk,) = plan.pending_chunks()
+    assert chunk.sections == [0, 1, 2]
+    plan.fill(chunk.sections, [section_agent(section) for section in chunk.outline.sections()])
+
+    again = plan_outline(parse_outline(ORIGINAL), VERSION, store)
+    assert again.reused == 3 and again.pending_chunks() == []
+    assert [a['name'] for a in again.assemble()] == ['Ingest', 'Clean', 'Report']
+
+
+def test_regrouped_agents_are_not_cached_per_section(store):
+    plan = plan_outline(parse_outline(ORIGINAL), VERSION, store)
+    # One agent per section, but the model moved the cleaning action into the first agent
+    plan.fill([0, 1, 2], [agent('Prepare', ['Read CSV files', 'Drop duplicate rows']), agent('Quality', ['Check types']),
+                          agent('Report', ['Chart revenue'])])
+    assert [a['name'] for a in plan.assemble()] == ['Prepare', 'Quality', 'Report']
+    assert plan_outline(parse_outline(ORIGINAL), VERSION, store).reused == 0
+
+    # A single-section prompt is attributable whatever its agents contain
+    plan.fill([1], [agent('Quality', ['Check types'])])
+    assert plan_outline(parse_outline(ORIGINAL), VERSION, store).reused == 1
+
+
+def test_unattributable_or_fallback_agents_are_not_cached(store):
+    plan = plan_outline(parse_outline(ORIGINAL), VERSION, store)
+    plan.fill([0, 1, 2], [agent('Everything')])  # one agent for three sections cannot be split
+    assert [a['name'] for a in plan.assemble()] == ['Everything']
+    assert plan_outline(parse_outline(ORIGINAL), VERSION, store).reused == 0
+
+    plan.fill([0], [agent('Fallback')], cacheable=False)
+    assert plan_outline(parse_outline(ORIGINAL), VERSION, store).reused == 0
+
+
+def test_cache_modes_and_prompt_version(store):
+    generate_all(plan_outline(parse_outline(ORIGINAL), VERSION, store))
+    assert plan_outline(parse_outline(ORIGINAL), 'other-prompt', store).reused == 0
+    assert plan_outline(parse_outline(ORIGINAL), VERSION, store, 'refresh').reused == 0
+    assert plan_outline(parse_outline(ORIGINAL), VERSION, store, 'refresh').store is store
+    assert plan_outline(parse_outline(ORIGINAL), VERSION, store, 'bypass').store is None
+    assert plan_outline(parse_outline(ORIGINAL), VERSION, None).reused == 0
+
+
+def test_pending_chunks_respect_the_size_limit(store):
+    plan = plan_outline(parse_outline(ORIGINAL), VERSION, store)
+    chunks = plan.pending_chunks(max_chars=1)
+    assert [chunk.sections for chunk in chunks] == [[0], [1], [2]]
@@ -0,0 +1,67 @@
+"""
+Worker warm-up: load PyMuPDF, open the Ollama connection and prime the fallback tables before the first request
+"""
+
+import importlib
+import os
+import time
+
+# Configure warm-up settings
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', '1') == '1'
+WARMUP_LLM = os.environ.get('WARMUP_LLM', '1') == '1'  # open a pooled connection to Ollama
+
+# Imported once in the gunicorn master so forked workers start with them loaded
+PRELOAD_MODULES = ('fitz', 'requests', 'werkzeug.utils', 'flask', 'flask_cors', 'aiohttp')
+
+
+def preload_libraries(modules=PRELOAD_MODULES):
+    """Import heavy third-party libraries up front; returns the names that loaded"""
+    loaded = []
+    for name in modules:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except ImportError:
+            pass
+    return loaded
+
+
+def sample_pdf():
+    """Return the bytes of a one-page, two-line mindmap PDF"""
+    import fitz  # PyMuPDF
+
+    with fitz.open() as doc:
+        page = doc.new_page()
+        page.insert_text((40, 40), "1. Warm up", fontsize=9)
+        page.insert_text((64, 56), "1.1 Extract sample page", fontsize=9)
+        return doc.tobytes()
+
+
+def warm_up(llm=WARMUP_LLM):
+    """Run each cold path once: PDF extraction, the fallback generator and the Ollama connection"""
+    if not WARMUP_ENABLED:
+        return {}
+
+    from extraction import extract_outline_from_pdf
+    from fallback import generate_structured_json
+    from pipeline import llm_client, parse_json_response
+
+    timings = {}
+    started = time.perf_counter()
+    outline = extract_outline_from_pdf(sample_pdf())
+    timings['pdf'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    parse_json_response(generate_structured_json(outline))
+    timings['fallback'] = time.perf_counter() - started
+
+    if llm:
+        started = time.perf_counter()
+        reachable = llm_client.warm_up()
+        timings['llm'] = time.perf_counter() - started
+        if not reachable:
+            print(f"[WARN] Warm-up could not reach Ollama at {llm_client.base_url}")
+
+    summary = ' '.join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in timings.items())
+    print(f"[INFO] Warm-up finished in {sum(timings.values()) * 1000:.1f}ms ({summary})")
+    return timings